@@ -3,6 +3,71 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os # Make sure os is imported here for environment variables
 import re # Import re for regular expressions
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A simple alias mapping for common skill variations
+SKILL_ALIASES = {
+    "js": "javascript",
+    "reactjs": "react",
+    "nodejs": "node.js",
+    "expressjs": "express.js",
+    "mongodb": "mongodb",
+    "figma": "figma",
+    "adobexd": "adobe xd",
+    "linux": "linux",
+    "k8s": "kubernetes",
+    "gcp": "google cloud platform",
+    "azure": "microsoft azure",
+    "aws": "amazon web services",
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "data sci": "data science",
+    "ui/ux": "ui/ux design",
+    "qa": "quality assurance",
+    "ci/cd": "continuous integration/continuous deployment",
+    "rdbms": "relational database management system",
+    "nosql": "nosql database",
+    "agile": "agile methodology",
+    "scrum": "scrum framework",
+    "rest": "rest api",
+    "api": "api",
+    "git": "git",
+    "html": "html",
+    "css": "css",
+    "python": "python",
+    "java": "java",
+    "kotlin": "kotlin",
+    "swift": "swift",
+    "xcode": "xcode",
+    "sql": "sql",
+    "excel": "excel",
+    "pandas": "pandas",
+    "numpy": "numpy",
+    "tensorflow": "tensorflow",
+    "pytorch": "pytorch",
+    "nlp": "natural language processing",
+    "cv": "computer vision", # Assuming CV means Computer Vision in this context
+    "powerbi": "power bi",
+    "tableau": "tableau",
+    "uml": "unified modeling language",
+    "jira": "jira",
+    "selenium": "selenium",
+    "cypress": "cypress",
+    "jmeter": "jmeter",
+    "ansible": "ansible",
+    "terraform": "terraform",
+    "docker": "docker",
+    "kubernetes": "kubernetes",
+    "bash": "bash",
+    "shell": "bash" # Alias for bash
+}
+
+def normalize_skill(skill):
+    """Normalizes a skill string (lowercase, remove punctuation, apply aliases)."""
+    normalized = re.sub(r'[^\w\s]', '', skill).lower().strip()
+    return SKILL_ALIASES.get(normalized, normalized)
 
 class JobRequirement:
     """Represents the requirements for a specific job position."""
@@ -10,6 +75,7 @@ class JobRequirement:
         self.title = title
         self.required_skills = [s.lower() for s in required_skills] # Store in lowercase for case-insensitive matching
         self.preferred_skills = [s.lower() for s in preferred_skills] # Store in lowercase
+        self.normalized_required_skills = [normalize_skill(s) for s in self.required_skills] # Normalized once, reused for every candidate
         self.min_experience = min_experience
         self.test_link = test_link
         self.department = department
@@ -33,67 +99,11 @@ class SkillMatch:
 class SkillMatcher:
     """Handles skill matching between candidate CVs and job requirements."""
     def __init__(self):
-        # A simple alias mapping for common skill variations
-        self.skill_aliases = {
-            "js": "javascript",
-            "reactjs": "react",
-            "nodejs": "node.js",
-            "expressjs": "express.js",
-            "mongodb": "mongodb",
-            "figma": "figma",
-            "adobexd": "adobe xd",
-            "linux": "linux",
-            "k8s": "kubernetes",
-            "gcp": "google cloud platform",
-            "azure": "microsoft azure",
-            "aws": "amazon web services",
-            "ai": "artificial intelligence",
-            "ml": "machine learning",
-            "data sci": "data science",
-            "ui/ux": "ui/ux design",
-            "qa": "quality assurance",
-            "ci/cd": "continuous integration/continuous deployment",
-            "rdbms": "relational database management system",
-            "nosql": "nosql database",
-            "agile": "agile methodology",
-            "scrum": "scrum framework",
-            "rest": "rest api",
-            "api": "api",
-            "git": "git",
-            "html": "html",
-            "css": "css",
-            "python": "python",
-            "java": "java",
-            "kotlin": "kotlin",
-            "swift": "swift",
-            "xcode": "xcode",
-            "sql": "sql",
-            "excel": "excel",
-            "pandas": "pandas",
-            "numpy": "numpy",
-            "tensorflow": "tensorflow",
-            "pytorch": "pytorch",
-            "nlp": "natural language processing",
-            "cv": "computer vision", # Assuming CV means Computer Vision in this context
-            "powerbi": "power bi",
-            "tableau": "tableau",
-            "uml": "unified modeling language",
-            "jira": "jira",
-            "selenium": "selenium",
-            "cypress": "cypress",
-            "jmeter": "jmeter",
-            "ansible": "ansible",
-            "terraform": "terraform",
-            "docker": "docker",
-            "kubernetes": "kubernetes",
-            "bash": "bash",
-            "shell": "bash" # Alias for bash
-        }
+        self.skill_aliases = SKILL_ALIASES
 
     def _normalize_skill(self, skill):
         """Normalizes a skill string (lowercase, remove punctuation, apply aliases)."""
-        normalized = re.sub(r'[^\w\s]', '', skill).lower().strip()
-        return self.skill_aliases.get(normalized, normalized)
+        return normalize_skill(skill)
 
     def find_skill_matches(self, candidate_skills, required_skills):
         """
@@ -112,6 +122,20 @@ class SkillMatcher:
 
         return matches
 
+    def find_normalized_skill_matches(self, candidate_skills_by_name, job_requirement):
+        """
+        Same result as find_skill_matches, for candidate skills that were normalized at
+        insert time ({normalized name: original skill}) and a job whose required skills
+        are normalized once in JobRequirement. A dict lookup per required skill.
+        """
+        matches = []
+        for req_skill_original, req_skill_normalized in zip(job_requirement.required_skills,
+                                                            job_requirement.normalized_required_skills):
+            cand_skill_original = candidate_skills_by_name.get(req_skill_normalized)
+            if cand_skill_original is not None:
+                matches.append(SkillMatch(cand_skill_original, req_skill_original, "exact"))
+        return matches
+
     def calculate_match_score(self, matches, total_required_skills):
         """
         Calculates a match score based on the number of matched skills.
@@ -133,11 +157,13 @@ class SkillMatcher:
 
 
 class EmailSender:
-    def __init__(self, email_user, email_password, smtp_server="smtp.gmail.com", smtp_port=587):
+    def __init__(self, email_user, email_password, smtp_server="smtp.gmail.com", smtp_port=587, use_tls=True):
         self.email = email_user
         self.password = email_password
         self.smtp_server = smtp_server
-        self.smtp_port = smtp_port
+        self.smtp_port = int(smtp_port)
+        # Off only for local relays/sinks that don't offer STARTTLS
+        self.use_tls = use_tls
 
     @classmethod
     def from_env(cls):
@@ -147,7 +173,13 @@ class EmailSender:
         if not email_user or not email_password:
             # Raise an error if credentials are not set
             raise ValueError("EMAIL_USER and EMAIL_PASSWORD environment variables must be set for EmailSender.")
-        return cls(email_user, email_password)
+        return cls(
+            email_user,
+            email_password,
+            smtp_server=os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+            smtp_port=os.getenv("SMTP_PORT", 587),
+            use_tls=os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+        )
 
     def send_test_invitation(self, candidate_data, job_requirement, match_details, assessment_uuid):
         """
@@ -193,15 +225,16 @@ class EmailSender:
 
         try:
             server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls() # Enable Transport Layer Security
+            if self.use_tls:
+                server.starttls() # Enable Transport Layer Security
             server.login(self.email, self.password)
             text = msg.as_string()
             server.sendmail(self.email, recipient_email, text)
             server.quit()
-            print(f"✉️ Test invitation sent to {recipient_email} for {job_title} with ID: {assessment_uuid}")
+            logger.info("✉️ Test invitation sent to %s for %s with ID: %s", recipient_email, job_title, assessment_uuid)
             return True
         except Exception as e:
-            print(f"❌ Failed to send email to {recipient_email}: {e}")
+            logger.error("❌ Failed to send email to %s: %s", recipient_email, e)
             return False
 
 
@@ -0,0 +1,102 @@
+# admission.py
+"""
+Admission control for the resume pipeline.
+
+At most MAX_INFLIGHT_UPLOADS pipelines (each holding an LLM call and a database
+connection) run at once per process. Further uploads wait in a queue of at most
+UPLOAD_QUEUE_SIZE for up to UPLOAD_QUEUE_TIMEOUT seconds. Uploads that find the queue
+full are rejected at once with 429, and uploads that time out in the queue get 503.
+Both carry a Retry-After estimated from recent pipeline durations. Admitted requests
+keep a bounded latency instead of everyone slowing down together under overload.
+
+Batch files (/upload-resumes) are accepted up front and never shed; their LLM stage
+waits for one of the same slots through slot(), so single and batch uploads together
+make at most MAX_INFLIGHT_UPLOADS LLM calls per process.
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from metrics import UPLOADS_IN_FLIGHT, UPLOAD_QUEUE_DEPTH, UPLOAD_QUEUE_WAIT, UPLOAD_REJECTIONS
+
+REJECT_QUEUE_FULL = "queue_full"
+REJECT_QUEUE_TIMEOUT = "queue_timeout"
+
+# Weight of the newest pipeline duration in the moving average behind Retry-After
+DURATION_SMOOTHING = 0.2
+
+
+class AdmissionController:
+    def __init__(self, max_inflight=4, max_queue=16, queue_timeout=30.0, initial_duration=10.0):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.average_duration = initial_duration
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_inflight)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_inflight=int(os.getenv("MAX_INFLIGHT_UPLOADS", 4)),
+            max_queue=int(os.getenv("UPLOAD_QUEUE_SIZE", 16)),
+            queue_timeout=float(os.getenv("UPLOAD_QUEUE_TIMEOUT", 30))
+        )
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained, given recent pipeline durations."""
+        backlog = self.waiting + self.max_inflight
+        return max(1, math.ceil(self.average_duration * backlog / self.max_inflight))
+
+    def _reject(self, status_code, reason, detail):
+        UPLOAD_REJECTIONS.inc(reason)
+        raise HTTPException(status_code=status_code, detail=detail,
+                            headers={"Retry-After": str(self.retry_after())})
+
+    async def _acquire(self):
+        if not self._slots.locked():
+            # A free slot is taken without suspending, so the next caller already sees it gone
+            await self._slots.acquire()
+            UPLOAD_QUEUE_WAIT.observe(0.0)
+            return
+        if self.waiting >= self.max_queue:
+            self._reject(429, REJECT_QUEUE_FULL, "Too many resumes in progress, retry later")
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        UPLOAD_QUEUE_DEPTH.inc()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject(503, REJECT_QUEUE_TIMEOUT, "Resume processing is saturated, retry later")
+        finally:
+            self.waiting -= 1
+            UPLOAD_QUEUE_DEPTH.dec()
+        UPLOAD_QUEUE_WAIT.observe(time.perf_counter() - queued)
+
+    @asynccontextmanager
+    async def admit(self):
+        """Holds a pipeline slot for the enclosed block; raises HTTPException 429/503 when shedding load."""
+        await self._acquire()
+        UPLOADS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.average_duration += DURATION_SMOOTHING * (elapsed - self.average_duration)
+            UPLOADS_IN_FLIGHT.dec()
+            self._slots.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds a pipeline slot for already-accepted work, waiting as long as it takes instead of shedding."""
+        await self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
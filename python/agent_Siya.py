@@ -2,8 +2,10 @@
 
 import os
 import json
+import logging
 import re
-from db_insert import insert_structured_cv_data
+from db_insert import upsert_structured_cv_data
+from metrics import span
 from dotenv import load_dotenv
 import google.generativeai as genai
 
@@ -21,6 +23,17 @@ genai.configure(api_key=api_key)
 # ✅ Set Gemini model
 model = genai.GenerativeModel("gemini-1.5-flash")
 
+logger = logging.getLogger(__name__)
+
+
+class LLMQuotaExceeded(Exception):
+    """Gemini refused the call for quota or rate limits (HTTP 429 / RESOURCE_EXHAUSTED)."""
+
+
+def is_quota_error(error):
+    # google.api_core.exceptions.ResourceExhausted carries code 429
+    return type(error).__name__ == "ResourceExhausted" or getattr(error, "code", None) == 429
+
 
 def extract_json_block(text: str) -> dict:
     text = re.sub(r'//.*', '', text)
@@ -40,16 +53,16 @@ def extract_json_block(text: str) -> dict:
                 block = block.strip()
                 parsed = json.loads(block)
                 if any(key in parsed for key in ['name', 'email', 'skills', 'experience']):
-                    print(f"✅ Successfully parsed JSON with {len(parsed)} fields")
+                    logger.debug("✅ Successfully parsed JSON with %d fields", len(parsed))
                     return parsed
             except json.JSONDecodeError as e:
-                print(f"⚠️ JSON parse error: {e}")
+                logger.debug("⚠️ JSON parse error: %s", e)
                 continue
             except Exception as e:
-                print(f"⚠️ Unexpected error parsing block: {e}")
+                logger.warning("⚠️ Unexpected error parsing block: %s", e)
                 continue
 
-    print("🔄 Attempting manual key-value extraction...")
+    logger.info("🔄 No JSON block found, attempting manual key-value extraction")
     manual_data = {}
     patterns = {
         'name': r'"name"\s*:\s*"([^"]+)"',
@@ -65,40 +78,57 @@ def extract_json_block(text: str) -> dict:
             manual_data[key] = match.group(1)
 
     if manual_data:
-        print(f"📦 Extracted {len(manual_data)} fields manually")
+        logger.info("📦 Extracted %d fields manually", len(manual_data))
         return manual_data
 
     return None
 
 
-def query_gemini_cv_parser(prompt: str, db_connection=None):
-    print("📡 Connecting to Gemini...\n")
+def extract_cv_data(prompt: str):
+    """
+    Sends the extraction prompt to Gemini and returns the parsed profile dict,
+    or None when the call or the JSON extraction fails. Does not touch the database.
+    Raises LLMQuotaExceeded when Gemini rejects the call for quota, so callers can
+    back off instead of treating the resume as unreadable.
+    """
+    logger.debug("📡 Sending extraction prompt to Gemini (%d chars)", len(prompt))
 
     try:
-        response = model.generate_content(prompt)
-        full_response = response.text
+        with span("llm_call"):
+            response = model.generate_content(prompt)
+            full_response = response.text
     except Exception as e:
-        print(f"❌ Gemini API failed: {e}")
+        if is_quota_error(e):
+            logger.warning("⏳ Gemini quota exhausted: %s", e)
+            raise LLMQuotaExceeded(str(e)) from e
+        logger.error("❌ Gemini API failed: %s", e)
         return
 
-    print("\n\n📦 Parsing Gemini output...\n")
-    print("🔍 DEBUG - Raw Gemini Response:")
-    print("=" * 50)
-    print(full_response)
-    print("=" * 50)
+    logger.debug("📦 Raw Gemini response:\n%s", full_response)
+
+    with span("extract_json_block"):
+        json_data = extract_json_block(full_response)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔍 Extracted JSON:\n%s", json.dumps(json_data, indent=2) if json_data else "No JSON extracted")
 
-    json_data = extract_json_block(full_response)
+    if not json_data:
+        logger.error("❌ Failed to extract valid JSON from Gemini response (%d chars)", len(full_response))
+    return json_data
 
-    print("🔍 DEBUG - Extracted JSON:")
-    print("=" * 50)
-    print(json.dumps(json_data, indent=2) if json_data else "No JSON extracted")
-    print("=" * 50)
+
+def query_gemini_cv_parser(prompt: str, db_connection=None):
+    """
+    Sends the extraction prompt to Gemini and upserts the parsed profile.
+    Returns (candidate_id, upsert_status) when data was stored, otherwise None.
+    """
+    json_data = extract_cv_data(prompt)
 
     if json_data:
         if db_connection:
-            insert_structured_cv_data(json_data, db_connection)
-            print("✅ Data successfully inserted into MySQL.")
+            candidate_id, status = upsert_structured_cv_data(json_data, db_connection)
+            if candidate_id:
+                logger.debug("✅ Data successfully inserted into the database")
+                return candidate_id, status
         else:
-            print("⚠️ No DB connection passed. Skipped DB insert.")
-    else:
-        print("❌ Failed to extract valid JSON from Gemini response.")
+            logger.warning("⚠️ No DB connection passed. Skipped DB insert.")
@@ -0,0 +1,124 @@
+# app_logging.py
+"""
+Logging setup for the API and the pipeline modules.
+
+Request-path code logs through module loggers (logging.getLogger(__name__)) instead
+of print(). configure_logging() puts a QueueHandler on the root logger, so a log
+call only formats the record and enqueues it; a QueueListener thread writes it to
+stdout. Slow or blocked stdout no longer stalls request handling.
+
+Every record carries the current request's correlation id (set by the API
+middleware from X-Request-ID, or generated), also when the work runs in a
+threadpool. LOG_LEVEL and LOG_FORMAT come from config.AppConfig; LOG_JSON=true
+emits one JSON object per line instead.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import uuid
+
+from config import AppConfig
+
+NO_REQUEST_ID = "-"
+# Client-supplied ids end up in log lines and profile file names
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+_request_id = contextvars.ContextVar("request_id", default=NO_REQUEST_ID)
+_listener = None
+
+# Attributes every LogRecord has; anything else was passed through extra= and is
+# emitted as a field by JsonFormatter
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+# Third-party loggers that flood the output at DEBUG (pdfminer logs every PDF token)
+QUIET_LOGGERS = ("pdfminer", "pdfplumber", "PIL", "urllib3", "grpc")
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def is_valid_request_id(request_id):
+    return bool(request_id) and REQUEST_ID_PATTERN.fullmatch(request_id) is not None
+
+
+def set_request_id(request_id):
+    """
+    Sets the correlation id for the current context (a new one if request_id is missing
+    or malformed); returns a token for reset_request_id.
+    """
+    return _request_id.set(request_id if is_valid_request_id(request_id) else new_request_id())
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the correlation id of the context that created them."""
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", NO_REQUEST_ID),
+            "message": record.getMessage(),
+        }
+        # QueueHandler has already folded any traceback into the message
+        entry.update({key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRIBUTES})
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(app_config=None):
+    """Installs the queue handler and starts the writer thread. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return _listener
+    app_config = app_config or AppConfig.from_env()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if app_config.log_json:
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(app_config.log_format))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Runs in the logging thread, before the record crosses into the listener thread
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(app_config.log_level.upper())
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Flushes queued records and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,257 @@
+# async_repository.py
+"""
+Non-blocking data access for the FastAPI service, on an aiomysql connection pool.
+
+Selected with DB_DRIVER=async. Covers the per-upload path: candidate upsert, profile
+load, evaluation storage (assessment links, outbox rows, evaluation log and results)
+and outbox dispatch. Requests waiting on the database yield the event loop instead of
+holding a thread and a dedicated connection each.
+
+SQL, row builders and caches are shared with the blocking modules (db_insert,
+candidate_loader, skill_dictionary, evaluation_store, email_outbox), so both drivers
+write and read exactly the same rows.
+"""
+import asyncio
+import contextvars
+import logging
+
+try:
+    import aiomysql
+except ImportError:  # only needed with DB_DRIVER=async
+    aiomysql = None
+
+from db_insert import (
+    CANDIDATE_CHILD_TABLES, CANDIDATE_INSERT_QUERY, CANDIDATE_UPDATE_QUERY, CANDIDATE_SKILL_INSERT_QUERY,
+    UPSERT_INSERTED, UPSERT_UPDATED, UPSERT_UNCHANGED,
+    prepare_candidate, build_child_rows, find_existing_candidate_query, is_unchanged
+)
+from candidate_loader import candidate_cache, invalidate_candidate, profile_queries, row_to_profile
+from skill_dictionary import (
+    SKILL_INSERT_QUERY, normalize_candidate_skills, cached_skill_ids, skill_id_select_query, remember_skill_ids,
+    log_unresolved_skills
+)
+from evaluation_store import (
+    ASSESSMENT_INSERT_QUERY, EVALUATION_LOG_INSERT_QUERY, EVALUATION_LOG_SENT_UPDATE_QUERY,
+    build_evaluation_log_row, latest_evaluation_log_query
+)
+from evaluation_analytics import EVALUATION_RESULT_INSERT_QUERY, build_evaluation_result_rows
+from email_outbox import OUTBOX_INSERT_QUERY, pending_outbox_query, send_outbox_row
+
+logger = logging.getLogger(__name__)
+
+
+class _ConcurrentInsert(Exception):
+    """The candidate's email was inserted by another upload after our lookup."""
+
+
+class AsyncRepository:
+    def __init__(self, pool):
+        self.pool = pool
+
+    @classmethod
+    async def create(cls, db_config):
+        if aiomysql is None:
+            raise RuntimeError("DB_DRIVER=async requires the 'aiomysql' package")
+        pool = await aiomysql.create_pool(
+            host=db_config.host,
+            port=db_config.port,
+            user=db_config.user,
+            password=db_config.password,
+            db=db_config.database,
+            minsize=db_config.pool_min_size,
+            maxsize=db_config.pool_max_size,
+            autocommit=False,
+            charset="utf8mb4"
+        )
+        logger.info("✅ Async database pool ready (%d-%d connections)", db_config.pool_min_size, db_config.pool_max_size)
+        return cls(pool)
+
+    async def close(self):
+        self.pool.close()
+        await self.pool.wait_closed()
+
+    async def _resolve_skill_ids(self, cursor, normalized_names):
+        """Async counterpart of skill_dictionary.resolve_skill_ids (same transaction rules)."""
+        resolved, missing = cached_skill_ids(normalized_names)
+        if not missing:
+            return resolved
+
+        await cursor.executemany(SKILL_INSERT_QUERY, [(name,) for name in missing])
+        await cursor.execute(*skill_id_select_query(missing))
+        for skill_id, name in await cursor.fetchall():
+            resolved[name] = skill_id
+        log_unresolved_skills(normalized_names, resolved)
+        return resolved
+
+    async def upsert_candidate(self, data, retry_on_conflict=True):
+        """
+        Async counterpart of db_insert.upsert_structured_cv_data.
+        Returns (candidate_id, status), or (False, None) on failure.
+        """
+        if not data:
+            logger.error("❌ No data provided for insertion")
+            return False, None
+
+        name, fingerprint, candidate_row = prepare_candidate(data)
+        skills_by_name = normalize_candidate_skills(data.get("skills", []))
+        conflict = False
+
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.execute(*find_existing_candidate_query(candidate_row[-2], fingerprint))
+                    existing = await cursor.fetchone()
+                    if existing and is_unchanged(existing, data, fingerprint):
+                        logger.info("♻️ Candidate %s unchanged, skipping write", existing[0])
+                        # End the read's transaction, or the pool closes the connection on release
+                        await conn.rollback()
+                        return existing[0], UPSERT_UNCHANGED
+
+                    if existing:
+                        candidate_id = existing[0]
+                        await cursor.execute(CANDIDATE_UPDATE_QUERY, candidate_row + (candidate_id,))
+                        for table in CANDIDATE_CHILD_TABLES:
+                            await cursor.execute(f"DELETE FROM {table} WHERE candidate_id = %s", (candidate_id,))
+                        status = UPSERT_UPDATED
+                    else:
+                        try:
+                            await cursor.execute(CANDIDATE_INSERT_QUERY, candidate_row)
+                        except aiomysql.IntegrityError:
+                            if not retry_on_conflict:
+                                raise
+                            raise _ConcurrentInsert()
+                        candidate_id = cursor.lastrowid
+                        status = UPSERT_INSERTED
+
+                    skill_ids = {}
+                    if skills_by_name:
+                        try:
+                            skill_ids = await self._resolve_skill_ids(cursor, list(skills_by_name))
+                            await cursor.executemany(CANDIDATE_SKILL_INSERT_QUERY, [
+                                (candidate_id, skill_ids[name], raw) for name, raw in skills_by_name.items() if name in skill_ids
+                            ])
+                        except aiomysql.MySQLError as e:
+                            logger.warning("⚠️ Error inserting skills: %s", e)
+
+                    for label, query, params in build_child_rows(candidate_id, data):
+                        try:
+                            await cursor.execute(query, params)
+                        except aiomysql.MySQLError as e:
+                            logger.warning("⚠️ Error inserting %s: %s", label, e)
+
+                    await conn.commit()
+                except _ConcurrentInsert:
+                    await conn.rollback()
+                    conflict = True
+                except Exception as e:
+                    logger.error("❌ Critical database insertion error: %s", e)
+                    await conn.rollback()
+                    return False, None
+
+        if conflict:
+            # Same email inserted by a concurrent upload since our lookup; retried on a fresh
+            # connection once this one is back in the pool
+            logger.info("🔁 Candidate %s inserted concurrently, retrying as an update", candidate_row[-2])
+            return await self.upsert_candidate(data, retry_on_conflict=False)
+        remember_skill_ids(skill_ids)
+        invalidate_candidate(candidate_id)
+        logger.info("🎉 Successfully %s all data for candidate %s: %s", status, candidate_id, name)
+        return candidate_id, status
+
+    async def load_candidate(self, candidate_id, use_cache=True):
+        """Async counterpart of candidate_loader.load_candidate_profile (same cache)."""
+        if use_cache:
+            profile = candidate_cache.get(candidate_id)
+            if profile is not None:
+                return profile
+
+        profile = None
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                for sql, params in profile_queries([candidate_id]):
+                    await cursor.execute(sql, params)
+                    row = await cursor.fetchone()
+                    if row:
+                        profile = row_to_profile(row)
+            # Plain reads still open a transaction; end it so the connection goes back clean
+            await conn.rollback()
+
+        if profile is not None and use_cache:
+            candidate_cache.put(candidate_id, profile)
+        return profile
+
+    async def get_latest_evaluation_log(self, candidate_id, catalog_version=None):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(*latest_evaluation_log_query(candidate_id, catalog_version))
+                row = await cursor.fetchone()
+            await conn.rollback()
+        return row
+
+    async def write_evaluation_results(self, candidate_id, evaluation_results, assessment_rows,
+                                       outbox_rows=(), catalog_version=None):
+        """Async counterpart of evaluation_store.write_evaluation_results (one transaction)."""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    if assessment_rows:
+                        await cursor.executemany(ASSESSMENT_INSERT_QUERY, assessment_rows)
+                    if outbox_rows:
+                        await cursor.executemany(OUTBOX_INSERT_QUERY, outbox_rows)
+
+                    await cursor.execute(EVALUATION_LOG_INSERT_QUERY, build_evaluation_log_row(candidate_id, evaluation_results))
+                    log_id = cursor.lastrowid
+                    await cursor.executemany(EVALUATION_RESULT_INSERT_QUERY, build_evaluation_result_rows(
+                        log_id, candidate_id, evaluation_results['evaluations'], catalog_version
+                    ))
+                    await conn.commit()
+                except aiomysql.MySQLError as err:
+                    logger.error("⚠️ Failed to store evaluation results: %s", err)
+                    await conn.rollback()
+                    return None
+        logger.info("✅ Stored %d assessment link(s) and evaluation log for candidate ID: %s", len(assessment_rows), candidate_id)
+        return log_id
+
+    async def record_notifications_sent(self, log_id, sent):
+        """Async counterpart of evaluation_store.record_notifications_sent."""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.execute(EVALUATION_LOG_SENT_UPDATE_QUERY, (sent, log_id))
+                    await conn.commit()
+                except aiomysql.MySQLError as err:
+                    logger.warning("⚠️ Could not record sent notifications on evaluation log %s: %s", log_id, err)
+                    await conn.rollback()
+
+    async def dispatch_outbox_emails(self, email_sender, job_requirements, assessment_uuids=None):
+        """
+        Async counterpart of email_outbox.dispatch_outbox_emails. SMTP is blocking, so
+        each send runs in the default executor while the loop keeps serving requests.
+        """
+        pending_query = pending_outbox_query(assessment_uuids)
+        if pending_query is None:
+            return 0
+
+        jobs_by_title = {job.title: job for job in job_requirements}
+        loop = asyncio.get_running_loop()
+        sent = 0
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                try:
+                    await cursor.execute(*pending_query)
+                    pending = await cursor.fetchall()
+                    await conn.rollback()
+
+                    for row in pending:
+                        # Run in a copy of this context so the send shows up in the request's timings
+                        update_sql, update_params, ok = await loop.run_in_executor(
+                            None, contextvars.copy_context().run, send_outbox_row, email_sender, jobs_by_title, row
+                        )
+                        if ok:
+                            sent += 1
+                        await cursor.execute(update_sql, update_params)
+                        await conn.commit()
+                except aiomysql.MySQLError as err:
+                    logger.error("⚠️ Outbox dispatch failed: %s", err)
+                    await conn.rollback()
+        return sent
@@ -0,0 +1,256 @@
+# batch.py
+"""
+Batch processing behind /upload-resumes.
+
+A batch is a set of resumes, uploaded as several files or as a ZIP archive. Every
+file runs through the same stages as a single upload: parse, the LLM extraction,
+storing the candidate, and matching. Each stage has its own process-wide concurrency
+limit (BATCH_<STAGE>_CONCURRENCY), so the stages overlap: while some files wait on the
+LLM, others are being parsed or matched. The LLM is the expensive stage: its calls
+also take a slot of the admission controller (MAX_INFLIGHT_UPLOADS), so batches and
+single uploads share one LLM limit. BATCH_LLM_CONCURRENCY caps the batches' share of
+it, leaving room for interactive uploads; BATCH_LLM_RATE_PER_MIN optionally paces
+calls under a requests-per-minute quota. The batch then runs at the quota's pace
+rather than one file's latency at a time.
+
+Archive entries are read only when their parse slot comes up, so only the files
+being parsed are held in memory. Batches and their per-file results are kept in
+memory (the newest BATCH_REGISTRY_SIZE per process) and served by
+GET /upload-resumes/{batch_id}.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from pathlib import PurePosixPath
+
+from metrics import BATCH_ITEMS, BATCH_STAGE_WAIT
+
+logger = logging.getLogger(__name__)
+
+BATCH_STAGES = ("parse", "llm", "store", "match")
+DEFAULT_STAGE_CONCURRENCY = {"parse": 2, "llm": 3, "store": 4, "match": 4}
+DEFAULT_BATCH_MAX_FILES = 500
+DEFAULT_MAX_ARCHIVE_BYTES = 100 * 1024 * 1024
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+ITEM_QUEUED = "queued"
+ITEM_PROCESSING = "processing"
+ITEM_SUCCEEDED = "succeeded"
+ITEM_FAILED = "failed"
+ITEM_SKIPPED = "skipped"
+
+BATCH_RUNNING = "running"
+BATCH_COMPLETED = "completed"
+
+
+def new_batch_id():
+    return uuid.uuid4().hex
+
+
+def batch_max_files():
+    return int(os.getenv("BATCH_MAX_FILES", DEFAULT_BATCH_MAX_FILES))
+
+
+def max_archive_bytes():
+    return int(os.getenv("BATCH_MAX_ARCHIVE_BYTES", DEFAULT_MAX_ARCHIVE_BYTES))
+
+
+def is_archive(filename):
+    return PurePosixPath(filename or "").suffix.lower() == ".zip"
+
+
+def is_supported(filename):
+    return PurePosixPath(filename or "").suffix.lower() in SUPPORTED_EXTENSIONS
+
+
+class BatchItem:
+    """
+    One file of a batch. `opener` returns the resume (a file object or bytes) when its
+    parse slot comes up; stages keep their intermediate output in `state`.
+    """
+    def __init__(self, filename, opener=None, status=ITEM_QUEUED, error=None):
+        self.filename = filename
+        self.opener = opener
+        self.status = status
+        self.stage = None
+        self.error = error
+        self.result = None
+        self.seconds = None
+        self.state = {}
+
+    def to_dict(self, include_result=True):
+        entry = {"filename": self.filename, "status": self.status}
+        if self.status == ITEM_PROCESSING:
+            entry["stage"] = self.stage
+        if self.error:
+            entry["error"] = self.error
+        if self.seconds is not None:
+            entry["seconds"] = round(self.seconds, 3)
+        if include_result and self.result is not None:
+            entry["result"] = self.result
+        return entry
+
+
+class Batch:
+    def __init__(self, batch_id, items, resources=()):
+        self.batch_id = batch_id
+        self.items = items
+        # Spooled uploads and open archives the items read from; closed when the batch finishes
+        self.resources = list(resources)
+        self.status = BATCH_RUNNING
+        self.created = time.time()
+        self.seconds = None
+        self.task = None
+
+    def counts(self):
+        counts = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return counts
+
+    def close(self):
+        for resource in reversed(self.resources):
+            try:
+                resource.close()
+            except Exception as e:
+                logger.warning("⚠️ Could not close batch %s input: %s", self.batch_id, e)
+        self.resources = []
+
+    def to_dict(self, include_results=True):
+        summary = {
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "files": len(self.items),
+            "counts": self.counts(),
+            "items": [item.to_dict(include_results) for item in self.items]
+        }
+        if self.seconds is not None:
+            summary["seconds"] = round(self.seconds, 3)
+        return summary
+
+
+def expand_archive(archive_file, archive_name, max_entry_bytes):
+    """
+    Returns (open ZipFile, items) for a ZIP of resumes. Folders, hidden files and macOS
+    metadata are ignored; unsupported or oversized entries become skipped items.
+    Entries are decompressed only when an item is opened. Raises zipfile.BadZipFile.
+    """
+    archive = zipfile.ZipFile(archive_file)
+    items = []
+    for info in archive.infolist():
+        path = PurePosixPath(info.filename)
+        if info.is_dir() or "__MACOSX" in path.parts or any(part.startswith(".") for part in path.parts):
+            continue
+        filename = f"{archive_name}/{info.filename}"
+        if not is_supported(info.filename):
+            items.append(BatchItem(filename, status=ITEM_SKIPPED, error="Only PDF and DOCX files are supported"))
+        elif info.file_size > max_entry_bytes:
+            items.append(BatchItem(filename, status=ITEM_SKIPPED, error="File too large"))
+        else:
+            # ZipFile reads are serialized on the shared file handle, so parallel parses are safe
+            items.append(BatchItem(filename, opener=lambda info=info: archive.read(info)))
+    return archive, items
+
+
+class RateLimiter:
+    """Spaces calls at most `per_minute` a minute; 0 disables pacing."""
+    def __init__(self, per_minute=0):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class BatchPipeline:
+    """
+    Runs batch items through the stages with one concurrency limit per stage, shared by
+    every batch in the process. A stage is an async function of the item; when it sets
+    item.result the item is finished early (e.g. an unchanged candidate is not re-matched).
+    """
+    def __init__(self, concurrency=None, llm_rate_per_minute=0):
+        self.concurrency = dict(DEFAULT_STAGE_CONCURRENCY, **(concurrency or {}))
+        self._slots = {stage: asyncio.Semaphore(limit) for stage, limit in self.concurrency.items()}
+        self.llm_rate = RateLimiter(llm_rate_per_minute)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            concurrency={stage: int(os.getenv(f"BATCH_{stage.upper()}_CONCURRENCY", default))
+                         for stage, default in DEFAULT_STAGE_CONCURRENCY.items()},
+            llm_rate_per_minute=float(os.getenv("BATCH_LLM_RATE_PER_MIN", 0))
+        )
+
+    async def _run_item(self, item, stages):
+        started = time.perf_counter()
+        try:
+            for name, stage in stages:
+                queued = time.perf_counter()
+                async with self._slots[name]:
+                    BATCH_STAGE_WAIT.observe(time.perf_counter() - queued, name)
+                    item.status, item.stage = ITEM_PROCESSING, name
+                    if name == "llm":
+                        await self.llm_rate.wait()
+                    await stage(item)
+                if item.result is not None:
+                    break
+            item.status = ITEM_SUCCEEDED
+        except Exception as e:
+            item.status = ITEM_FAILED
+            # HTTPException from the shared pipeline helpers carries its message in .detail
+            item.error = str(getattr(e, "detail", None) or e)
+            logger.warning("⚠️ Batch file %s failed at %s: %s", item.filename, item.stage, item.error)
+        finally:
+            item.seconds = time.perf_counter() - started
+            item.state = {}
+            BATCH_ITEMS.inc(item.status)
+
+    async def run(self, batch, stages):
+        """Processes every queued item of the batch; stages is [(stage name, async function of item)]."""
+        started = time.perf_counter()
+        queued = [item for item in batch.items if item.status == ITEM_QUEUED]
+        for item in batch.items:
+            if item.status == ITEM_SKIPPED:
+                BATCH_ITEMS.inc(ITEM_SKIPPED)
+        logger.info("📦 Batch %s: processing %d of %d file(s)", batch.batch_id, len(queued), len(batch.items))
+        try:
+            await asyncio.gather(*(self._run_item(item, stages) for item in queued))
+        finally:
+            batch.close()
+            batch.status = BATCH_COMPLETED
+            batch.seconds = time.perf_counter() - started
+        logger.info("📦 Batch %s finished in %.1fs: %s", batch.batch_id, batch.seconds, batch.counts())
+        return batch
+
+
+class BatchRegistry:
+    """The most recent batches of this process, by id."""
+    def __init__(self, max_batches=100):
+        self.max_batches = max_batches
+        self._batches = OrderedDict()
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_batches=int(os.getenv("BATCH_REGISTRY_SIZE", 100)))
+
+    def add(self, batch):
+        self._batches[batch.batch_id] = batch
+        # Running batches are never dropped; the oldest finished ones go first
+        for batch_id in [batch_id for batch_id, entry in self._batches.items() if entry.status == BATCH_COMPLETED]:
+            if len(self._batches) <= self.max_batches:
+                break
+            del self._batches[batch_id]
+
+    def get(self, batch_id):
+        return self._batches.get(batch_id)
@@ -0,0 +1,230 @@
+# benchmark.py
+"""
+End-to-end benchmark of the resume pipeline on the bundled sample resumes.
+
+Runs every stage against local stand-ins (stand_ins.py): a fake LLM instead of
+Gemini, an embedded SQLite database instead of MySQL and an SMTP sink instead of
+Gmail, so results measure this code rather than the network.
+
+Stages:
+    parse_file        text extraction per sample resume
+    parse_pdf_<name>  PDF text extraction per backend (auto, pdfium, pdfplumber)
+    cv_process        CVProcessor.process: parse + LLM + JSON extraction + upsert
+    insert_candidate  insert_structured_cv_data of a new candidate
+    load_candidate    single-query profile load (cache bypassed)
+    matching          evaluation against the whole job catalog (evaluation cache off)
+    matching_cached   the same evaluations served from a warm evaluation cache
+    send_email        one invitation through EmailSender to the SMTP sink
+
+Usage:
+    python benchmark.py                          # run and compare with the baseline
+    python benchmark.py --save-baseline          # record this machine's baseline
+    python benchmark.py --iterations 50 --threshold 0.3 --json results.json
+
+Exits with status 1 when a stage's p50 latency regresses by more than --threshold
+against the baseline file.
+"""
+import argparse
+import contextlib
+import copy
+import glob
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+import uuid
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(SCRIPT_DIR, "benchmark_baseline.json")
+SAMPLE_PATTERNS = ("*.pdf", "*.docx")
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies, wall_seconds):
+    return {
+        "runs": len(latencies),
+        "throughput_per_s": round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def measure(func, inputs, quiet=True):
+    """Calls func(item) for each input; returns (latencies, wall seconds)."""
+    latencies = []
+    sink = open(os.devnull, "w") if quiet else None
+    if quiet:
+        # Pipeline modules log through app_logging's writer thread, not sys.stdout
+        logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+            wall_start = time.perf_counter()
+            for item in inputs:
+                start = time.perf_counter()
+                func(item)
+                latencies.append(time.perf_counter() - start)
+            wall = time.perf_counter() - wall_start
+    finally:
+        if sink:
+            sink.close()
+            logging.disable(logging.NOTSET)
+    return latencies, wall
+
+
+def run_benchmarks(files, iterations, quiet=True):
+    from stand_ins import SMTPSink, create_sqlite_database, install_fake_llm
+    fake_llm = install_fake_llm()
+
+    from docsParser import PDF_BACKENDS, parse_file, read_pdf_file
+    from cv_Processor import CVProcessor
+    from db_insert import insert_structured_cv_data
+    from candidate_loader import load_candidate_profile
+    from storage import connect_sqlite
+    from FilterAndTestLink import EmailSender
+    from main import setup_job_requirements, evaluate_candidate
+    from evaluation_cache import evaluation_cache
+
+    results = {}
+    inputs = [path for _ in range(iterations) for path in files]
+
+    results["parse_file"] = summarize(*measure(parse_file, inputs, quiet))
+    pdf_inputs = [path for path in inputs if path.endswith(".pdf")]
+    for backend in PDF_BACKENDS if pdf_inputs else ():
+        results[f"parse_pdf_{backend}"] = summarize(*measure(
+            lambda path: read_pdf_file(path, backend), pdf_inputs, quiet
+        ))
+
+    db_path = create_sqlite_database()
+    db_connection = connect_sqlite(db_path)
+    processor = CVProcessor(model="benchmark", db_connection=db_connection)
+    results["cv_process"] = summarize(*measure(processor.process, inputs, quiet))
+
+    # Profiles as the fake LLM returns them, with a fresh email per run so every
+    # insert is a new candidate rather than an unchanged re-upload
+    profiles = [fake_llm.build_profile(parse_file(path)) for path in files]
+    new_profiles = []
+    for index, _ in enumerate(inputs):
+        profile = copy.deepcopy(profiles[index % len(profiles)])
+        profile["email"] = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        new_profiles.append(profile)
+    candidate_ids = []
+
+    def insert(profile):
+        candidate_ids.append(insert_structured_cv_data(profile, db_connection))
+
+    results["insert_candidate"] = summarize(*measure(insert, new_profiles, quiet))
+
+    results["load_candidate"] = summarize(*measure(
+        lambda candidate_id: load_candidate_profile(db_connection, candidate_id, use_cache=False),
+        [candidate_id for candidate_id in candidate_ids if candidate_id], quiet
+    ))
+
+    job_requirements = setup_job_requirements()
+    loaded = [load_candidate_profile(db_connection, candidate_id) for candidate_id in candidate_ids if candidate_id]
+    def evaluate(profile):
+        return evaluate_candidate(profile["id"], profile, job_requirements, None, False)
+
+    # Matching proper: with the cache on, every run after the first would time a hit
+    cache_size, evaluation_cache.max_size = evaluation_cache.max_size, 0
+    try:
+        results["matching"] = summarize(*measure(evaluate, loaded, quiet))
+    finally:
+        evaluation_cache.max_size = cache_size
+    evaluation_cache.clear()
+    for profile in loaded:
+        evaluate(profile)
+    results["matching_cached"] = summarize(*measure(evaluate, loaded, quiet))
+    db_connection.close()
+    shutil.rmtree(os.path.dirname(db_path), ignore_errors=True)
+
+    sink = SMTPSink().start()
+    try:
+        email_sender = EmailSender("benchmark@localhost", "benchmark", "127.0.0.1", sink.port, use_tls=False)
+        job = job_requirements[0]
+        results["send_email"] = summarize(*measure(
+            lambda profile: email_sender.send_test_invitation(profile, job, "benchmark", str(uuid.uuid4())),
+            loaded, quiet
+        ))
+    finally:
+        sink.stop()
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns [(stage, baseline p50, current p50, change)] for stages over the threshold."""
+    regressions = []
+    for stage, current in results.items():
+        previous = baseline.get(stage)
+        if not previous or not previous.get("p50_ms"):
+            continue
+        change = current["p50_ms"] / previous["p50_ms"] - 1
+        if change > threshold:
+            regressions.append((stage, previous["p50_ms"], current["p50_ms"], change))
+    return regressions
+
+
+def print_report(results):
+    print(f"{'stage':<18}{'runs':>6}{'ops/s':>10}{'mean ms':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, row in results.items():
+        print(f"{stage:<18}{row['runs']:>6}{row['throughput_per_s']:>10}{row['mean_ms']:>11}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the resume pipeline with local stand-ins")
+    parser.add_argument("--files", nargs="*", help="Resumes to use (default: bundled samples)")
+    parser.add_argument("--iterations", type=int, default=10, help="Passes over the sample files")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed p50 slowdown (0.25 = 25%%)")
+    parser.add_argument("--json", help="Also write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's own output")
+    args = parser.parse_args()
+
+    files = args.files or sorted(
+        path for pattern in SAMPLE_PATTERNS for path in glob.glob(os.path.join(SCRIPT_DIR, pattern))
+    )
+    if not files:
+        parser.error("No sample resumes found")
+
+    results = run_benchmarks(files, args.iterations, quiet=not args.verbose)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"✅ Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ No baseline yet; run with --save-baseline to record one")
+        return 0
+
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    regressions = compare(results, baseline, args.threshold)
+    for stage, before, after, change in regressions:
+        print(f"❌ {stage}: p50 {before} ms -> {after} ms (+{change:.0%})")
+    if regressions:
+        return 1
+    print(f"✅ No stage regressed by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+# bulk_import.py
+"""
+Resumable offline import of a directory tree of resumes (.pdf/.docx).
+
+For backfills that are too large to push through /upload-resume one request at a
+time. Files are parsed in a process pool (text extraction is CPU-bound), extracted by
+the LLM with bounded concurrency, and stored as candidates via CVProcessor. Candidates
+are not evaluated and no invitation emails are sent.
+
+Every finished file is recorded in a checkpoint database (SQLite): its path, size,
+mtime, content hash and status. A re-run skips files that are already done, so a
+crash or Ctrl-C resumes where it stopped. When Gemini reports its quota exhausted,
+the importer stores what is already extracted and exits with status 2. Files still in
+flight stay pending and are picked up by the next run. Files whose content matches
+an already imported file are recorded as duplicates without an LLM call.
+
+Usage:
+    python bulk_import.py /data/legacy-resumes
+    python bulk_import.py /data/legacy-resumes --llm-concurrency 16 --parse-workers 8
+    python bulk_import.py /data/legacy-resumes --retry-failed   # also retry failed files
+    python bulk_import.py --status                              # checkpoint summary
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from db_insert import UPSERT_UNCHANGED
+from docsParser import parse_file
+
+DEFAULT_CHECKPOINT = "bulk_import_checkpoint.db"
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+STATUS_IMPORTED = "imported"
+STATUS_UNCHANGED = "unchanged"
+STATUS_DUPLICATE = "duplicate"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+# Files in these states are not processed again unless they change on disk
+DONE_STATUSES = (STATUS_IMPORTED, STATUS_UNCHANGED, STATUS_DUPLICATE, STATUS_SKIPPED)
+
+EXIT_QUOTA_EXHAUSTED = 2
+
+_STOP = object()
+
+
+class ImportCheckpoint:
+    """Per-file import state, committed after every file."""
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT,
+                status TEXT NOT NULL,
+                candidate_id INTEGER,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_import_checkpoints_sha256 ON import_checkpoints (sha256)")
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+    def needs_import(self, path, size, mtime, retry_failed=False):
+        row = self._connection.execute(
+            "SELECT size, mtime, status FROM import_checkpoints WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None or (row[0], row[1]) != (size, mtime):
+            return True
+        return row[2] not in DONE_STATUSES and retry_failed
+
+    def imported_candidate(self, sha256):
+        """The candidate an identical file was already imported as, or None."""
+        row = self._connection.execute(
+            "SELECT candidate_id FROM import_checkpoints WHERE sha256 = ? AND status IN (?, ?) LIMIT 1",
+            (sha256, STATUS_IMPORTED, STATUS_UNCHANGED)
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, path, size, mtime, status, sha256=None, candidate_id=None, error=None):
+        self._connection.execute("""
+            INSERT OR REPLACE INTO import_checkpoints (path, size, mtime, sha256, status, candidate_id, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (path, size, mtime, sha256, status, candidate_id, error, time.time()))
+        self._connection.commit()
+
+    def summary(self):
+        return dict(self._connection.execute(
+            "SELECT status, COUNT(*) FROM import_checkpoints GROUP BY status ORDER BY status"
+        ).fetchall())
+
+
+class ImportFile:
+    def __init__(self, path, size, mtime):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.sha256 = None
+
+
+def scan(directory, checkpoint, max_bytes, retry_failed=False):
+    """
+    Returns (files to import, files too large) under directory, in a stable order,
+    leaving out the ones the checkpoint already has done.
+    """
+    pending, too_large = [], []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+        for name in sorted(names):
+            if name.startswith(".") or not name.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.abspath(os.path.join(root, name))
+            stat = os.stat(path)
+            if not checkpoint.needs_import(path, stat.st_size, stat.st_mtime, retry_failed):
+                continue
+            entry = ImportFile(path, stat.st_size, stat.st_mtime)
+            (too_large if stat.st_size > max_bytes else pending).append(entry)
+    return pending, too_large
+
+
+def read_resume(path):
+    """Process-pool worker: returns (sha256, text, error) for one file."""
+    try:
+        with open(path, "rb") as handle:
+            content = handle.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+    except OSError as e:
+        return None, None, str(e)
+    try:
+        text = parse_file(content, path)
+    except Exception as e:
+        return sha256, None, f"Parse failed: {e}"
+    if not text or not text.strip():
+        return sha256, None, "No text extracted"
+    return sha256, text, None
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class Progress:
+    def __init__(self, total):
+        self.total = total
+        self.counts = {}
+        self.started = time.perf_counter()
+
+    def record(self, status):
+        self.counts[status] = self.counts.get(status, 0) + 1
+
+    def done(self):
+        return sum(self.counts.values())
+
+    def line(self):
+        elapsed = time.perf_counter() - self.started
+        done = self.done()
+        rate = done / elapsed if elapsed else 0.0
+        eta = format_duration((self.total - done) / rate) if rate else "?"
+        counts = ", ".join(f"{status} {count}" for status, count in sorted(self.counts.items()))
+        return (f"⏱️ {done}/{self.total} files ({counts or 'none yet'}) | {rate:.2f} files/s"
+                f" | elapsed {format_duration(elapsed)} | ETA {eta}")
+
+
+class BulkImporter:
+    """
+    Runs files through parse (process pool) -> LLM -> store, with bounded queues in
+    between so parsing never runs far ahead of the LLM.
+    """
+    def __init__(self, checkpoint, processor_factory, connect_db, parse_workers=4, llm_concurrency=8,
+                 store_concurrency=2, progress_interval=10.0):
+        self.checkpoint = checkpoint
+        self.processor_factory = processor_factory
+        self.connect_db = connect_db
+        self.parse_workers = parse_workers
+        self.llm_concurrency = llm_concurrency
+        self.store_concurrency = store_concurrency
+        self.progress_interval = progress_interval
+        self.quota_exhausted = False
+        self.progress = None
+
+    def _record(self, entry, status, candidate_id=None, error=None):
+        self.checkpoint.record(entry.path, entry.size, entry.mtime, status, entry.sha256, candidate_id, error)
+        self.progress.record(status)
+        if status == STATUS_FAILED:
+            logging.getLogger(__name__).warning("⚠️ %s: %s", entry.path, error)
+
+    async def _parse(self, pool, files, extracted):
+        loop = asyncio.get_running_loop()
+        for entry in files:
+            if self.quota_exhausted:
+                return
+            entry.sha256, text, error = await loop.run_in_executor(pool, read_resume, entry.path)
+            if error:
+                self._record(entry, STATUS_FAILED, error=error)
+                continue
+            candidate_id = self.checkpoint.imported_candidate(entry.sha256)
+            if candidate_id is not None:
+                self._record(entry, STATUS_DUPLICATE, candidate_id=candidate_id)
+                continue
+            await extracted.put((entry, text))
+
+    async def _extract(self, extracted, profiles):
+        from agent_Siya import LLMQuotaExceeded
+
+        processor = self.processor_factory(None)
+        while (work := await extracted.get()) is not _STOP:
+            if self.quota_exhausted:
+                # Left pending in the checkpoint; the next run picks it up
+                continue
+            entry, text = work
+            try:
+                cv_data = await asyncio.to_thread(processor.extract_profile, text)
+            except LLMQuotaExceeded:
+                self.quota_exhausted = True
+                continue
+            if cv_data is None:
+                self._record(entry, STATUS_FAILED, error="CV processing failed")
+            else:
+                await profiles.put((entry, cv_data))
+
+    async def _store(self, profiles, db_connection):
+        processor = self.processor_factory(db_connection)
+        try:
+            while (work := await profiles.get()) is not _STOP:
+                entry, cv_data = work
+                try:
+                    candidate_id, status = await asyncio.to_thread(processor.store, cv_data)
+                except Exception as e:
+                    self._record(entry, STATUS_FAILED, error=f"Store failed: {e}")
+                    continue
+                if not candidate_id:
+                    self._record(entry, STATUS_FAILED, error="Store failed")
+                else:
+                    self._record(entry, STATUS_UNCHANGED if status == UPSERT_UNCHANGED else STATUS_IMPORTED,
+                                 candidate_id=candidate_id)
+        finally:
+            processor.db_connection.close()
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            print(self.progress.line(), flush=True)
+
+    async def run(self, files):
+        self.progress = Progress(len(files))
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.llm_concurrency + self.store_concurrency))
+        extracted = asyncio.Queue(maxsize=self.llm_concurrency * 2)
+        profiles = asyncio.Queue(maxsize=self.store_concurrency * 2)
+        iterator = iter(files)
+        # Connected up front, so a database problem fails the run before any LLM call
+        connections = [await asyncio.to_thread(self.connect_db) for _ in range(self.store_concurrency)]
+        reporter = asyncio.create_task(self._report())
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            try:
+                extractors = [asyncio.create_task(self._extract(extracted, profiles))
+                              for _ in range(self.llm_concurrency)]
+                stores = [asyncio.create_task(self._store(profiles, db_connection)) for db_connection in connections]
+                # Parsers share one iterator, so each file is taken by exactly one of them
+                await asyncio.gather(*(self._parse(pool, iterator, extracted) for _ in range(self.parse_workers)))
+                for _ in extractors:
+                    await extracted.put(_STOP)
+                await asyncio.gather(*extractors)
+                for _ in stores:
+                    await profiles.put(_STOP)
+                await asyncio.gather(*stores)
+            finally:
+                reporter.cancel()
+        print(self.progress.line(), flush=True)
+        return self.progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a directory tree of resumes, resumably")
+    parser.add_argument("directory", nargs="?", help="Directory searched recursively for .pdf/.docx files")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint database (SQLite file)")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 2, help="Parser processes")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Concurrent LLM extractions")
+    parser.add_argument("--store-concurrency", type=int, default=2, help="Concurrent database writers")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files recorded as failed")
+    parser.add_argument("--limit", type=int, help="Import at most this many files in this run")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument("--status", action="store_true", help="Print the checkpoint summary and exit")
+    parser.add_argument("--verbose", action="store_true", help="Log every file at INFO")
+    args = parser.parse_args()
+
+    checkpoint = ImportCheckpoint(args.checkpoint)
+    try:
+        if args.status:
+            for status, count in checkpoint.summary().items():
+                print(f"{status:<10} {count}")
+            return 0
+        if not args.directory:
+            parser.error("directory is required")
+
+        # Imported here, so the parser processes only load docsParser
+        from app_logging import configure_logging
+        from config import DatabaseConfig, OllamaConfig
+        from cv_Processor import CVProcessor
+        from storage import connect
+        from uploads import max_upload_bytes
+
+        configure_logging()
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        files, too_large = scan(args.directory, checkpoint, max_upload_bytes(), args.retry_failed)
+        for entry in too_large:
+            checkpoint.record(entry.path, entry.size, entry.mtime, STATUS_SKIPPED, error="File too large")
+        if args.limit:
+            files = files[:args.limit]
+        print(f"📂 {len(files)} file(s) to import ({len(too_large)} too large, skipped)", flush=True)
+        if not files:
+            return 0
+
+        model = OllamaConfig.from_env().model
+        importer = BulkImporter(
+            checkpoint,
+            # No rule-based fallback: an offline backfill waits for the LLM (quota stop, --retry-failed)
+            processor_factory=lambda db_connection: CVProcessor(model=model, db_connection=db_connection, fallback=False),
+            connect_db=lambda: connect(DatabaseConfig.from_env()),
+            parse_workers=args.parse_workers,
+            llm_concurrency=args.llm_concurrency,
+            store_concurrency=args.store_concurrency,
+            progress_interval=args.progress_interval
+        )
+        asyncio.run(importer.run(files))
+        if importer.quota_exhausted:
+            print("⏳ Gemini quota exhausted; re-run the same command later to continue", flush=True)
+            return EXIT_QUOTA_EXHAUSTED
+        print("✅ Import finished", flush=True)
+        return 0
+    finally:
+        checkpoint.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
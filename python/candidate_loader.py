@@ -0,0 +1,194 @@
+# candidate_loader.py
+"""
+Loads full candidate profiles (candidate row plus every child table) in a single
+round trip, with an in-process LRU cache in front of it.
+
+The child tables are folded into the candidate row with correlated JSON aggregation
+subqueries, so loading one profile, or a few hundred for ranking and re-screening,
+is one query instead of one per table per candidate.
+
+The cache is per process. db_insert invalidates entries on every write made through
+this process; writes from other workers become visible when their entries are evicted.
+"""
+import copy
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Upper bound on ids per bulk query, to keep the IN (...) list reasonable
+BULK_LOAD_CHUNK_SIZE = 500
+
+PROFILE_SELECT = """
+    SELECT c.*,
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT('id', cs.skill_id, 'name', d.normalized_name, 'raw', cs.raw_skill))
+         FROM candidate_skills cs JOIN skill_dictionary d ON d.id = cs.skill_id
+         WHERE cs.candidate_id = c.id) AS skills_json,
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT(
+            'title', e.title, 'company', e.company, 'start_date', e.start_date,
+            'end_date', e.end_date, 'description', e.description))
+         FROM experience e WHERE e.candidate_id = c.id) AS experience_json,
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT(
+            'institute', ed.institute, 'degree', ed.degree,
+            'start_date', ed.start_date, 'end_date', ed.end_date))
+         FROM education ed WHERE ed.candidate_id = c.id) AS education_json,
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT('title', p.title, 'description', p.description))
+         FROM projects p WHERE p.candidate_id = c.id) AS projects_json,
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT('skill', ss.skill, 'strength_level', ss.strength_level))
+         FROM soft_skills ss WHERE ss.candidate_id = c.id) AS soft_skills_json,
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT(
+            'gap_start', g.gap_start, 'gap_end', g.gap_end,
+            'gap_duration_in_months', g.gap_duration_in_months, 'reason', g.reason))
+         FROM employment_gaps g WHERE g.candidate_id = c.id) AS employment_gaps_json,
+        (SELECT JSON_OBJECT(
+            'tech_score', m.tech_score, 'communication_score', m.communication_score,
+            'ai_fit_score', m.ai_fit_score, 'overall_score', m.overall_score)
+         FROM scoring_metrics m WHERE m.candidate_id = c.id
+         ORDER BY m.id DESC LIMIT 1) AS scoring_json
+    FROM candidates c
+"""
+
+# (aggregated column, profile key, value when the candidate has no rows)
+AGGREGATED_COLUMNS = (
+    ("skills_json", "skills", list),
+    ("experience_json", "experience", list),
+    ("education_json", "education", list),
+    ("projects_json", "projects", list),
+    ("soft_skills_json", "soft_skills", list),
+    ("employment_gaps_json", "employment_gaps", list),
+    ("scoring_json", "scoring", dict),
+)
+
+
+class CandidateCache:
+    """Thread-safe, bounded LRU cache of candidate profiles keyed by candidate id."""
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_size=int(os.getenv("CANDIDATE_CACHE_SIZE", 1024)))
+
+    def get(self, candidate_id):
+        with self._lock:
+            profile = self._entries.get(candidate_id)
+            if profile is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(candidate_id)
+            self.hits += 1
+        # Callers are free to mutate what they get back
+        return copy.deepcopy(profile)
+
+    def put(self, candidate_id, profile):
+        if self.max_size <= 0:
+            return
+        profile = copy.deepcopy(profile)
+        with self._lock:
+            self._entries[candidate_id] = profile
+            self._entries.move_to_end(candidate_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, candidate_id):
+        with self._lock:
+            self._entries.pop(candidate_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+candidate_cache = CandidateCache.from_env()
+
+
+def invalidate_candidate(candidate_id):
+    """Drops a candidate from the read cache; called after every write to its rows."""
+    candidate_cache.invalidate(candidate_id)
+
+
+def _decode_json(value, default):
+    if value is None:
+        return default()
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def row_to_profile(row):
+    """Turns one PROFILE_SELECT row into a profile dict."""
+    profile = dict(row)
+    for column, key, default in AGGREGATED_COLUMNS:
+        profile[key] = _decode_json(profile.pop(column, None), default)
+
+    # skills arrive as [{id, name, raw}]; expose the original spellings as before, plus
+    # the normalized names (for matching) and dictionary ids
+    skill_rows = sorted(profile["skills"], key=lambda skill: skill["id"])
+    profile["skills"] = [skill["raw"] or skill["name"] for skill in skill_rows]
+    profile["skill_ids"] = [skill["id"] for skill in skill_rows]
+    profile["normalized_skills"] = {skill["name"]: skill["raw"] or skill["name"] for skill in skill_rows}
+    return profile
+
+
+def profile_queries(candidate_ids):
+    """Yields (sql, params) loading the given candidates, BULK_LOAD_CHUNK_SIZE ids at a time."""
+    for start in range(0, len(candidate_ids), BULK_LOAD_CHUNK_SIZE):
+        chunk = candidate_ids[start:start + BULK_LOAD_CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        yield f"{PROFILE_SELECT} WHERE c.id IN ({placeholders})", tuple(chunk)
+
+
+def _fetch_profiles(db_connection, candidate_ids):
+    profiles = {}
+    cursor = db_connection.cursor(dictionary=True)
+    try:
+        for sql, params in profile_queries(candidate_ids):
+            cursor.execute(sql, params)
+            for row in cursor.fetchall():
+                profile = row_to_profile(row)
+                profiles[profile["id"]] = profile
+    finally:
+        cursor.close()
+    return profiles
+
+
+def load_candidate_profile(db_connection, candidate_id, use_cache=True):
+    """Returns the full profile for one candidate (None if it doesn't exist)."""
+    if use_cache:
+        profile = candidate_cache.get(candidate_id)
+        if profile is not None:
+            return profile
+
+    profile = _fetch_profiles(db_connection, [candidate_id]).get(candidate_id)
+    if profile is not None and use_cache:
+        candidate_cache.put(candidate_id, profile)
+    return profile
+
+
+def load_candidate_profiles(db_connection, candidate_ids, use_cache=True):
+    """
+    Bulk variant of load_candidate_profile for ranking and re-screening.
+    Returns {candidate_id: profile}; ids that don't exist are left out.
+    """
+    profiles = {}
+    missing = []
+    for candidate_id in dict.fromkeys(candidate_ids):
+        profile = candidate_cache.get(candidate_id) if use_cache else None
+        if profile is None:
+            missing.append(candidate_id)
+        else:
+            profiles[candidate_id] = profile
+
+    if missing:
+        fetched = _fetch_profiles(db_connection, missing)
+        for candidate_id, profile in fetched.items():
+            if use_cache:
+                candidate_cache.put(candidate_id, profile)
+            profiles[candidate_id] = profile
+    return profiles
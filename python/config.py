@@ -4,12 +4,20 @@ from dotenv import load_dotenv
 load_dotenv()  # Load variables from .env file if present
 
 class DatabaseConfig:
-    def __init__(self, host, port, user, password, database):
+    def __init__(self, host, port, user, password, database, driver="sync", pool_min_size=1, pool_max_size=10,
+                 backend="mysql", sqlite_path="cih2.db"):
         self.host = host
         self.port = int(port)
         self.user = user
         self.password = password
         self.database = database
+        # "sync" (mysql.connector, one connection per request) or "async" (aiomysql pool)
+        self.driver = driver
+        self.pool_min_size = int(pool_min_size)
+        self.pool_max_size = int(pool_max_size)
+        # "mysql" (server) or "sqlite" (embedded file at sqlite_path), see storage.py
+        self.backend = backend
+        self.sqlite_path = sqlite_path
 
     @classmethod
     def from_env(cls):
@@ -18,7 +26,12 @@ class DatabaseConfig:
             port=os.getenv("DB_PORT", 3306),
             user=os.getenv("DB_USER", "root"),
             password=os.getenv("DB_PASSWORD", "root"),
-            database=os.getenv("DB_NAME", "CIH2")
+            database=os.getenv("DB_NAME", "CIH2"),
+            driver=os.getenv("DB_DRIVER", "sync").lower(),
+            pool_min_size=os.getenv("DB_POOL_MIN_SIZE", 1),
+            pool_max_size=os.getenv("DB_POOL_MAX_SIZE", 10),
+            backend=os.getenv("DB_BACKEND", "mysql").lower(),
+            sqlite_path=os.getenv("SQLITE_PATH", "cih2.db")
         )
 
 class OllamaConfig:
@@ -31,14 +44,19 @@ class OllamaConfig:
             model=os.getenv("OLLAMA_MODEL", "llama3")
         )
 
+DEFAULT_LOG_FORMAT = "%(asctime)s - %(levelname)s - [%(request_id)s] %(name)s - %(message)s"
+
 class AppConfig:
-    def __init__(self, log_level="INFO", log_format="%(asctime)s - %(levelname)s - %(message)s"):
+    def __init__(self, log_level="INFO", log_format=DEFAULT_LOG_FORMAT, log_json=False):
         self.log_level = log_level
         self.log_format = log_format
+        # One JSON object per line (for log shippers) instead of log_format
+        self.log_json = log_json
 
     @classmethod
     def from_env(cls):
         return cls(
             log_level=os.getenv("LOG_LEVEL", "INFO"),
-            log_format=os.getenv("LOG_FORMAT", "%(asctime)s - %(levelname)s - %(message)s")
+            log_format=os.getenv("LOG_FORMAT", DEFAULT_LOG_FORMAT),
+            log_json=os.getenv("LOG_JSON", "false").lower() == "true"
         )
@@ -1,29 +1,45 @@
 import os
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from docsParser import parse_file
-from agent_Siya import query_gemini_cv_parser
+from agent_Siya import LLMQuotaExceeded, extract_cv_data
+from db_insert import upsert_structured_cv_data
+from metrics import EXTRACTION_FALLBACKS, span
+from rule_extractor import extract_profile_by_rules
+from cv_chunking import (
+    EXTRACTION_MODE_AUTO, EXTRACTION_MODE_CHUNKED, SINGLE_PROMPT_CHARS,
+    compact_text, extraction_mode, merge_profiles, split_chunks
+)
 
+logger = logging.getLogger(__name__)
 
-class CVProcessor:
-    def __init__(self, model: str, db_connection):
-        self.model = model
-        self.db_connection = db_connection
+DEFAULT_EXTRACTION_DEADLINE_SECONDS = 20.0
 
-    def process(self, file_path: str):
-        if not os.path.exists(file_path):
-            print(f"❌ File not found: {file_path}")
-            return False
+# LLM extractions run here so their deadline can be enforced. A call that overruns keeps
+# its worker until Gemini answers, so when the API hangs the pool fills up and later
+# extractions wait out their deadline in the queue, then fall back as well.
+_extraction_pool = ThreadPoolExecutor(max_workers=int(os.getenv("EXTRACTION_WORKERS", 32)),
+                                      thread_name_prefix="cv-extract")
 
-        print(f"\n📄 Parsing file: {file_path}")
-        cv_content = parse_file(file_path)
 
-        if not cv_content or not cv_content.strip():
-            print("❌ No content extracted from file.")
-            return False
+def extraction_deadline():
+    """Seconds the LLM extraction may take before the rule-based fallback answers; 0 disables it."""
+    return float(os.getenv("EXTRACTION_DEADLINE_SECONDS", DEFAULT_EXTRACTION_DEADLINE_SECONDS))
 
-        print(f"✅ Extracted {len(cv_content)} characters.")
-        print("\n🤖 Sending to Ollama for structured CV extraction...\n")
 
-        prompt = f"""
+class CVProcessor:
+    def __init__(self, model: str, db_connection, fallback: bool = None):
+        self.model = model
+        self.db_connection = db_connection
+        # Answer with the rule-based extractor when the LLM times out or fails (EXTRACTION_FALLBACK)
+        self.fallback = (os.getenv("EXTRACTION_FALLBACK", "true").lower() == "true") if fallback is None else fallback
+        # Set by process(): the stored candidate and whether the row was inserted/updated/unchanged
+        self.candidate_id = None
+        self.upsert_status = None
+
+    def build_prompt(self, cv_content: str, limit=SINGLE_PROMPT_CHARS):
+        return f"""
 You must respond with ONLY valid JSON. No other text, no explanations, no markdown.
 
 Extract information from this resume and return it in this EXACT JSON format:
@@ -81,13 +97,174 @@ Extract information from this resume and return it in this EXACT JSON format:
 }}
 
 Resume Content:
-{cv_content[:2000]}
+{cv_content[:limit]}
+
+Respond with ONLY the JSON object, nothing else.
+"""
+
+    def build_section_prompt(self, chunk: str, part: int, parts: int):
+        """Narrower prompt for a later chunk of a long resume: only the list sections."""
+        return f"""
+You must respond with ONLY valid JSON. No other text, no explanations, no markdown.
+
+This is part {part} of {parts} of a resume. Extract only what appears in this part and
+return it in this EXACT JSON format, with empty lists for sections that do not appear:
+
+{{
+  "experience": [
+    {{
+      "title": "Job Title",
+      "company": "Company Name",
+      "start_date": "YYYY-MM-DD",
+      "end_date": "YYYY-MM-DD",
+      "description": "Job description"
+    }}
+  ],
+  "education": [
+    {{
+      "institute": "University Name",
+      "degree": "Degree Name",
+      "start_date": "YYYY-MM-DD",
+      "end_date": "YYYY-MM-DD"
+    }}
+  ],
+  "skills": ["skill1", "skill2", "skill3"],
+  "soft_skills": [
+    {{
+      "skill": "Communication",
+      "strength_level": "High"
+    }}
+  ],
+  "projects": [
+    {{
+      "title": "Project Name",
+      "description": "Project description"
+    }}
+  ],
+  "employment_gaps": []
+}}
+
+Resume Content:
+{chunk}
 
 Respond with ONLY the JSON object, nothing else.
 """
+
+    def extract(self, source, filename: str = None):
+        """
+        Parses the resume and extracts the structured profile, without storing it.
+        `source` is a path or an in-memory/spooled file (see docsParser.parse_file), with
+        `filename` giving its type. Returns the profile dict, or None when parsing or
+        extraction fails.
+        """
+        cv_content = self.read_text(source, filename)
+        if cv_content is None:
+            return None
+        return self.extract_profile(cv_content)
+
+    def read_text(self, source, filename: str = None):
+        """Parses the resume into text; returns None when there is nothing to extract from."""
+        filename = filename or source
+        if isinstance(source, str) and not os.path.exists(source):
+            logger.error("❌ File not found: %s", source)
+            return None
+
+        logger.info("📄 Parsing file: %s", filename)
+        with span("parse_file"):
+            cv_content = parse_file(source, filename)
+
+        if not cv_content or not cv_content.strip():
+            logger.error("❌ No content extracted from file: %s", filename)
+            return None
+        return cv_content
+
+    def extract_profile(self, cv_content: str):
+        """
+        Returns the structured profile for parsed resume text. The LLM extraction runs under
+        EXTRACTION_DEADLINE_SECONDS; when it times out, fails or hits the quota, the
+        rule-based extractor answers with a partial profile marked for enrichment. Without
+        fallback, failures return None and an exhausted quota raises LLMQuotaExceeded.
+        """
+        logger.info("✅ Extracted %d characters, sending for structured CV extraction", len(cv_content))
+        cv_content = compact_text(cv_content)
+        deadline = extraction_deadline()
+        reason = "failed"
         try:
-            query_gemini_cv_parser(prompt=prompt,  db_connection=self.db_connection)
-            return True
+            if deadline > 0:
+                future = _extraction_pool.submit(contextvars.copy_context().run, self.extract_with_llm, cv_content)
+                try:
+                    profile = future.result(timeout=deadline)
+                except FutureTimeoutError:
+                    future.cancel()
+                    logger.warning("⏱️ LLM extraction missed its %.1fs deadline", deadline)
+                    profile, reason = None, "timeout"
+            else:
+                profile = self.extract_with_llm(cv_content)
+        except LLMQuotaExceeded:
+            if not self.fallback:
+                raise
+            profile, reason = None, "quota"
         except Exception as e:
-            print(f"❌ Failed to process CV via Ollama: {e}")
+            logger.error("❌ Failed to extract structured CV data: %s", e)
+            profile = None
+
+        if profile is None and self.fallback:
+            return self.extract_by_rules(cv_content, reason)
+        return profile
+
+    def extract_with_llm(self, cv_content: str):
+        mode = extraction_mode()
+        if mode == EXTRACTION_MODE_CHUNKED or (mode == EXTRACTION_MODE_AUTO and len(cv_content) > SINGLE_PROMPT_CHARS):
+            return self.extract_chunked(cv_content)
+        return extract_cv_data(self.build_prompt(cv_content))
+
+    def extract_by_rules(self, cv_content: str, reason: str):
+        EXTRACTION_FALLBACKS.inc(reason)
+        logger.warning("🧩 Falling back to rule-based extraction (%s); candidate marked for enrichment", reason)
+        with span("rule_extraction"):
+            return extract_profile_by_rules(cv_content)
+
+    def extract_chunked(self, cv_content: str):
+        """
+        Map-reduce extraction for long resumes (see cv_chunking): one LLM call per chunk,
+        all in parallel, merged in chunk order. Returns None when the first chunk, which
+        holds the contact details, cannot be extracted.
+        """
+        chunks = split_chunks(cv_content)
+        prompts = [self.build_prompt(chunks[0], limit=None)] + [
+            self.build_section_prompt(chunk, part, len(chunks)) for part, chunk in enumerate(chunks[1:], start=2)
+        ]
+        logger.info("✂️ Extracting %d characters as %d chunks in parallel", len(cv_content), len(chunks))
+        with ThreadPoolExecutor(max_workers=len(prompts), thread_name_prefix="cv-chunk") as executor:
+            # Each call keeps the request's context: log correlation id, timings, profiling
+            futures = [executor.submit(contextvars.copy_context().run, extract_cv_data, prompt) for prompt in prompts]
+            parts = [future.result() for future in futures]
+
+        if parts[0] is None:
+            logger.error("❌ Failed to extract the first chunk of the resume")
+            return None
+        missing = [part for part, data in enumerate(parts, start=1) if data is None]
+        if missing:
+            logger.warning("⚠️ Resume chunk(s) %s could not be extracted; merging the rest", missing)
+        with span("merge_chunks"):
+            return merge_profiles(parts)
+
+    def process(self, source, filename: str = None):
+        json_data = self.extract(source, filename)
+        if json_data is None:
             return False
+
+        if self.db_connection:
+            candidate_id, _ = self.store(json_data)
+            return bool(candidate_id)
+        logger.warning("⚠️ No DB connection passed. Skipped DB insert.")
+        return True
+
+    def store(self, json_data):
+        """Upserts an extracted profile; returns (candidate_id, upsert status), (False, None) on failure."""
+        with span("insert_candidate"):
+            candidate_id, status = upsert_structured_cv_data(json_data, self.db_connection)
+        if candidate_id:
+            logger.debug("✅ Data successfully stored in the database")
+            self.candidate_id, self.upsert_status = candidate_id, status
+        return candidate_id, status
@@ -0,0 +1,199 @@
+# cv_chunking.py
+"""
+Map-reduce extraction helpers for long resumes.
+
+The single extraction prompt only has room for the first SINGLE_PROMPT_CHARS of a
+resume. Longer resumes are compacted, split at line boundaries into at most
+EXTRACTION_MAX_CHUNKS chunks (at section headings where possible), and each chunk is
+extracted by its own LLM call, all in parallel. The first chunk also asks for the
+contact details and scores. merge_profiles() then combines the partial results in
+chunk order, so the same chunk outputs always merge to the same profile:
+
+- scalar fields: the first non-empty value
+- skills: deduplicated by normalized name (aliases included)
+- experience, education, projects, soft skills and gaps: deduplicated by their
+  identifying fields; for a job seen in two chunks the longer description wins
+- education_gap / work_gap: true if any chunk says so
+- total_experience: the union of the merged experience date ranges, or the largest
+  value a chunk reported when the dates cannot be parsed
+"""
+import json
+import os
+import re
+from datetime import date
+
+from db_insert import parse_date
+from FilterAndTestLink import normalize_skill
+
+SINGLE_PROMPT_CHARS = 2000
+DEFAULT_CHUNK_CHARS = 3000
+DEFAULT_MAX_CHUNKS = 8
+
+EXTRACTION_MODE_AUTO = "auto"
+EXTRACTION_MODE_SINGLE = "single"
+EXTRACTION_MODE_CHUNKED = "chunked"
+EXTRACTION_MODES = (EXTRACTION_MODE_AUTO, EXTRACTION_MODE_SINGLE, EXTRACTION_MODE_CHUNKED)
+
+# Lines that open a resume section; a chunk boundary is preferred just before one
+SECTION_HEADING = re.compile(
+    r"(?:professional\s+|work\s+|academic\s+|technical\s+|key\s+)?"
+    r"(?:summary|profile|objective|experience|employment|work\s+history|education|qualifications|"
+    r"skills|competencies|projects|publications|research|teaching|certifications?|awards|"
+    r"achievements|languages|interests|references|volunteering)\s*:?",
+    re.IGNORECASE
+)
+
+SCALAR_FIELDS = ("name", "role", "email", "phone", "location", "github_url", "linkedin_url",
+                 "portfolio_url", "summary", "scoring")
+# List fields and the keys identifying one entry
+LIST_KEYS = {
+    "experience": ("title", "company", "start_date"),
+    "education": ("institute", "degree"),
+    "projects": ("title",),
+    "soft_skills": ("skill",),
+    "employment_gaps": None,  # whole entry
+}
+
+
+def extraction_mode():
+    mode = os.getenv("EXTRACTION_MODE", EXTRACTION_MODE_AUTO).lower()
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown EXTRACTION_MODE '{mode}': must be one of {', '.join(EXTRACTION_MODES)}")
+    return mode
+
+
+def chunk_chars():
+    return int(os.getenv("EXTRACTION_CHUNK_CHARS", DEFAULT_CHUNK_CHARS))
+
+
+def max_chunks():
+    return int(os.getenv("EXTRACTION_MAX_CHUNKS", DEFAULT_MAX_CHUNKS))
+
+
+def compact_text(text):
+    """Collapses runs of spaces and tabs, strips lines and keeps at most one blank line in a row."""
+    lines = []
+    for line in text.splitlines():
+        line = re.sub(r"[ \t\u00a0]+", " ", line).strip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def _is_heading(line):
+    return len(line) <= 40 and SECTION_HEADING.fullmatch(line.strip(" -:•|").strip()) is not None
+
+
+def split_chunks(text, size=None, limit=None):
+    """
+    Splits compacted text into at most `limit` chunks of about `size` characters, at
+    line boundaries. A chunk that is at least half full ends early at a section heading.
+    """
+    size = size or chunk_chars()
+    limit = limit or max_chunks()
+    # Grow the chunks rather than exceed the limit, so every chunk can run in parallel
+    size = max(size, -(-len(text) // limit))
+    chunks, current, length = [], [], 0
+    for line in text.split("\n"):
+        while len(line) > size:
+            # A single overlong line (e.g. a table row) is cut hard
+            line, rest = line[:size], line[size:]
+            if current:
+                chunks.append("\n".join(current))
+                current, length = [], 0
+            chunks.append(line)
+            line = rest
+        full = length + len(line) > size
+        early = _is_heading(line) and length >= size // 2
+        if current and (full or early):
+            chunks.append("\n".join(current))
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _key(entry, fields):
+    if fields is None or not isinstance(entry, dict):
+        return json.dumps(entry, sort_keys=True, default=str)
+    return tuple(re.sub(r"\s+", " ", str(entry.get(field) or "")).strip().lower() for field in fields)
+
+
+def _merge_list(parts, field, key_fields):
+    merged = {}
+    for part in parts:
+        for entry in part.get(field) or []:
+            key = _key(entry, key_fields)
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = entry
+            elif isinstance(entry, dict) and isinstance(existing, dict):
+                # The same job cut across two chunks: keep the fuller description
+                if len(str(entry.get("description") or "")) > len(str(existing.get("description") or "")):
+                    merged[key] = dict(existing, description=entry["description"])
+    return list(merged.values())
+
+
+def _merge_skills(parts):
+    skills = {}
+    for part in parts:
+        for skill in part.get("skills") or []:
+            if isinstance(skill, str) and skill.strip():
+                skills.setdefault(normalize_skill(skill), skill.strip())
+    return list(skills.values())
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def experience_years(experience, today=None):
+    """Years covered by the union of the experience date ranges, or None if no range parses."""
+    today = today or date.today()
+    ranges = []
+    for entry in experience:
+        if not isinstance(entry, dict):
+            continue
+        start = parse_date(entry.get("start_date"))
+        if start is None:
+            continue
+        end = parse_date(entry.get("end_date")) or today
+        if end > start:
+            ranges.append((start, end))
+    if not ranges:
+        return None
+    days = 0
+    current_start, current_end = None, None
+    for start, end in sorted(ranges):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                days += (current_end - current_start).days
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    days += (current_end - current_start).days
+    return round(days / 365.25, 1)
+
+
+def merge_profiles(parts):
+    """Combines partial profiles (in chunk order) into one profile dict."""
+    parts = [part for part in parts if isinstance(part, dict)]
+    merged = {}
+    for field in SCALAR_FIELDS:
+        merged[field] = next((part[field] for part in parts if part.get(field)), None)
+    if merged["scoring"] is None:
+        del merged["scoring"]
+    merged["skills"] = _merge_skills(parts)
+    for field, key_fields in LIST_KEYS.items():
+        merged[field] = _merge_list(parts, field, key_fields)
+    merged["education_gap"] = any(bool(part.get("education_gap")) for part in parts)
+    merged["work_gap"] = any(bool(part.get("work_gap")) for part in parts)
+    reported = [value for value in (_as_float(part.get("total_experience")) for part in parts) if value is not None]
+    total = experience_years(merged["experience"])
+    merged["total_experience"] = total if total is not None else (max(reported) if reported else None)
+    return merged
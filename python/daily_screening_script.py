@@ -1,9 +1,13 @@
 import mysql.connector
 import os
+import socket
+import uuid
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+
+from storage import BACKEND_SQLITE, DATABASE_ERRORS, connect_sqlite
 
 # Moved load_dotenv to main.py, as main.py will be the primary entry point
 # from dotenv import load_dotenv
@@ -16,6 +20,8 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'root'),
     'database': os.getenv('DB_NAME', 'cih2')
 }
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'cih2.db')
 
 # --- Email Configuration ---
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -28,40 +34,98 @@ EMAIL_PASSWORD = os.getenv('SENDER_PASSWORD', 'odwf ejzv ypuc npbv') # Ensure th
 # In production, this would be your deployed frontend URL (e.g., 'https://your-app.com')
 FRONTEND_BASE_URL = os.getenv('FRONTEND_BASE_URL', 'http://localhost:5173')
 
-def get_completed_assessments_for_today():
+# --- Lease Configuration ---
+# Several screening workers may run side by side. Each one claims a batch of rows
+# by stamping claimed_by/claimed_until (columns added by migrations.py); a crashed
+# worker's rows become claimable again once its lease expires.
+WORKER_ID = os.getenv('SCREENING_WORKER_ID', f"{socket.gethostname()}:{os.getpid()}")
+LEASE_SECONDS = int(os.getenv('SCREENING_LEASE_SECONDS', 300))
+CLAIM_BATCH_SIZE = int(os.getenv('SCREENING_CLAIM_BATCH_SIZE', 50))
+
+# --- Sweep Configuration ---
+# Screening emails are normally triggered as soon as an assessment is submitted
+# (see screening_trigger.py). The daily run is a reconciliation sweep that picks
+# up anything the trigger missed within the lookback window.
+SWEEP_LOOKBACK_DAYS = int(os.getenv('SCREENING_SWEEP_LOOKBACK_DAYS', 1))
+
+def connect_to_db():
+    """Connects to MySQL, or to the embedded SQLite database when DB_BACKEND=sqlite."""
+    if DB_BACKEND == BACKEND_SQLITE:
+        return connect_sqlite(SQLITE_PATH)
+    return mysql.connector.connect(**DB_CONFIG)
+
+def claim_unscreened_assessments(assessment_uuids=None, since=None, worker_id=WORKER_ID,
+                                 batch_size=CLAIM_BATCH_SIZE, lease_seconds=LEASE_SECONDS):
     """
-    Connects to the database and fetches assessments completed today
-    that haven't had a screening email sent yet.
+    Claims completed assessments that haven't had a screening email sent yet and
+    aren't leased by another worker, and returns the claimed rows.
+
+    Either claims the given assessment_uuids (event-driven path) or up to
+    batch_size assessments completed on or after `since` (sweep path).
+
+    Leases are stamped and compared on the database clock, so workers on hosts with
+    skewed clocks never take each other's live leases.
     """
     conn = None
     cursor = None
-    assessments_to_screen = []
-    today = date.today()
+    claimed_assessments = []
+    # A fresh token per batch, so rows this worker failed to send earlier (and still
+    # holds until their lease expires) are not handed back in the same run.
+    claim_token = f"{worker_id}/{uuid.uuid4().hex[:12]}"
 
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = connect_to_db()
         cursor = conn.cursor(dictionary=True)
 
-        query = """
+        if assessment_uuids is not None:
+            candidate_uuids = list(assessment_uuids)
+        else:
+            cursor.execute("""
+                SELECT assessment_uuid
+                FROM assessment
+                WHERE status = 'completed'
+                AND end_time >= %s
+                AND screening_email_sent = FALSE
+                AND (claimed_until IS NULL OR claimed_until < NOW())
+                ORDER BY end_time
+                LIMIT %s;
+            """, (since, batch_size))
+            candidate_uuids = [row['assessment_uuid'] for row in cursor.fetchall()]
+
+        if not candidate_uuids:
+            return claimed_assessments
+
+        # The lease condition is re-checked under the row lock taken by UPDATE, so when
+        # two workers race for the same rows only one of them wins each row.
+        placeholders = ', '.join(['%s'] * len(candidate_uuids))
+        cursor.execute(f"""
+            UPDATE assessment
+            SET claimed_by = %s, claimed_until = NOW() + INTERVAL %s SECOND
+            WHERE assessment_uuid IN ({placeholders})
+            AND status = 'completed'
+            AND screening_email_sent = FALSE
+            AND (claimed_until IS NULL OR claimed_until < NOW());
+        """, (claim_token, lease_seconds, *candidate_uuids))
+        conn.commit()
+
+        cursor.execute("""
             SELECT assessment_uuid, candidate_id, candidate_email, job_title, score
             FROM assessment
-            WHERE status = 'completed'
-            AND DATE(end_time) = %s
-            AND screening_email_sent = FALSE;
-        """
-        cursor.execute(query, (today,))
-        assessments_to_screen = cursor.fetchall()
-        
-        print(f"[SCREENING SERVICE] Found {len(assessments_to_screen)} assessments completed today ({today}) not yet screened.")
+            WHERE claimed_by = %s;
+        """, (claim_token,))
+        claimed_assessments = cursor.fetchall()
+
+        print(f"[SCREENING SERVICE] Worker {worker_id} claimed {len(claimed_assessments)} of {len(candidate_uuids)} unscreened assessments, lease {lease_seconds}s.")
 
-    except mysql.connector.Error as err:
+    except DATABASE_ERRORS as err:
         print(f"[SCREENING SERVICE] Database error: {err}")
+        if conn: conn.rollback()
     finally:
         if cursor:
             cursor.close()
         if conn:
             conn.close()
-    return assessments_to_screen
+    return claimed_assessments
 
 def update_screening_status(assessment_uuid):
     """
@@ -70,17 +134,17 @@ def update_screening_status(assessment_uuid):
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = connect_to_db()
         cursor = conn.cursor()
         query = """
             UPDATE assessment
-            SET screening_email_sent = TRUE
+            SET screening_email_sent = TRUE, claimed_by = NULL, claimed_until = NULL
             WHERE assessment_uuid = %s;
         """
         cursor.execute(query, (assessment_uuid,))
         conn.commit()
         print(f"[SCREENING SERVICE] Updated screening status for {assessment_uuid}")
-    except mysql.connector.Error as err:
+    except DATABASE_ERRORS as err:
         print(f"[SCREENING SERVICE] Error updating screening status for {assessment_uuid}: {err}")
         if conn: conn.rollback() # Rollback on error
     finally:
@@ -153,38 +217,70 @@ def send_screening_email(recipient_email, candidate_name, job_title, assessment_
         print(f"[SCREENING SERVICE] Failed to send email to {recipient_email} for {assessment_uuid}: {e}")
         return False
 
+def screen_claimed_assessment(assessment):
+    """
+    Sends the screening email for an assessment this worker has claimed and
+    marks it as screened. Returns True if the email went out.
+    """
+    candidate_name = assessment.get('candidate_id', 'Candidate') 
+    recipient_email = assessment.get('candidate_email')
+    job_title = assessment.get('job_title')
+    assessment_uuid = assessment.get('assessment_uuid')
+
+    if not (recipient_email and job_title and assessment_uuid):
+        print(f"[SCREENING SERVICE] Skipping assessment {assessment_uuid} due to missing email, job title, or UUID.")
+        return False
+
+    print(f"[SCREENING SERVICE] Processing assessment {assessment_uuid} for {recipient_email} ({job_title})...")
+    email_sent_successfully = send_screening_email(
+        recipient_email,
+        candidate_name,
+        job_title,
+        assessment_uuid
+    )
+    if email_sent_successfully:
+        update_screening_status(assessment_uuid)
+    return email_sent_successfully
+
+def screen_assessment(assessment_uuid):
+    """
+    Event-driven entry point: claims a single just-completed assessment and sends
+    its screening email. A no-op if it isn't completed, was already screened, or
+    another worker holds the lease.
+    """
+    claimed = claim_unscreened_assessments(assessment_uuids=[assessment_uuid])
+    if not claimed:
+        print(f"[SCREENING SERVICE] Assessment {assessment_uuid} not claimable (not completed, already screened or leased).")
+        return False
+    return screen_claimed_assessment(claimed[0])
+
 # --- Core function to be imported ---
 def perform_daily_screening():
     """
-    Orchestrates the daily process of finding completed assessments
-    and sending screening emails.
+    Orchestrates the daily reconciliation sweep: finds completed assessments
+    within the lookback window that still have no screening email and sends them.
+
+    Safe to run on several hosts at once: rows are claimed in leased batches,
+    so each assessment is emailed by exactly one worker. Rows whose email
+    failed stay leased until expiry and are retried by a later run.
     """
-    print(f"[SCREENING SERVICE] Starting daily screening process at {datetime.now()}")
-    
-    completed_assessments = get_completed_assessments_for_today()
+    print(f"[SCREENING SERVICE] Starting daily screening process at {datetime.now()} (worker {WORKER_ID})")
+
+    since = datetime.combine(date.today() - timedelta(days=SWEEP_LOOKBACK_DAYS), datetime.min.time())
+
+    total_claimed = 0
+    while True:
+        completed_assessments = claim_unscreened_assessments(since=since)
+        if not completed_assessments:
+            break
+        total_claimed += len(completed_assessments)
 
-    if not completed_assessments:
-        print("[SCREENING SERVICE] No new completed assessments found for screening today.")
-    else:
         for assessment in completed_assessments:
-            candidate_name = assessment.get('candidate_id', 'Candidate') 
-            recipient_email = assessment.get('candidate_email')
-            job_title = assessment.get('job_title')
-            assessment_uuid = assessment.get('assessment_uuid')
-
-            if recipient_email and job_title and assessment_uuid:
-                print(f"[SCREENING SERVICE] Processing assessment {assessment_uuid} for {recipient_email} ({job_title})...")
-                email_sent_successfully = send_screening_email(
-                    recipient_email,
-                    candidate_name,
-                    job_title,
-                    assessment_uuid
-                )
-                if email_sent_successfully:
-                    update_screening_status(assessment_uuid)
-            else:
-                print(f"[SCREENING SERVICE] Skipping assessment {assessment_uuid} due to missing email, job title, or UUID.")
-    
+            screen_claimed_assessment(assessment)
+
+    if not total_claimed:
+        print(f"[SCREENING SERVICE] No unscreened completed assessments found since {since}.")
+
     print(f"[SCREENING SERVICE] Finished daily screening process at {datetime.now()}")
 
 # If you still want to run this script standalone for testing:
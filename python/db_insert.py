@@ -1,188 +1,343 @@
-import mysql.connector
+import hashlib
+import json
+import logging
 from datetime import datetime
+from candidate_loader import invalidate_candidate
+from storage import INTEGRITY_ERRORS
+from skill_dictionary import normalize_candidate_skills, resolve_skill_ids, remember_skill_ids
+from rule_extractor import EXTRACTION_METHOD_LLM, EXTRACTION_METHOD_RULES
+
+logger = logging.getLogger(__name__)
+
+# Child tables holding per-candidate rows; replaced wholesale when a profile changes.
+CANDIDATE_CHILD_TABLES = (
+    "experience", "education", "candidate_skills", "projects",
+    "soft_skills", "employment_gaps", "scoring_metrics",
+)
+
+# Upsert outcomes returned by upsert_structured_cv_data
+UPSERT_INSERTED = "inserted"
+UPSERT_UPDATED = "updated"
+UPSERT_UNCHANGED = "unchanged"
+
+def normalize_email(email):
+    """
+    Normalize an email address for de-duplication (trim, drop mailto:, lowercase)
+    """
+    if not email:
+        return None
+    email = str(email).strip().lower()
+    if email.startswith("mailto:"):
+        email = email[len("mailto:"):]
+    return email or None
+
+def content_fingerprint(data):
+    """
+    SHA-256 over the canonical JSON of the extracted profile. The LLM's own scoring
+    is left out since it varies between runs on the same resume.
+    """
+    profile = {key: value for key, value in data.items() if key != "scoring"}
+    canonical = json.dumps(profile, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+FIND_CANDIDATE_BY_EMAIL_QUERY = """
+    SELECT id, content_fingerprint, extraction_method FROM candidates
+    WHERE email_normalized = %s
+    ORDER BY id DESC LIMIT 1
+"""
+
+FIND_CANDIDATE_BY_FINGERPRINT_QUERY = """
+    SELECT id, content_fingerprint, extraction_method FROM candidates
+    WHERE content_fingerprint = %s
+    ORDER BY id DESC LIMIT 1
+"""
+
+CANDIDATE_INSERT_QUERY = """
+    INSERT INTO candidates (name, role, summary, email, phone, location, portfolio_url,
+        github_url, linkedin_url, total_experience, education_gap, work_gap, extraction_method,
+        email_normalized, content_fingerprint, last_updated)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURDATE())
+"""
+
+CANDIDATE_UPDATE_QUERY = """
+    UPDATE candidates SET name = %s, role = %s, summary = %s, email = %s, phone = %s,
+        location = %s, portfolio_url = %s, github_url = %s, linkedin_url = %s,
+        total_experience = %s, education_gap = %s, work_gap = %s, extraction_method = %s,
+        email_normalized = %s, content_fingerprint = %s, last_updated = CURDATE()
+    WHERE id = %s
+"""
+
+CANDIDATE_SKILL_INSERT_QUERY = """
+    INSERT INTO candidate_skills (candidate_id, skill_id, raw_skill)
+    VALUES (%s, %s, %s)
+"""
+
+EXPERIENCE_INSERT_QUERY = """
+    INSERT INTO experience (candidate_id, title, company, start_date, end_date, description)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+EDUCATION_INSERT_QUERY = """
+    INSERT INTO education (candidate_id, institute, degree, start_date, end_date)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+PROJECT_INSERT_QUERY = """
+    INSERT INTO projects (candidate_id, title, description)
+    VALUES (%s, %s, %s)
+"""
+
+SOFT_SKILL_INSERT_QUERY = """
+    INSERT INTO soft_skills (candidate_id, skill, strength_level)
+    VALUES (%s, %s, %s)
+"""
+
+EMPLOYMENT_GAP_INSERT_QUERY = """
+    INSERT INTO employment_gaps (candidate_id, gap_start, gap_end, gap_duration_in_months, reason)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+SCORING_INSERT_QUERY = """
+    INSERT INTO scoring_metrics (candidate_id, tech_score, communication_score,
+    ai_fit_score, overall_score, evaluated_by_ai)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+def find_existing_candidate_query(email_normalized, fingerprint):
+    """
+    Returns (sql, params) finding the candidate a profile belongs to.
+    Matches on normalized email when there is one, otherwise on content fingerprint.
+    """
+    if email_normalized:
+        return FIND_CANDIDATE_BY_EMAIL_QUERY, (email_normalized,)
+    return FIND_CANDIDATE_BY_FINGERPRINT_QUERY, (fingerprint,)
+
+def find_existing_candidate(cursor, email_normalized, fingerprint):
+    """
+    Returns (id, content_fingerprint, extraction_method) of the candidate this profile
+    belongs to, if any.
+    """
+    cursor.execute(*find_existing_candidate_query(email_normalized, fingerprint))
+    return cursor.fetchone()
+
+def is_unchanged(existing, data, fingerprint):
+    """
+    True when the stored candidate should be kept as is: the profile is identical, or
+    it is a rule-based partial profile (LLM outage) and the stored one came from the
+    LLM, which it must not overwrite.
+    """
+    if existing[1] == fingerprint:
+        return True
+    return data.get("extraction_method") == EXTRACTION_METHOD_RULES and existing[2] != EXTRACTION_METHOD_RULES
+
+def prepare_candidate(data):
+    """
+    Returns (name, fingerprint, candidate_row) where candidate_row matches the
+    placeholders of CANDIDATE_INSERT_QUERY (and CANDIDATE_UPDATE_QUERY minus the id).
+    """
+    # FIXED: Handle the spaced name issue
+    name = data.get("name", "").replace(" ", " ").strip() if data.get("name") else None
+    email_normalized = normalize_email(data.get("email"))
+    fingerprint = content_fingerprint(data)
+    candidate_row = (
+        name,
+        data.get("role"),
+        data.get("summary"),
+        data.get("email"),
+        data.get("phone"),
+        data.get("location"),
+        data.get("portfolio_url"),
+        data.get("github_url"),
+        data.get("linkedin_url"),
+        data.get("total_experience"),
+        data.get("education_gap", False),
+        data.get("work_gap", False),
+        # "rules" marks a partial profile from the fallback extractor, awaiting LLM enrichment
+        data.get("extraction_method", EXTRACTION_METHOD_LLM),
+        email_normalized,
+        fingerprint
+    )
+    return name, fingerprint, candidate_row
+
+def build_child_rows(candidate_id, data):
+    """
+    Returns [(label, query, params)] for every child row of a profile, skills excepted
+    (those need dictionary ids, see skill_dictionary.resolve_skill_ids). Malformed
+    entries are reported and skipped rather than failing the whole profile.
+    """
+    rows = []
+
+    # Experience - FIXED: Handle None company values and date formatting
+    for exp in data.get("experience", []):
+        try:
+            end_date = parse_date(exp.get("end_date")) if exp.get("end_date") != "Present" else None
+            rows.append((f"experience {exp.get('title')}", EXPERIENCE_INSERT_QUERY, (
+                candidate_id,
+                exp.get("title"),
+                exp.get("company") if exp.get("company") else "Freelance/Self-employed",  # Handle None company
+                parse_date(exp.get("start_date")),
+                end_date,
+                exp.get("description")
+            )))
+        except Exception as e:
+            logger.warning("⚠️ Error preparing experience entry: %s", e)
+
+    # Education - FIXED: Handle date formatting
+    for edu in data.get("education", []):
+        try:
+            rows.append((f"education {edu.get('institute')}", EDUCATION_INSERT_QUERY, (
+                candidate_id,
+                edu.get("institute"),
+                edu.get("degree"),
+                parse_date(edu.get("start_date")),
+                parse_date(edu.get("end_date"))
+            )))
+        except Exception as e:
+            logger.warning("⚠️ Error preparing education entry: %s", e)
+
+    # Projects - FIXED: Handle Unicode characters and long titles
+    for project in data.get("projects", []):
+        try:
+            rows.append((f"project {project.get('title')}", PROJECT_INSERT_QUERY, (
+                candidate_id,
+                clean_text(project.get("title", ""))[:150],  # Truncate to fit VARCHAR(150)
+                clean_text(project.get("description", ""))
+            )))
+        except Exception as e:
+            logger.warning("⚠️ Error preparing project entry: %s", e)
+
+    # Soft skills - FIXED: Handle the structure properly
+    for soft_skill in data.get("soft_skills", []):
+        try:
+            rows.append((f"soft skill {soft_skill.get('skill')}", SOFT_SKILL_INSERT_QUERY, (
+                candidate_id,
+                soft_skill.get("skill"),
+                soft_skill.get("strength_level")
+            )))
+        except Exception as e:
+            logger.warning("⚠️ Error preparing soft skill entry: %s", e)
+
+    # Employment gaps - Usually empty but handle if present
+    for gap in data.get("employment_gaps", []):
+        try:
+            rows.append(("employment gap", EMPLOYMENT_GAP_INSERT_QUERY, (
+                candidate_id,
+                parse_date(gap.get("gap_start")),
+                parse_date(gap.get("gap_end")),
+                gap.get("gap_duration_in_months"),
+                gap.get("reason")
+            )))
+        except Exception as e:
+            logger.warning("⚠️ Error preparing employment gap entry: %s", e)
+
+    # Scoring - FIXED: Only insert if there are actual scores
+    scores = data.get("scoring", {})
+    if scores and any(scores.values()):
+        rows.append(("scoring metrics", SCORING_INSERT_QUERY, (
+            candidate_id,
+            scores.get("tech_score"),
+            scores.get("communication_score"),
+            scores.get("ai_fit_score"),
+            scores.get("overall_score"),
+            True
+        )))
+
+    return rows
 
 def insert_structured_cv_data(data, db):
     """
-    Insert structured CV data with proper error handling and validation
+    Insert structured CV data with proper error handling and validation.
+    Upserts by normalized email / content fingerprint; returns the candidate ID.
+    """
+    candidate_id, _ = upsert_structured_cv_data(data, db)
+    return candidate_id
+
+def upsert_structured_cv_data(data, db, retry_on_conflict=True):
+    """
+    Insert or update a candidate profile.
+
+    A re-application by a known candidate (same normalized email, or same content when
+    there is no email) updates the existing row instead of creating a new one. Child
+    rows are replaced only when the content fingerprint changed; an identical profile
+    is not written at all, and neither is a rule-based profile of a candidate the LLM
+    already extracted (see is_unchanged).
+
+    Returns (candidate_id, status) where status is UPSERT_INSERTED, UPSERT_UPDATED or
+    UPSERT_UNCHANGED, or (False, None) on failure. email_normalized is unique, so when a
+    concurrent upload inserts the same candidate first, the upsert runs once more and
+    updates that row instead.
     """
     if not data:
-        print("❌ No data provided for insertion")
-        return False
+        logger.error("❌ No data provided for insertion")
+        return False, None
         
-    print(f"🔍 DEBUG - Data keys: {list(data.keys())}")
-    print(f"🔍 DEBUG - Name: {data.get('name')}")
-    print(f"🔍 DEBUG - Email: {data.get('email')}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔍 Data keys: %s, name: %s, email: %s", list(data.keys()), data.get("name"), data.get("email"))
     
     cursor = db.cursor()
     
     try:
-        # Insert candidate - FIXED: Handle the spaced name issue
-        name = data.get("name", "").replace(" ", " ").strip() if data.get("name") else None
-        
-        candidate_query = """
-        INSERT INTO candidates (name, role, summary, email, phone, location, portfolio_url,
-            github_url, linkedin_url, total_experience, education_gap, work_gap, last_updated)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURDATE())
-        """
-        
-        candidate_data = (
-            name,  # Fixed spaced name issue
-            data.get("role"),
-            data.get("summary"),
-            data.get("email"),
-            data.get("phone"),
-            data.get("location"),
-            data.get("portfolio_url"),
-            data.get("github_url"),
-            data.get("linkedin_url"),
-            data.get("total_experience"),
-            data.get("education_gap", False),
-            data.get("work_gap", False)
-        )
-        
-        print(f"🔍 DEBUG - Candidate data being inserted: {candidate_data}")
-        cursor.execute(candidate_query, candidate_data)
-        candidate_id = cursor.lastrowid
-        print(f"✅ Inserted candidate with ID: {candidate_id}")
-
-        # Insert experience - FIXED: Handle None company values and date formatting
-        for exp in data.get("experience", []):
-            try:
-                # Handle date formatting - convert string dates to proper format
-                start_date = parse_date(exp.get("start_date"))
-                end_date = parse_date(exp.get("end_date")) if exp.get("end_date") != "Present" else None
-                
-                cursor.execute("""
-                    INSERT INTO experience (candidate_id, title, company, start_date, end_date, description)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
-                    candidate_id,
-                    exp.get("title"),
-                    exp.get("company") if exp.get("company") else "Freelance/Self-employed",  # Handle None company
-                    start_date,
-                    end_date,
-                    exp.get("description")
-                ))
-                print(f"✅ Inserted experience: {exp.get('title')} at {exp.get('company', 'Freelance')}")
-            except Exception as e:
-                print(f"⚠️ Error inserting experience {exp.get('title', 'Unknown')}: {e}")
-
-        # Insert education - FIXED: Handle date formatting
-        for edu in data.get("education", []):
-            try:
-                start_date = parse_date(edu.get("start_date"))
-                end_date = parse_date(edu.get("end_date"))
-                
-                cursor.execute("""
-                    INSERT INTO education (candidate_id, institute, degree, start_date, end_date)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    candidate_id,
-                    edu.get("institute"),
-                    edu.get("degree"),
-                    start_date,
-                    end_date
-                ))
-                print(f"✅ Inserted education: {edu.get('degree')} from {edu.get('institute')}")
-            except Exception as e:
-                print(f"⚠️ Error inserting education {edu.get('institute', 'Unknown')}: {e}")
+        name, fingerprint, candidate_row = prepare_candidate(data)
 
-        # Insert skills - FIXED: Handle array of strings properly
-        for skill in data.get("skills", []):
-            try:
-                cursor.execute("""
-                    INSERT INTO skills (candidate_id, skill)
-                    VALUES (%s, %s)
-                """, (candidate_id, skill))
-            except Exception as e:
-                print(f"⚠️ Error inserting skill {skill}: {e}")
+        existing = find_existing_candidate(cursor, candidate_row[-2], fingerprint)
+        if existing and is_unchanged(existing, data, fingerprint):
+            logger.info("♻️ Candidate %s unchanged, skipping write", existing[0])
+            return existing[0], UPSERT_UNCHANGED
         
-        if data.get("skills"):
-            print(f"✅ Inserted {len(data.get('skills'))} skills")
-
-        # Insert projects - FIXED: Handle Unicode characters and long titles
-        for project in data.get("projects", []):
-            try:
-                # Clean up Unicode characters and truncate if necessary
-                title = clean_text(project.get("title", ""))[:150]  # Truncate to fit VARCHAR(150)
-                description = clean_text(project.get("description", ""))
-                
-                cursor.execute("""
-                    INSERT INTO projects (candidate_id, title, description)
-                    VALUES (%s, %s, %s)
-                """, (
-                    candidate_id,
-                    title,
-                    description
-                ))
-                print(f"✅ Inserted project: {title}")
-            except Exception as e:
-                print(f"⚠️ Error inserting project {project.get('title', 'Unknown')}: {e}")
-
-        # Insert soft skills - FIXED: Handle the structure properly
-        for soft_skill in data.get("soft_skills", []):
+        logger.debug("🔍 Candidate row being written: %s", candidate_row)
+        if existing:
+            candidate_id = existing[0]
+            cursor.execute(CANDIDATE_UPDATE_QUERY, candidate_row + (candidate_id,))
+            for table in CANDIDATE_CHILD_TABLES:
+                cursor.execute(f"DELETE FROM {table} WHERE candidate_id = %s", (candidate_id,))
+            status = UPSERT_UPDATED
+            logger.debug("✅ Updated candidate with ID: %s", candidate_id)
+        else:
             try:
-                cursor.execute("""
-                    INSERT INTO soft_skills (candidate_id, skill, strength_level)
-                    VALUES (%s, %s, %s)
-                """, (
-                    candidate_id,
-                    soft_skill.get("skill"),
-                    soft_skill.get("strength_level")
-                ))
-            except Exception as e:
-                print(f"⚠️ Error inserting soft skill {soft_skill.get('skill', 'Unknown')}: {e}")
-        
-        if data.get("soft_skills"):
-            print(f"✅ Inserted {len(data.get('soft_skills'))} soft skills")
+                cursor.execute(CANDIDATE_INSERT_QUERY, candidate_row)
+            except INTEGRITY_ERRORS:
+                if not retry_on_conflict:
+                    raise
+                # Same email inserted by a concurrent upload since our lookup; a new transaction sees it
+                logger.info("🔁 Candidate %s inserted concurrently, retrying as an update", candidate_row[-2])
+                db.rollback()
+                return upsert_structured_cv_data(data, db, retry_on_conflict=False)
+            candidate_id = cursor.lastrowid
+            status = UPSERT_INSERTED
+            logger.debug("✅ Inserted candidate with ID: %s", candidate_id)
 
-        # Insert employment gaps - Usually empty but handle if present
-        for gap in data.get("employment_gaps", []):
+        # Skills - normalized once here and stored as skill dictionary ids
+        skills_by_name = normalize_candidate_skills(data.get("skills", []))
+        skill_ids = {}
+        if skills_by_name:
             try:
-                gap_start = parse_date(gap.get("gap_start"))
-                gap_end = parse_date(gap.get("gap_end"))
-                
-                cursor.execute("""
-                    INSERT INTO employment_gaps (candidate_id, gap_start, gap_end, gap_duration_in_months, reason)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    candidate_id,
-                    gap_start,
-                    gap_end,
-                    gap.get("gap_duration_in_months"),
-                    gap.get("reason")
-                ))
+                skill_ids = resolve_skill_ids(cursor, list(skills_by_name))
+                cursor.executemany(CANDIDATE_SKILL_INSERT_QUERY, [
+                    (candidate_id, skill_ids[name], raw) for name, raw in skills_by_name.items() if name in skill_ids
+                ])
+                logger.debug("✅ Inserted %d skills", len(skills_by_name))
             except Exception as e:
-                print(f"⚠️ Error inserting employment gap: {e}")
+                logger.warning("⚠️ Error inserting skills: %s", e)
 
-        # Insert scoring - FIXED: Handle None values properly
-        scores = data.get("scoring", {})
-        if scores and any(scores.values()):  # Only insert if there are actual scores
+        # Experience, education, projects, soft skills, gaps and scoring
+        child_rows = build_child_rows(candidate_id, data)
+        for label, query, params in child_rows:
             try:
-                cursor.execute("""
-                    INSERT INTO scoring_metrics (candidate_id, tech_score, communication_score,
-                    ai_fit_score, overall_score, evaluated_by_ai)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
-                    candidate_id,
-                    scores.get("tech_score") if scores.get("tech_score") is not None else None,
-                    scores.get("communication_score") if scores.get("communication_score") is not None else None,
-                    scores.get("ai_fit_score") if scores.get("ai_fit_score") is not None else None,
-                    scores.get("overall_score") if scores.get("overall_score") is not None else None,
-                    True
-                ))
-                print("✅ Inserted scoring metrics")
+                cursor.execute(query, params)
             except Exception as e:
-                print(f"⚠️ Error inserting scoring metrics: {e}")
+                logger.warning("⚠️ Error inserting %s: %s", label, e)
+        logger.debug("✅ Inserted %d profile rows", len(child_rows))
 
         db.commit()
-        print(f"🎉 Successfully inserted all data for candidate: {name}")
-        return candidate_id
+        remember_skill_ids(skill_ids)
+        invalidate_candidate(candidate_id)
+        logger.info("🎉 Successfully %s all data for candidate %s: %s", status, candidate_id, name)
+        return candidate_id, status
         
     except Exception as e:
-        print(f"❌ Critical database insertion error: {e}")
+        logger.error("❌ Critical database insertion error: %s", e)
         db.rollback()
-        return False
+        return False, None
     finally:
         cursor.close()
 
@@ -219,7 +374,7 @@ def parse_date(date_str):
     except (ValueError, TypeError):
         pass
     
-    print(f"⚠️ Could not parse date: {date_str}")
+    logger.debug("⚠️ Could not parse date: %s", date_str)
     return None
 
 def clean_text(text):
@@ -1,22 +1,226 @@
 # parser.py
+import io
+import logging
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ElementTree
+
 import pdfplumber
-from docx import Document
+import pypdfium2 as pdfium  # installed with pdfplumber
+
+logger = logging.getLogger(__name__)
+
+# Extraction stops once a document has produced this many characters (both formats),
+# so a pathological upload cannot blow up the LLM prompt
+DEFAULT_MAX_DOCUMENT_CHARS = 50000
+
+def max_document_chars():
+    return int(os.getenv("MAX_DOCUMENT_CHARS", DEFAULT_MAX_DOCUMENT_CHARS))
+
+# PDF_BACKEND: "auto" reads the text layer with pdfium and re-reads only poor pages
+# with pdfplumber; "pdfium" and "pdfplumber" force one engine.
+PDF_BACKEND_AUTO = "auto"
+PDF_BACKEND_PDFIUM = "pdfium"
+PDF_BACKEND_PDFPLUMBER = "pdfplumber"
+PDF_BACKENDS = (PDF_BACKEND_AUTO, PDF_BACKEND_PDFIUM, PDF_BACKEND_PDFPLUMBER)
+
+# A page's pdfium text is "poor" when it is nearly empty, when too many characters
+# are undecodable, or when its text runs jump back up the page too often (designed,
+# multi-column layouts whose content stream is not in reading order; pdfplumber
+# orders by position instead). Plain column-by-column order jumps up once per column.
+MIN_PAGE_CHARS = 20
+MAX_GARBLED_RATIO = 0.05
+MIN_BACKWARD_JUMPS = 3
+MAX_BACKWARD_JUMP_RATIO = 0.05
+
+
+W_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+W_TEXT, W_TAB, W_BREAK, W_CARRIAGE_RETURN = (W_NAMESPACE + name for name in ("t", "tab", "br", "cr"))
+W_PARAGRAPH, W_CELL, W_ROW, W_TEXTBOX = (W_NAMESPACE + name for name in ("p", "tc", "tr", "txbxContent"))
+HEADER_PART = re.compile(r"word/header\d*\.xml")
+FOOTER_PART = re.compile(r"word/footer\d*\.xml")
+
+def _docx_parts(archive):
+    """Headers, then the body, then footers: the order a reader meets them on the first page."""
+    names = archive.namelist()
+    return (sorted(name for name in names if HEADER_PART.fullmatch(name))
+            + ["word/document.xml"]
+            + sorted(name for name in names if FOOTER_PART.fullmatch(name)))
+
+def _iter_part_text(stream):
+    """
+    Yields the text of one WordprocessingML part as it is parsed: runs, tabs and breaks,
+    one line per paragraph, table cells tab-separated with one line per row. Text boxes
+    are read from their mc:Choice content; the legacy mc:Fallback copy is skipped.
+    """
+    in_fallback = 0
+    cell_depth = 0
+    for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == MC_FALLBACK:
+                in_fallback += 1
+            elif tag == W_CELL:
+                cell_depth += 1
+            elif tag == W_TEXTBOX and not in_fallback:
+                # A text box sits inside a run of the surrounding paragraph
+                yield "\n"
+            continue
+        if tag == MC_FALLBACK:
+            in_fallback -= 1
+        elif in_fallback:
+            pass
+        elif tag == W_TEXT:
+            if element.text:
+                yield element.text
+        elif tag == W_TAB:
+            yield "\t"
+        elif tag in (W_BREAK, W_CARRIAGE_RETURN):
+            yield "\n"
+        elif tag == W_PARAGRAPH:
+            # Paragraphs inside a cell stay on the row's line
+            yield " " if cell_depth else "\n"
+            element.clear()
+        elif tag == W_CELL:
+            cell_depth -= 1
+            yield "\t"
+        elif tag == W_ROW:
+            yield "\n"
+            element.clear()
 
-def read_word_file(path):
-    doc = Document(path)
-    return '\n'.join([para.text for para in doc.paragraphs])
+def _describe(source):
+    """A short name for log lines: the file name for paths, a placeholder for in-memory documents."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(source)
+    return "<in-memory document>"
 
-def read_pdf_file(path):
-    text = ""
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
+def _rewind(source):
+    """Puts a file object back at its start before another reader opens it; paths need nothing."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+def iter_docx_text(source):
+    """Streams a .docx file's text straight from the zip, without building a document model."""
+    with zipfile.ZipFile(_rewind(source)) as archive:
+        for name in _docx_parts(archive):
+            with archive.open(name) as stream:
+                yield from _iter_part_text(stream)
+            yield "\n"
+
+def read_word_file(source, max_chars=None):
+    max_chars = max_chars or max_document_chars()
+    chunks = []
+    length = 0
+    for chunk in iter_docx_text(source):
+        chunks.append(chunk)
+        length += len(chunk)
+        if length > max_chars:
+            break
+    return _apply_budget(source, "".join(chunks), max_chars)
+
+def _count_backward_jumps(textpage):
+    """Returns (jumps, runs): how often consecutive text runs move up the page by more than a line."""
+    runs = textpage.count_rects()
+    jumps = 0
+    previous = None
+    for index in range(runs):
+        left, bottom, right, top = textpage.get_rect(index)
+        if previous is not None and bottom > previous[3] + max(previous[3] - previous[1], 1):
+            jumps += 1
+        previous = (left, bottom, right, top)
+    return jumps, runs
+
+def _is_garbled(char):
+    return char == "�" or (char < " " and char not in "\r\n\t")
+
+def poor_page_reason(text, backward_jumps=0, runs=0):
+    """Why pdfium's text for a page should not be trusted, or None if it looks fine."""
+    stripped = text.strip()
+    if len(stripped) < MIN_PAGE_CHARS:
+        return "empty"
+    if sum(1 for char in stripped if _is_garbled(char)) / len(stripped) > MAX_GARBLED_RATIO:
+        return "garbled"
+    if backward_jumps >= MIN_BACKWARD_JUMPS and backward_jumps / max(runs, 1) > MAX_BACKWARD_JUMP_RATIO:
+        return "reading order"
+    return None
+
+def read_pdf_pages_pdfium(source, max_chars=None):
+    """Text-layer extraction; returns [(text, poor page reason or None)] per page, up to max_chars."""
+    pages = []
+    length = 0
+    pdf = pdfium.PdfDocument(_rewind(source))
+    try:
+        for page in pdf:
+            if max_chars and length >= max_chars:
+                page.close()
+                break
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range().replace("\r\n", "\n")
+                reason = poor_page_reason(text, *_count_backward_jumps(textpage))
+            finally:
+                textpage.close()
+                page.close()
+            pages.append((text, reason))
+            length += len(text) + 1
+    finally:
+        pdf.close()
+    return pages
+
+def read_pdf_pages_pdfplumber(source, page_numbers=None, max_chars=None):
+    """Layout-analysed extraction; returns {page number: text} for the requested (default: all) pages."""
+    texts = {}
+    length = 0
+    with pdfplumber.open(_rewind(source)) as pdf:
+        for number in (range(len(pdf.pages)) if page_numbers is None else page_numbers):
+            if max_chars and length >= max_chars:
+                break
+            # extract_text() returns None for pages without a text layer
+            texts[number] = pdf.pages[number].extract_text() or ""
+            length += len(texts[number]) + 1
+    return texts
+
+def _apply_budget(source, text, max_chars):
+    if len(text) > max_chars:
+        logger.warning("⚠️ %s exceeds %d characters, truncating", _describe(source), max_chars)
+        return text[:max_chars]
     return text
 
-def parse_file(path):
-    if path.endswith(".docx"):
-        return read_word_file(path)
-    elif path.endswith(".pdf"):
-        return read_pdf_file(path)
+def read_pdf_file(source, backend=None, max_chars=None):
+    backend = backend or os.getenv("PDF_BACKEND", PDF_BACKEND_AUTO)
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}': must be one of {', '.join(PDF_BACKENDS)}")
+    max_chars = max_chars or max_document_chars()
+    if backend == PDF_BACKEND_PDFPLUMBER:
+        pages = read_pdf_pages_pdfplumber(source, max_chars=max_chars)
+        return _apply_budget(source, "".join(pages[number] + "\n" for number in sorted(pages)), max_chars)
+
+    pages = read_pdf_pages_pdfium(source, max_chars)
+    texts = [text for text, _ in pages]
+    poor = {number: reason for number, (_, reason) in enumerate(pages) if reason}
+    if poor and backend == PDF_BACKEND_AUTO:
+        logger.debug("📄 Re-reading %d of %d page(s) of %s with pdfplumber: %s",
+                     len(poor), len(pages), _describe(source), sorted(set(poor.values())))
+        for number, text in read_pdf_pages_pdfplumber(source, sorted(poor)).items():
+            # Keep pdfium's text when pdfplumber finds nothing either (e.g. a scanned page)
+            if text.strip():
+                texts[number] = text
+    return _apply_budget(source, "".join(text + "\n" for text in texts), max_chars)
+
+def parse_file(source, filename=None):
+    """
+    Extracts a resume's text. `source` is a path, a bytes-like buffer or a binary file
+    object (e.g. a spooled upload); `filename` gives the type when it is not a path.
+    """
+    name = (filename or (os.fspath(source) if isinstance(source, (str, os.PathLike)) else "")).lower()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if name.endswith(".docx"):
+        return read_word_file(source)
+    elif name.endswith(".pdf"):
+        return read_pdf_file(source)
     else:
         raise ValueError("Unsupported file type: must be .pdf or .docx")
@@ -0,0 +1,202 @@
+# email_outbox.py
+"""
+Transactional outbox for assessment invitation emails.
+
+When EMAIL_OUTBOX_ENABLED is set, invitations are written to `email_outbox` in the
+same transaction as their assessment rows and the evaluation log, and only sent
+after that transaction commits. The request that committed them sends them right
+away. A crash between commit and send leaves a pending row, and a failed send a
+failed one; drain_outbox() retries both, up to EMAIL_OUTBOX_MAX_ATTEMPTS attempts.
+The API runs it every EMAIL_OUTBOX_DRAIN_INTERVAL_SECONDS (OutboxDrainer). Rows
+younger than EMAIL_OUTBOX_RETRY_AFTER_SECONDS are left to the request that is
+sending them, and a named lock keeps concurrent drains from sending a row twice.
+"""
+import asyncio
+import json
+import logging
+import os
+
+from metrics import span
+from storage import DATABASE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_RETRY_AFTER_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_AFTER_SECONDS", 300))
+OUTBOX_DRAIN_LOCK_NAME = "cih2_email_outbox_drain"
+
+OUTBOX_INSERT_QUERY = """
+    INSERT INTO email_outbox
+    (assessment_uuid, candidate_id, recipient_email, job_title, payload)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def outbox_enabled():
+    return os.getenv("EMAIL_OUTBOX_ENABLED", "false").lower() == "true"
+
+
+def build_outbox_row(assessment_uuid, candidate_id, candidate_data, job_title, match_details):
+    """Returns the email_outbox row (matching OUTBOX_INSERT_QUERY) for one invitation."""
+    payload = {
+        "candidate": {
+            "name": candidate_data.get("name"),
+            "email": candidate_data.get("email"),
+            "total_experience": candidate_data.get("total_experience"),
+        },
+        "match_details": match_details,
+    }
+    return (
+        assessment_uuid,
+        candidate_id,
+        candidate_data.get("email"),
+        job_title,
+        json.dumps(payload, default=str)
+    )
+
+
+def pending_outbox_query(assessment_uuids=None):
+    """
+    Returns (sql, params) selecting pending or failed outbox rows below the retry limit.
+    Restricted to assessment_uuids when given (None when that is an empty list);
+    otherwise to rows older than OUTBOX_RETRY_AFTER_SECONDS, which no request is
+    still sending.
+    """
+    query = """
+        SELECT id, assessment_uuid, recipient_email, job_title, payload
+        FROM email_outbox
+        WHERE status IN ('pending', 'failed') AND attempts < %s
+    """
+    params = [OUTBOX_MAX_ATTEMPTS]
+    if assessment_uuids is not None:
+        if not assessment_uuids:
+            return None
+        query += f" AND assessment_uuid IN ({', '.join(['%s'] * len(assessment_uuids))})"
+        params.extend(assessment_uuids)
+    else:
+        query += " AND created_at < NOW() - INTERVAL %s SECOND"
+        params.append(OUTBOX_RETRY_AFTER_SECONDS)
+    return query + " ORDER BY id", params
+
+
+def send_outbox_row(email_sender, jobs_by_title, row):
+    """
+    Sends one pending outbox row (blocking SMTP). Returns (sql, params, sent): the
+    update recording the outcome, and whether the email went out.
+    """
+    payload = json.loads(row["payload"])
+    job_req = jobs_by_title.get(row["job_title"])
+    if job_req is None:
+        logger.warning("⚠️ Outbox row %s references unknown job '%s'", row["id"], row["job_title"])
+        return (
+            "UPDATE email_outbox SET status = 'failed', attempts = attempts + 1, last_error = %s WHERE id = %s",
+            ("unknown job title", row["id"]),
+            False
+        )
+
+    with span("send_email"):
+        ok = email_sender.send_test_invitation(
+            payload["candidate"], job_req, payload["match_details"], row["assessment_uuid"]
+        )
+    if ok:
+        return (
+            "UPDATE email_outbox SET status = 'sent', attempts = attempts + 1, sent_at = NOW() WHERE id = %s",
+            (row["id"],),
+            True
+        )
+    return (
+        "UPDATE email_outbox SET status = 'failed', attempts = attempts + 1, last_error = %s WHERE id = %s",
+        ("send failed", row["id"]),
+        False
+    )
+
+
+def dispatch_outbox_emails(db_connection, email_sender, job_requirements, assessment_uuids=None):
+    """
+    Sends pending outbox invitations and records the outcome of each.
+
+    Restricted to assessment_uuids when given (the rows a request just committed),
+    otherwise drains every pending row below the retry limit. Returns the number sent.
+    """
+    pending_query = pending_outbox_query(assessment_uuids)
+    if pending_query is None:
+        return 0
+
+    jobs_by_title = {job.title: job for job in job_requirements}
+    cursor = db_connection.cursor(dictionary=True)
+    sent = 0
+    try:
+        cursor.execute(*pending_query)
+        pending = cursor.fetchall()
+
+        for row in pending:
+            update_sql, update_params, ok = send_outbox_row(email_sender, jobs_by_title, row)
+            if ok:
+                sent += 1
+            cursor.execute(update_sql, update_params)
+            db_connection.commit()
+    except DATABASE_ERRORS as err:
+        logger.error("⚠️ Outbox dispatch failed: %s", err)
+        db_connection.rollback()
+    finally:
+        cursor.close()
+    return sent
+
+
+def drain_outbox(db_connection, email_sender, job_requirements):
+    """
+    Retries every pending or failed outbox row below the retry limit. Returns the
+    number sent; 0 without sending when another process is already draining.
+    """
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (OUTBOX_DRAIN_LOCK_NAME,))
+        if cursor.fetchone()[0] != 1:
+            logger.debug("📭 Outbox drain already running elsewhere")
+            return 0
+        try:
+            sent = dispatch_outbox_emails(db_connection, email_sender, job_requirements)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (OUTBOX_DRAIN_LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+    if sent:
+        logger.info("📬 Outbox drain sent %d invitation(s)", sent)
+    return sent
+
+
+class OutboxDrainer:
+    """
+    Runs a blocking drain function (e.g. drain_outbox on a connection of its own) at
+    startup and then every `interval` seconds, in the default executor so SMTP never
+    blocks the event loop. An interval of 0 disables it.
+    """
+    def __init__(self, drain, interval=300):
+        self.drain = drain
+        self.interval = interval
+        self.task = None
+
+    @classmethod
+    def from_env(cls, drain):
+        return cls(drain, interval=float(os.getenv("EMAIL_OUTBOX_DRAIN_INTERVAL_SECONDS", 300)))
+
+    def start(self):
+        if self.interval > 0:
+            self.task = asyncio.create_task(self._run())
+            logger.info("✅ Outbox drainer started, every %ss", self.interval)
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.drain)
+            except Exception as e:
+                logger.error("⚠️ Outbox drain failed: %s", e)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,99 @@
+# evaluation_analytics.py
+"""
+Aggregate queries over `evaluation_results`, the one-row-per-(candidate, job) table
+written alongside each evaluation log.
+
+Every query is bounded by an evaluated_at range (and optionally a job title), so it
+is served by the (evaluated_at, ...) or (job_title, evaluated_at, ...) indexes
+rather than a scan of the whole table.
+"""
+
+EVALUATION_RESULT_INSERT_QUERY = """
+    INSERT INTO evaluation_results
+    (evaluation_log_id, candidate_id, job_title, match_score, meets_experience, qualified, catalog_version)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def build_evaluation_result_rows(evaluation_log_id, candidate_id, evaluations, catalog_version):
+    """Returns evaluation_results rows (matching EVALUATION_RESULT_INSERT_QUERY) for one evaluation."""
+    return [
+        (
+            evaluation_log_id,
+            candidate_id,
+            evaluation["job_title"],
+            round(evaluation["match_score"], 2),
+            evaluation["meets_experience"],
+            evaluation["qualified"],
+            catalog_version
+        )
+        for evaluation in evaluations
+    ]
+
+
+def _range_filter(since, until, job_title):
+    clauses = ["evaluated_at >= %s", "evaluated_at < %s"]
+    params = [since, until]
+    if job_title:
+        clauses.insert(0, "job_title = %s")
+        params.insert(0, job_title)
+    return " AND ".join(clauses), params
+
+
+def get_qualification_summary(db_connection, since, until, job_title=None):
+    """
+    Per job: evaluations, qualified evaluations, distinct qualified candidates and
+    average match score for evaluations in [since, until).
+    """
+    where, params = _range_filter(since, until, job_title)
+    cursor = db_connection.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            SELECT job_title,
+                   COUNT(*) AS evaluations,
+                   SUM(CASE WHEN qualified THEN 1 ELSE 0 END) AS qualified,
+                   COUNT(DISTINCT CASE WHEN qualified THEN candidate_id END) AS qualified_candidates,
+                   AVG(match_score) AS avg_match_score
+            FROM evaluation_results
+            WHERE {where}
+            GROUP BY job_title
+            ORDER BY qualified DESC, job_title
+        """, params)
+        return [
+            {
+                "job_title": row["job_title"],
+                "evaluations": int(row["evaluations"]),
+                "qualified": int(row["qualified"] or 0),
+                "qualified_candidates": int(row["qualified_candidates"] or 0),
+                "avg_match_score": round(float(row["avg_match_score"] or 0), 2)
+            }
+            for row in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
+
+
+def get_score_distribution(db_connection, since, until, job_title=None, bucket_size=10):
+    """Histogram of match scores in bucket_size-point buckets for evaluations in [since, until)."""
+    where, params = _range_filter(since, until, job_title)
+    cursor = db_connection.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            SELECT FLOOR(match_score / %s) * %s AS bucket,
+                   COUNT(*) AS evaluations,
+                   SUM(CASE WHEN qualified THEN 1 ELSE 0 END) AS qualified
+            FROM evaluation_results
+            WHERE {where}
+            GROUP BY bucket
+            ORDER BY bucket
+        """, [bucket_size, bucket_size] + params)
+        return [
+            {
+                "bucket_start": float(row["bucket"]),
+                "evaluations": int(row["evaluations"]),
+                "qualified": int(row["qualified"] or 0)
+            }
+            for row in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
@@ -0,0 +1,77 @@
+# evaluation_cache.py
+"""
+Memoized job matching for candidate evaluation.
+
+A candidate's matches depend only on its set of normalized skills, on which of the
+catalog's minimum-experience thresholds it meets, on the job catalog and on the
+qualification threshold. Freshers often share the exact same skill set, and re-screens
+evaluate unchanged candidates against an unchanged catalog. Those evaluations are
+served from a bounded, per-process LRU keyed by
+
+    (sorted skill ids, experience bucket, catalog version, match threshold)
+
+The experience bucket is the number of distinct catalog minimums the candidate meets,
+so two candidates in the same bucket get the same meets_experience for every job.
+Only the per-job matches are cached: assessment ids and invitations are still made
+per candidate. Lookups are counted in cih2_evaluation_cache_lookups_total{result}.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import EVALUATION_CACHE_LOOKUPS
+
+
+def experience_bucket(experience, job_requirements):
+    """How many distinct minimum-experience levels of the catalog the experience meets."""
+    return sum(1 for minimum in {job.min_experience for job in job_requirements} if experience >= minimum)
+
+
+def evaluation_key(candidate_data, experience, job_requirements, catalog_version, threshold):
+    # Skill ids and normalized names are one-to-one; profiles without ids fall back to names
+    skills = candidate_data.get("skill_ids") or candidate_data.get("normalized_skills") or ()
+    return (tuple(sorted(skills)), experience_bucket(experience, job_requirements), catalog_version, threshold)
+
+
+class EvaluationCache:
+    """Thread-safe, bounded LRU of per-job match results; a size of 0 disables it."""
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_size=int(os.getenv("EVALUATION_CACHE_SIZE", 4096)))
+
+    def get(self, key):
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            matches = self._entries.get(key)
+            if matches is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        EVALUATION_CACHE_LOOKUPS.inc("miss" if matches is None else "hit")
+        return matches
+
+    def put(self, key, matches):
+        """Stores matches, which must be immutable (tuples): callers share them."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = matches
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+evaluation_cache = EvaluationCache.from_env()
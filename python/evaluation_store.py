@@ -0,0 +1,115 @@
+# evaluation_store.py
+"""
+Storage for the outcome of one candidate evaluation: assessment links, outbox
+invitations, the evaluation log and its per-job evaluation_results rows.
+
+The SQL and row builders here are shared by the blocking functions
+below and by async_repository.AsyncRepository, so both paths write identical rows.
+"""
+import logging
+
+from storage import DATABASE_ERRORS
+from email_outbox import OUTBOX_INSERT_QUERY
+from evaluation_analytics import EVALUATION_RESULT_INSERT_QUERY, build_evaluation_result_rows
+
+logger = logging.getLogger(__name__)
+
+ASSESSMENT_INSERT_QUERY = """
+    INSERT INTO assessments
+    (assessment_uuid, candidate_id, job_title, candidate_email)
+    VALUES (%s, %s, %s, %s)
+"""
+
+EVALUATION_LOG_INSERT_QUERY = """
+    INSERT INTO evaluation_logs
+    (candidate_id, total_positions_checked, qualified_positions, notifications_sent)
+    VALUES (%s, %s, %s, %s)
+"""
+
+# Invitations go out after the evaluation commits; the log gets their count afterwards
+EVALUATION_LOG_SENT_UPDATE_QUERY = "UPDATE evaluation_logs SET notifications_sent = %s WHERE id = %s"
+
+
+def build_evaluation_log_row(candidate_id, evaluation_results):
+    """Returns the evaluation_logs row (matching EVALUATION_LOG_INSERT_QUERY) for one evaluation."""
+    qualified_pos_str = ', '.join(evaluation_results['qualified_positions'])
+    return (
+        candidate_id,
+        len(evaluation_results['evaluations']),
+        qualified_pos_str or None,
+        evaluation_results['notifications_sent']
+    )
+
+
+def latest_evaluation_log_query(candidate_id, catalog_version=None):
+    """Returns (sql, params) for the most recent evaluation log of a candidate."""
+    query = """
+        SELECT l.total_positions_checked, l.qualified_positions, l.notifications_sent, l.evaluation_date
+        FROM evaluation_logs l WHERE l.candidate_id = %s
+    """
+    params = [candidate_id]
+    if catalog_version:
+        query += """
+        AND EXISTS (SELECT 1 FROM evaluation_results r
+                    WHERE r.evaluation_log_id = l.id AND r.catalog_version = %s)
+        """
+        params.append(catalog_version)
+    return query + " ORDER BY l.id DESC LIMIT 1", params
+
+
+def get_latest_evaluation_log(db_connection, candidate_id, catalog_version=None):
+    """
+    Fetches the most recent evaluation log row for a candidate, if any; restricted to
+    evaluations made against catalog_version when given.
+    """
+    cursor = db_connection.cursor(dictionary=True)
+    try:
+        cursor.execute(*latest_evaluation_log_query(candidate_id, catalog_version))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def write_evaluation_results(db_connection, candidate_id, evaluation_results, assessment_rows,
+                             outbox_rows=(), catalog_version=None):
+    """
+    Writes the staged results of one evaluation in a single transaction: all assessment
+    links (multi-row insert), any outbox invitations, the evaluation log and one
+    evaluation_results row per job. Either all of it is stored or none of it is.
+    Returns the evaluation log id on commit, None on failure. The log records no
+    notifications yet: record_notifications_sent() sets them once sent.
+    """
+    cursor = db_connection.cursor()
+    try:
+        if assessment_rows:
+            cursor.executemany(ASSESSMENT_INSERT_QUERY, assessment_rows)
+        if outbox_rows:
+            cursor.executemany(OUTBOX_INSERT_QUERY, outbox_rows)
+
+        cursor.execute(EVALUATION_LOG_INSERT_QUERY, build_evaluation_log_row(candidate_id, evaluation_results))
+        log_id = cursor.lastrowid
+        cursor.executemany(EVALUATION_RESULT_INSERT_QUERY, build_evaluation_result_rows(
+            log_id, candidate_id, evaluation_results['evaluations'], catalog_version
+        ))
+        db_connection.commit()
+        logger.info("✅ Stored %d assessment link(s) and evaluation log for candidate ID: %s", len(assessment_rows), candidate_id)
+        return log_id
+    except DATABASE_ERRORS as err:
+        logger.error("⚠️ Failed to store evaluation results: %s", err)
+        db_connection.rollback()
+        return None
+    finally:
+        cursor.close()
+
+
+def record_notifications_sent(db_connection, log_id, sent):
+    """Records on the evaluation log how many invitations were actually sent."""
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute(EVALUATION_LOG_SENT_UPDATE_QUERY, (sent, log_id))
+        db_connection.commit()
+    except DATABASE_ERRORS as err:
+        logger.warning("⚠️ Could not record sent notifications on evaluation log %s: %s", log_id, err)
+        db_connection.rollback()
+    finally:
+        cursor.close()
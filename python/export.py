@@ -0,0 +1,167 @@
+# export.py
+"""
+Streaming bulk export of candidates, skills and evaluation results for BI tooling.
+
+Rows are read through an unbuffered (server-side) MySQL cursor in fetchmany batches
+and yielded as NDJSON or CSV as they arrive, so memory use does not grow with the
+size of the table.
+
+Exports are keyset-paginated and resumable: rows come out in cursor order, and
+passing the last row's cursor value back as `after` continues right after it. The
+cursor value is `id` for candidates and evaluations, and `candidate_id:skill_id` for
+skills.
+"""
+import csv
+import io
+import json
+
+EXPORT_FETCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _candidates_query(after, filters):
+    clauses, params = [], []
+    if after is not None:
+        clauses.append("id > %s")
+        params.append(int(after))
+    if filters.get("since"):
+        clauses.append("last_updated >= %s")
+        params.append(filters["since"])
+    if filters.get("until"):
+        clauses.append("last_updated < %s")
+        params.append(filters["until"])
+    sql = """
+        SELECT id, name, role, email, phone, location, portfolio_url, github_url, linkedin_url,
+               total_experience, education_gap, work_gap, last_updated
+        FROM candidates
+    """
+    return sql, clauses, params, "ORDER BY id"
+
+
+def _skills_query(after, filters):
+    clauses, params = [], []
+    if after is not None:
+        candidate_id, skill_id = (int(part) for part in str(after).split(":", 1))
+        clauses.append("(cs.candidate_id > %s OR (cs.candidate_id = %s AND cs.skill_id > %s))")
+        params.extend([candidate_id, candidate_id, skill_id])
+    if filters.get("skill"):
+        clauses.append("d.normalized_name = %s")
+        params.append(filters["skill"])
+    sql = """
+        SELECT cs.candidate_id, cs.skill_id, d.normalized_name AS skill, cs.raw_skill
+        FROM candidate_skills cs JOIN skill_dictionary d ON d.id = cs.skill_id
+    """
+    return sql, clauses, params, "ORDER BY cs.candidate_id, cs.skill_id"
+
+
+def _evaluations_query(after, filters):
+    clauses, params = [], []
+    if after is not None:
+        clauses.append("id > %s")
+        params.append(int(after))
+    if filters.get("since"):
+        clauses.append("evaluated_at >= %s")
+        params.append(filters["since"])
+    if filters.get("until"):
+        clauses.append("evaluated_at < %s")
+        params.append(filters["until"])
+    if filters.get("job_title"):
+        clauses.append("job_title = %s")
+        params.append(filters["job_title"])
+    if filters.get("qualified") is not None:
+        clauses.append("qualified = %s")
+        params.append(bool(filters["qualified"]))
+    sql = """
+        SELECT id, evaluation_log_id, candidate_id, job_title, match_score,
+               meets_experience, qualified, catalog_version, evaluated_at
+        FROM evaluation_results
+    """
+    return sql, clauses, params, "ORDER BY id"
+
+
+EXPORT_DATASETS = {
+    "candidates": _candidates_query,
+    "skills": _skills_query,
+    "evaluations": _evaluations_query,
+}
+
+
+def build_export_query(dataset, after=None, limit=None, **filters):
+    """Returns (sql, params) for one export page."""
+    sql, clauses, params, order_by = EXPORT_DATASETS[dataset](after, filters)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " " + order_by
+    if limit:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    return sql, params
+
+
+def stream_rows(open_connection, sql, params, fetch_size=EXPORT_FETCH_SIZE):
+    """
+    Yields rows as dicts from an unbuffered cursor on a connection from open_connection().
+
+    The connection is opened on first iteration, i.e. in the worker thread that starts
+    streaming, so a request abandoned before its body is sent never holds one. Closes
+    the cursor and connection when exhausted or when the consumer stops early (client
+    disconnect).
+    """
+    db_connection = open_connection()
+    try:
+        cursor = db_connection.cursor(dictionary=True, buffered=False)
+    except BaseException:
+        db_connection.close()
+        raise
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        try:
+            cursor.close()
+        finally:
+            db_connection.close()
+
+
+def encode_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+
+def encode_csv(rows):
+    buffer = io.StringIO()
+    writer = None
+    pending = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row.keys()))
+            writer.writeheader()
+        writer.writerow(row)
+        pending += 1
+        if pending >= EXPORT_FETCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+def export_stream(open_connection, dataset, export_format, after=None, limit=None, **filters):
+    """
+    Generator of encoded chunks for one export. The query is built (and a bad `after`
+    raises ValueError) right away; the connection is only opened once streaming starts.
+    """
+    sql, params = build_export_query(dataset, after=after, limit=limit, **filters)
+    rows = stream_rows(open_connection, sql, params)
+    encode = encode_csv if export_format == "csv" else encode_ndjson
+    return encode(rows)
@@ -0,0 +1,238 @@
+# load_test.py
+"""
+Load-test harness for POST /upload-resume.
+
+`serve` runs main:app in this process, wired to local stand-ins (stand_ins.py): a fake
+LLM with configurable latency, an SMTP sink and, by default, an embedded SQLite
+database. `run` drives an already running server at a series of concurrency levels
+and prints throughput, latency percentiles and error rate per level, which together
+form the saturation curve. Without --url, `run` starts a `serve` subprocess itself.
+
+Usage:
+    python load_test.py run --concurrency 1,2,4,8,16 --duration 20 --llm-latency 1.5
+    python load_test.py run --files CV.pdf:3 tej.pdf:1 --csv curve.csv
+    python load_test.py serve --port 8100 --llm-latency 1.0     # then: run --url ...
+
+Client side is stdlib only (threads + urllib), so it adds no dependencies.
+"""
+import argparse
+import csv
+import itertools
+import mimetypes
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from benchmark import percentile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FILES = ("CV.pdf", "CV.docx", "R2.pdf", "R3.pdf", "R4.pdf", "r6.pdf", "tej.pdf", "ojas.docx")
+# A level counts as saturated when it adds less than this much throughput over the previous one
+SATURATION_GAIN = 0.10
+
+
+def serve(args):
+    """Runs the API with stand-ins in this process until interrupted."""
+    from stand_ins import SMTPSink, create_sqlite_database, install_fake_llm
+
+    sink = SMTPSink(latency=args.smtp_latency).start()
+    sink.configure_env()
+    if args.db == "sqlite":
+        os.environ["DB_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = create_sqlite_database(args.sqlite_path)
+    install_fake_llm(latency=args.llm_latency, unique_candidates=not args.repeat_candidates)
+
+    import uvicorn
+    from main import app
+    try:
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+    finally:
+        sink.stop()
+
+
+def encode_multipart(path):
+    """Returns (body, content type) for a single `file` form field."""
+    boundary = uuid.uuid4().hex
+    filename = os.path.basename(path)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    with open(path, "rb") as handle:
+        payload = handle.read()
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8") + payload + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def parse_file_mix(specs):
+    """['CV.pdf:3', 'tej.pdf'] -> weighted list of paths, resolved against this directory."""
+    mix = []
+    for spec in specs:
+        name, _, weight = spec.partition(":")
+        path = name if os.path.isabs(name) else os.path.join(SCRIPT_DIR, name)
+        if not os.path.exists(path):
+            raise SystemExit(f"File not found: {path}")
+        mix.extend([path] * (int(weight) if weight else 1))
+    return mix
+
+
+def run_level(url, bodies, concurrency, duration, timeout):
+    """Keeps `concurrency` uploads in flight for `duration` seconds; returns the level's stats."""
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    upload_cycle = itertools.cycle(bodies)
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with lock:
+                body, content_type = next(upload_cycle)
+            request = urllib.request.Request(url, data=body, method="POST",
+                                             headers={"Content-Type": content_type})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+                    outcome = None
+            except urllib.error.HTTPError as e:
+                outcome = str(e.code)
+            except Exception as e:
+                outcome = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                if outcome is None:
+                    latencies.append(elapsed)
+                else:
+                    errors[outcome] = errors.get(outcome, 0) + 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    total = len(latencies) + sum(errors.values())
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_per_s": round(len(latencies) / wall, 2),
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "errors": errors,
+    }
+
+
+def wait_for_health(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2):
+                return True
+        except Exception:
+            time.sleep(0.25)
+    return False
+
+
+def start_server(args):
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(args.port),
+               "--llm-latency", str(args.llm_latency), "--smtp-latency", str(args.smtp_latency),
+               "--db", args.db]
+    if args.repeat_candidates:
+        command.append("--repeat-candidates")
+    output = None if args.verbose else subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=SCRIPT_DIR, stdout=output, stderr=output)
+
+
+def print_curve(levels):
+    print(f"{'conc':>5}{'reqs':>7}{'req/s':>9}{'err %':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    previous = None
+    for level in levels:
+        note = ""
+        if previous and previous["throughput_per_s"]:
+            gain = level["throughput_per_s"] / previous["throughput_per_s"] - 1
+            if gain < SATURATION_GAIN:
+                note = "  <- saturated"
+        print(f"{level['concurrency']:>5}{level['requests']:>7}{level['throughput_per_s']:>9}"
+              f"{level['error_rate'] * 100:>8.1f}{str(level['p50_ms']):>10}{str(level['p95_ms']):>10}"
+              f"{str(level['p99_ms']):>10}{note}")
+        if level["errors"]:
+            print(f"{'':>5} errors: {level['errors']}")
+        previous = level
+
+
+def run(args):
+    bodies = [encode_multipart(path) for path in parse_file_mix(args.files)]
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args)
+        if not wait_for_health(base_url):
+            server.terminate()
+            raise SystemExit("Server did not become healthy")
+
+    try:
+        levels = []
+        for concurrency in [int(value) for value in args.concurrency.split(",")]:
+            print(f"… {concurrency} concurrent uploads for {args.duration}s", flush=True)
+            levels.append(run_level(f"{base_url}/upload-resume", bodies, concurrency, args.duration, args.timeout))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print_curve(levels)
+    if args.csv:
+        with open(args.csv, "w", newline="") as handle:
+            writer = csv.DictWriter(handle, fieldnames=[key for key in levels[0] if key != "errors"])
+            writer.writeheader()
+            for level in levels:
+                writer.writerow({key: value for key, value in level.items() if key != "errors"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /upload-resume with local stand-ins")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stand_in_options = argparse.ArgumentParser(add_help=False)
+    stand_in_options.add_argument("--port", type=int, default=8100)
+    stand_in_options.add_argument("--llm-latency", type=float, default=1.0, help="Fake LLM seconds per call")
+    stand_in_options.add_argument("--smtp-latency", type=float, default=0.05, help="SMTP sink seconds per message")
+    stand_in_options.add_argument("--db", choices=("sqlite", "env"), default="sqlite",
+                                  help="sqlite: fresh embedded database; env: whatever DB_* configures")
+    stand_in_options.add_argument("--repeat-candidates", action="store_true",
+                                  help="Let repeated files hit the unchanged-candidate path")
+
+    serve_parser = subparsers.add_parser("serve", parents=[stand_in_options], help="Run the API with stand-ins")
+    serve_parser.add_argument("--sqlite-path", help="Database file (default: a fresh temporary one)")
+
+    run_parser = subparsers.add_parser("run", parents=[stand_in_options], help="Drive the API and print the curve")
+    run_parser.add_argument("--url", help="Base URL of a running server (default: start one)")
+    run_parser.add_argument("--files", nargs="+", default=list(DEFAULT_FILES), help="file[:weight] ...")
+    run_parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated levels")
+    run_parser.add_argument("--duration", type=float, default=20.0, help="Seconds per level")
+    run_parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout")
+    run_parser.add_argument("--csv", help="Write the curve to this CSV file")
+    run_parser.add_argument("--verbose", action="store_true", help="Show the server's output")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
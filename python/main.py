@@ -1,18 +1,59 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-import mysql.connector
+from starlette.concurrency import run_in_threadpool
 import os
+import asyncio
+import logging
+import time
+import contextlib
 import uuid
-import tempfile
+import json
+import hashlib
 import shutil
+import zipfile
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel
 
 # Import your existing modules
 from config import DatabaseConfig, OllamaConfig
+from app_logging import configure_logging, get_request_id, set_request_id, reset_request_id
 from cv_Processor import CVProcessor
+from agent_Siya import LLMQuotaExceeded
 from FilterAndTestLink import JobRequirement, SkillMatcher, EmailSender
+from screening_trigger import ScreeningTrigger
+from migrations import run_migrations
+from db_insert import UPSERT_UNCHANGED, upsert_structured_cv_data
+from candidate_loader import load_candidate_profile
+from skill_dictionary import find_candidates_with_skills
+from export import EXPORT_DATASETS, EXPORT_FORMATS, export_stream
+from evaluation_analytics import get_qualification_summary, get_score_distribution
+from evaluation_store import get_latest_evaluation_log, record_notifications_sent, write_evaluation_results
+from evaluation_cache import evaluation_cache, evaluation_key
+from email_outbox import OutboxDrainer, outbox_enabled, build_outbox_row, dispatch_outbox_emails, drain_outbox
+from async_repository import AsyncRepository
+from storage import connect, BACKEND_SQLITE
+from profiling import RequestProfiler
+from admission import AdmissionController
+from uploads import UploadTooLarge, max_upload_bytes, open_upload, spool_upload
+from batch import (
+    ITEM_QUEUED, ITEM_SKIPPED, Batch, BatchItem, BatchPipeline, BatchRegistry,
+    batch_max_files, expand_archive, is_archive, is_supported, max_archive_bytes, new_batch_id
+)
+from metrics import (
+    PROMETHEUS_CONTENT_TYPE, UPLOADS, UPLOAD_DURATION,
+    span, start_request_timings, summarize_timings, render_metrics
+)
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Gemini quotas are per minute
+LLM_QUOTA_RETRY_AFTER_SECONDS = 60
 
 # Create FastAPI app
 app = FastAPI(
@@ -30,14 +71,78 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def correlate_request(request: Request, call_next):
+    """Tags every log line of a request with its X-Request-ID (generated if absent) and echoes it back."""
+    token = set_request_id(request.headers.get(REQUEST_ID_HEADER))
+    try:
+        response = await call_next(request)
+        response.headers[REQUEST_ID_HEADER] = get_request_id()
+        return response
+    finally:
+        reset_request_id(token)
+
+screening_trigger = ScreeningTrigger.from_env()
+request_profiler = RequestProfiler.from_env()
+# Bounds concurrent pipelines (LLM calls, DB connections); sheds excess uploads with 429/503
+admission = AdmissionController.from_env()
+# Per-stage concurrency limits for /upload-resumes, shared by all batches
+batch_pipeline = BatchPipeline.from_env()
+batch_registry = BatchRegistry.from_env()
+
+# Set at startup when DB_DRIVER=async; the upload path then uses the pool instead of mysql.connector
+repository = None
+
+@app.on_event("startup")
+async def apply_schema_migrations():
+    """Creates/upgrades the schema once per process instead of on every request."""
+    if os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() != "true":
+        return
+    db_connection = connect_to_db(DatabaseConfig.from_env())
+    try:
+        run_migrations(db_connection)
+    finally:
+        db_connection.close()
+
+@app.on_event("startup")
+async def start_screening_trigger():
+    screening_trigger.start()
+
+@app.on_event("startup")
+async def start_outbox_drainer():
+    if outbox_enabled():
+        outbox_drainer.start()
+
+@app.on_event("startup")
+async def open_async_repository():
+    global repository
+    db_config = DatabaseConfig.from_env()
+    if db_config.driver != "async":
+        return
+    if db_config.backend == BACKEND_SQLITE:
+        logger.warning("⚠️ DB_DRIVER=async is MySQL-only; using the embedded SQLite database synchronously")
+        return
+    repository = await AsyncRepository.create(db_config)
+
+@app.on_event("shutdown")
+async def stop_screening_trigger():
+    await screening_trigger.stop()
+
+@app.on_event("shutdown")
+async def stop_outbox_drainer():
+    await outbox_drainer.stop()
+
+@app.on_event("shutdown")
+async def close_async_repository():
+    if repository is not None:
+        await repository.close()
+
+class ScreeningNotification(BaseModel):
+    assessment_uuid: str
+
 def connect_to_db(db_config):
-    """Establishes a connection to the MySQL database."""
-    return mysql.connector.connect(
-        host=db_config.host,
-        user=db_config.user,
-        password=db_config.password,
-        database=db_config.database
-    )
+    """Establishes a connection to the configured database (MySQL, or embedded SQLite)."""
+    return connect(db_config)
 
 def setup_job_requirements():
     """Defines a list of predefined job requirements."""
@@ -156,152 +261,65 @@ def setup_job_requirements():
         )
     ]
 
-def get_last_inserted_candidate_id(db_connection):
-    """Retrieves the ID of the last inserted candidate from the 'candidates' table."""
-    cursor = db_connection.cursor()
-    cursor.execute("SELECT MAX(id) FROM candidates")
-    result = cursor.fetchone()
-    cursor.close()
-    return result[0] if result else None
-
-def get_candidate_data_from_db(db_connection, candidate_id):
-    """Fetches comprehensive candidate data, including skills, from the database."""
-    cursor = db_connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM candidates WHERE id = %s", (candidate_id,))
-    candidate = cursor.fetchone()
-
-    if not candidate:
-        cursor.close()
-        return None
-
-    cursor.execute("SELECT skill FROM skills WHERE candidate_id = %s", (candidate_id,))
-    skills = [row['skill'] for row in cursor.fetchall()]
-    candidate['skills'] = skills
-
-    cursor.close()
-    return candidate
-
-def log_evaluation_results(db_connection, candidate_id, evaluation_results):
-    """Logs the results of the candidate evaluation into a dedicated table."""
-    cursor = db_connection.cursor()
-    try:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS evaluation_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                candidate_id INT,
-                total_positions_checked INT,
-                qualified_positions TEXT,
-                notifications_sent INT,
-                evaluation_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (candidate_id) REFERENCES candidates(id)
-            )
-        """)
-        
-        qualified_pos_str = ', '.join(evaluation_results['qualified_positions'])
-        if not qualified_pos_str:
-            qualified_pos_str = None
-
-        cursor.execute("""
-            INSERT INTO evaluation_logs
-            (candidate_id, total_positions_checked, qualified_positions, notifications_sent)
-            VALUES (%s, %s, %s, %s)
-        """, (
-            candidate_id,
-            len(evaluation_results['evaluations']),
-            qualified_pos_str,
-            evaluation_results['notifications_sent']
-        ))
-        db_connection.commit()
-        print(f"✅ Evaluation results logged for candidate ID: {candidate_id}")
-    except Exception as e:
-        print(f"⚠️ Failed to log evaluation results: {e}")
-    finally:
-        cursor.close()
+def job_catalog_version(job_requirements):
+    """Short, stable hash of the job catalog; stored with each evaluation result."""
+    catalog = tuple(
+        (job.title, tuple(sorted(job.required_skills)), tuple(sorted(job.preferred_skills)), job.min_experience)
+        for job in job_requirements
+    )
+    return _hash_catalog(catalog)
 
-def store_assessment_link_in_db(db_connection, assessment_uuid, candidate_id, job_title, candidate_email):
-    """Stores the unique assessment link details in the 'assessments' table."""
-    cursor = db_connection.cursor()
-    try:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS assessments (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                assessment_uuid VARCHAR(255) UNIQUE NOT NULL,
-                candidate_id INT NOT NULL,
-                job_title VARCHAR(255) NOT NULL,
-                candidate_email VARCHAR(255) NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (candidate_id) REFERENCES candidates(id)
-            )
-        """)
-        cursor.execute("""
-            INSERT INTO assessments
-            (assessment_uuid, candidate_id, job_title, candidate_email)
-            VALUES (%s, %s, %s, %s)
-        """, (assessment_uuid, candidate_id, job_title, candidate_email))
-        db_connection.commit()
-        print(f"✅ Assessment link (UUID: {assessment_uuid}) stored for candidate ID: {candidate_id}, Job: {job_title}")
-    except mysql.connector.Error as err:
-        print(f"⚠️ Failed to store assessment link: {err}")
-        db_connection.rollback()
-    finally:
-        cursor.close()
+@lru_cache(maxsize=32)
+def _hash_catalog(catalog):
+    # Memoized on the catalog's content: evaluate_candidate needs the version per call
+    return hashlib.sha256(json.dumps(catalog, sort_keys=True).encode("utf-8")).hexdigest()[:16]
 
-async def process_resume_logic(file_path: str) -> Dict[str, Any]:
-    """Core logic for processing resume and matching candidates."""
-    # Load configurations
-    db_config = DatabaseConfig.from_env()
-    ollama_config = OllamaConfig.from_env()
+JOB_CATALOG_VERSION = job_catalog_version(setup_job_requirements())
 
-    # Establish database connection
-    try:
-        db_connection = connect_to_db(db_config)
-        print("✅ Database connected successfully")
-    except Exception as e:
-        print(f"❌ Database connection failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Database connection failed: {e}")
+def get_candidate_data_from_db(db_connection, candidate_id):
+    """Fetches comprehensive candidate data (all child tables) in one query, via the read cache."""
+    with span("load_candidate"):
+        return load_candidate_profile(db_connection, candidate_id)
 
-    # Setup email service
-    email_sender = None
+def setup_email_sender():
+    """Returns a configured EmailSender, or None when email is not set up."""
     try:
         email_sender = EmailSender.from_env()
         if email_sender and email_sender.email and email_sender.password:
-            print("✅ Email service configured")
-        else:
-            print("⚠️ Email service configuration incomplete")
-            email_sender = None
+            logger.debug("✅ Email service configured")
+            return email_sender
+        logger.warning("⚠️ Email service configuration incomplete")
     except Exception as e:
-        print(f"⚠️ Email service setup failed: {e}")
-        email_sender = None
+        logger.warning("⚠️ Email service setup failed: %s", e)
+    return None
 
-    # Setup job requirements
-    job_requirements = setup_job_requirements()
-    print(f"✅ Loaded {len(job_requirements)} job positions")
-
-    # Process CV
-    processor = CVProcessor(model=ollama_config.model, db_connection=db_connection)
-    success = processor.process(file_path)
-
-    if not success:
-        db_connection.close()
-        raise HTTPException(status_code=400, detail="CV processing failed")
-
-    print("✅ CV processing complete. Structured data inserted.")
-    candidate_id = get_last_inserted_candidate_id(db_connection)
-
-    if not candidate_id:
-        db_connection.close()
-        raise HTTPException(status_code=500, detail="No candidate ID retrieved from database")
-
-    # Fetch candidate data
-    print(f"\n🔍 Retrieving candidate data for ID: {candidate_id}")
-    candidate_data = get_candidate_data_from_db(db_connection, candidate_id)
-
-    if not candidate_data:
-        db_connection.close()
-        raise HTTPException(status_code=404, detail="Failed to retrieve candidate data")
-
-    # Initialize SkillMatcher
+def match_jobs(candidate_skills, candidate_experience, job_requirements, min_match_threshold):
+    """
+    Matches normalized skills and experience against every job. Returns one immutable
+    (job title, match score, match details, meets experience, qualified, matched
+    normalized skills) tuple per job, safe to share through the evaluation cache.
+    """
     skill_matcher = SkillMatcher()
+    job_matches = []
+    for job_req in job_requirements:
+        # Matched on normalized names only; evaluate_candidate restores each candidate's spelling
+        matches = skill_matcher.find_normalized_skill_matches({name: name for name in candidate_skills}, job_req)
+        match_score, match_details = skill_matcher.calculate_match_score(matches, len(job_req.required_skills))
+        meets_experience = candidate_experience >= job_req.min_experience
+        job_matches.append((
+            job_req.title, match_score, match_details, meets_experience,
+            match_score >= min_match_threshold and meets_experience,
+            tuple(m.candidate_skill for m in matches)
+        ))
+    return tuple(job_matches)
+
+def evaluate_candidate(candidate_id, candidate_data, job_requirements, email_sender, use_outbox):
+    """
+    Evaluates a candidate against every job. Pure computation: the writes it implies are
+    returned staged, as (evaluation_results, assessment_rows, outbox_rows, invitations).
+    The job matches come from the evaluation cache when an equivalent candidate was
+    evaluated against the same catalog and threshold.
+    """
     min_match_threshold = float(os.getenv("MIN_MATCH_THRESHOLD", 40.0))
 
     # Evaluation logic
@@ -313,68 +331,96 @@ async def process_resume_logic(file_path: str) -> Dict[str, Any]:
         "qualified_positions": []
     }
 
-    candidate_skills = candidate_data.get("skills", [])
+    # Staged writes, flushed together by write_evaluation_results
+    assessment_rows = []
+    outbox_rows = []
+    invitations = []
+
+    # Normalized once at insert time ({normalized name: original skill})
+    candidate_skills = candidate_data.get("normalized_skills", {})
     if not candidate_skills:
-        print(f"⚠️ No skills found for candidate {candidate_data.get('name')}")
+        logger.warning("⚠️ No skills found for candidate %s", candidate_data.get("name"))
 
-    print(f"\n🔍 Evaluating {candidate_data.get('name')} for {len(job_requirements)} positions...")
+    # Handle experience safely
+    raw_candidate_experience = candidate_data.get("total_experience")
+    candidate_experience = 0.0
 
-    for job_req in job_requirements:
-        print(f"\n📋 Checking fit for: {job_req.title}")
+    if raw_candidate_experience is not None:
+        try:
+            candidate_experience = float(raw_candidate_experience)
+        except (ValueError, TypeError):
+            logger.warning("⚠️ Invalid experience value for candidate %s", candidate_data.get("name"))
+            candidate_experience = 0.0
 
-        # Perform skill matching
-        matches = skill_matcher.find_skill_matches(candidate_skills, job_req.required_skills)
-        match_score, match_details = skill_matcher.calculate_match_score(matches, len(job_req.required_skills))
+    logger.debug("🔍 Evaluating %s for %d positions", candidate_data.get("name"), len(job_requirements))
+    debug = logger.isEnabledFor(logging.DEBUG)
 
-        # Handle experience safely
-        raw_candidate_experience = candidate_data.get("total_experience")
-        candidate_experience = 0.0
+    cache_key = evaluation_key(candidate_data, candidate_experience, job_requirements,
+                               job_catalog_version(job_requirements), min_match_threshold)
+    job_matches = evaluation_cache.get(cache_key)
+    if job_matches is None:
+        job_matches = match_jobs(candidate_skills, candidate_experience, job_requirements, min_match_threshold)
+        evaluation_cache.put(cache_key, job_matches)
 
-        if raw_candidate_experience is not None:
-            try:
-                candidate_experience = float(raw_candidate_experience)
-            except (ValueError, TypeError):
-                print(f"⚠️ Warning: Invalid experience value for candidate {candidate_data.get('name')}")
-                candidate_experience = 0.0
-
-        meets_experience = candidate_experience >= job_req.min_experience
+    for job_req, (job_title, match_score, match_details, meets_experience, qualified, matched) in zip(job_requirements, job_matches):
 
         # Compile evaluation
         evaluation = {
-            "job_title": job_req.title,
+            "job_title": job_title,
             "match_score": match_score,
             "match_details": match_details,
             "meets_experience": meets_experience,
-            "qualified": match_score >= min_match_threshold and meets_experience,
-            "matched_skills": [m.candidate_skill for m in matches]
+            "qualified": qualified,
+            "matched_skills": [candidate_skills.get(name, name) for name in matched]
         }
         evaluation_results["evaluations"].append(evaluation)
 
-        print(f"   📊 Match Score: {match_score:.1f}%")
-        print(f"   👤 Experience: {candidate_experience} years (Required: {job_req.min_experience})")
-        print(f"   ✅ Matched Skills: {', '.join(evaluation['matched_skills']) if evaluation['matched_skills'] else 'None'}")
+        if debug:
+            logger.debug("📋 %s: match %.1f%%, experience %s years (required %s), matched skills: %s, qualified: %s",
+                         job_title, match_score, candidate_experience, job_req.min_experience,
+                         ", ".join(evaluation["matched_skills"]) or "None", qualified)
 
-        # Check qualification and send email
-        if evaluation["qualified"]:
-            print(f"   🎯 Candidate QUALIFIED for {job_req.title}")
+        # Check qualification and stage the invitation; nothing is written until all jobs are evaluated
+        if qualified:
             if email_sender:
                 unique_assessment_id = str(uuid.uuid4())
-                store_assessment_link_in_db(db_connection, unique_assessment_id, candidate_id, job_req.title, candidate_data.get("email"))
-                success = email_sender.send_test_invitation(candidate_data, job_req, match_details, unique_assessment_id)
-                if success:
-                    evaluation_results["notifications_sent"] += 1
-                    evaluation_results["qualified_positions"].append(job_req.title)
+                assessment_rows.append((unique_assessment_id, candidate_id, job_title, candidate_data.get("email")))
+                if use_outbox:
+                    outbox_rows.append(build_outbox_row(unique_assessment_id, candidate_id, candidate_data, job_title, match_details))
+                invitations.append((unique_assessment_id, job_req, match_details))
+                evaluation_results["qualified_positions"].append(job_title)
             else:
-                print("   ⚠️ Email service not available")
-        else:
-            print(f"   ❌ Candidate not qualified for {job_req.title}")
-
-    # Log evaluation results
-    log_evaluation_results(db_connection, candidate_id, evaluation_results)
-
-    # Close database connection
-    db_connection.close()
+                logger.warning("⚠️ Email service not available, no invitation for %s", job_title)
+
+    logger.info("🎯 Evaluated %s against %d positions, qualified for: %s", candidate_data.get("name"),
+                len(job_requirements), ", ".join(evaluation_results["qualified_positions"]) or "none")
+    return evaluation_results, assessment_rows, outbox_rows, invitations
+
+def send_invitations(candidate_data, invitations, email_sender):
+    """Sends staged invitations directly (no outbox). Returns the number sent."""
+    sent = 0
+    for assessment_uuid, job_req, match_details in invitations:
+        with span("send_email"):
+            ok = email_sender.send_test_invitation(candidate_data, job_req, match_details, assessment_uuid)
+        if ok:
+            sent += 1
+    return sent
+
+def unchanged_response(candidate_id, previous, cv_data):
+    qualified = previous["qualified_positions"]
+    return {
+        "status": "unchanged",
+        "candidate_id": candidate_id,
+        "candidate_name": cv_data.get("name"),
+        "candidate_email": cv_data.get("email"),
+        "positions_evaluated": previous["total_positions_checked"],
+        "qualified_positions": qualified.split(", ") if qualified else [],
+        "notifications_sent": 0,
+        "last_evaluated": str(previous["evaluation_date"]),
+        "detailed_evaluations": []
+    }
 
+def success_response(candidate_id, evaluation_results):
     return {
         "status": "success",
         "candidate_id": candidate_id,
@@ -386,6 +432,233 @@ async def process_resume_logic(file_path: str) -> Dict[str, Any]:
         "detailed_evaluations": evaluation_results['evaluations']
     }
 
+def store_candidate(db_connection, cv_data):
+    """
+    Upserts an extracted profile. Returns (candidate_id, previous evaluation, candidate
+    data): the previous evaluation is set, and nothing is loaded, when the candidate is
+    unchanged since an evaluation against the current job catalog.
+    """
+    with span("insert_candidate"):
+        candidate_id, upsert_status = upsert_structured_cv_data(cv_data, db_connection)
+    if not candidate_id:
+        raise HTTPException(status_code=500, detail="No candidate ID retrieved from database")
+
+    # Same candidate, same profile, same job catalog: the previous evaluation still stands
+    if upsert_status == UPSERT_UNCHANGED:
+        previous = get_latest_evaluation_log(db_connection, candidate_id, JOB_CATALOG_VERSION)
+        if previous:
+            logger.info("♻️ Candidate %s unchanged since last evaluation, skipping re-evaluation", candidate_id)
+            return candidate_id, previous, None
+
+    # Fetch candidate data
+    candidate_data = get_candidate_data_from_db(db_connection, candidate_id)
+    if not candidate_data:
+        raise HTTPException(status_code=404, detail="Failed to retrieve candidate data")
+    return candidate_id, None, candidate_data
+
+def match_candidate(db_connection, candidate_id, candidate_data, job_requirements, email_sender):
+    """Evaluates a stored candidate, writes the results and sends the invitations; returns the evaluation."""
+    use_outbox = outbox_enabled()
+    with span("matching"):
+        evaluation_results, assessment_rows, outbox_rows, invitations = evaluate_candidate(
+            candidate_id, candidate_data, job_requirements, email_sender, use_outbox
+        )
+
+    # Write assessment links, outbox rows and the evaluation log in one transaction
+    with span("store_evaluation"):
+        log_id = write_evaluation_results(db_connection, candidate_id, evaluation_results, assessment_rows,
+                                          outbox_rows, JOB_CATALOG_VERSION)
+    if not log_id:
+        raise HTTPException(status_code=500, detail="Failed to store evaluation results")
+
+    # Emails go out only after the links they contain are committed
+    if use_outbox:
+        sent = dispatch_outbox_emails(db_connection, email_sender, job_requirements,
+                                      [assessment_uuid for assessment_uuid, _, _ in invitations])
+    else:
+        sent = send_invitations(candidate_data, invitations, email_sender)
+    if sent:
+        record_notifications_sent(db_connection, log_id, sent)
+    evaluation_results["notifications_sent"] = sent
+    return evaluation_results
+
+async def store_candidate_async(cv_data):
+    """store_candidate on the async repository."""
+    with span("insert_candidate"):
+        candidate_id, upsert_status = await repository.upsert_candidate(cv_data)
+    if not candidate_id:
+        raise HTTPException(status_code=500, detail="No candidate ID retrieved from database")
+
+    if upsert_status == UPSERT_UNCHANGED:
+        previous = await repository.get_latest_evaluation_log(candidate_id, JOB_CATALOG_VERSION)
+        if previous:
+            logger.info("♻️ Candidate %s unchanged since last evaluation, skipping re-evaluation", candidate_id)
+            return candidate_id, previous, None
+
+    with span("load_candidate"):
+        candidate_data = await repository.load_candidate(candidate_id)
+    if not candidate_data:
+        raise HTTPException(status_code=404, detail="Failed to retrieve candidate data")
+    return candidate_id, None, candidate_data
+
+async def match_candidate_async(candidate_id, candidate_data, job_requirements, email_sender):
+    """match_candidate on the async repository; SMTP runs in the threadpool."""
+    use_outbox = outbox_enabled()
+    with span("matching"):
+        evaluation_results, assessment_rows, outbox_rows, invitations = evaluate_candidate(
+            candidate_id, candidate_data, job_requirements, email_sender, use_outbox
+        )
+
+    with span("store_evaluation"):
+        log_id = await repository.write_evaluation_results(candidate_id, evaluation_results, assessment_rows,
+                                                           outbox_rows, JOB_CATALOG_VERSION)
+    if not log_id:
+        raise HTTPException(status_code=500, detail="Failed to store evaluation results")
+
+    # Emails go out only after the links they contain are committed
+    if use_outbox:
+        sent = await repository.dispatch_outbox_emails(email_sender, job_requirements,
+                                                       [assessment_uuid for assessment_uuid, _, _ in invitations])
+    else:
+        sent = await run_in_threadpool(send_invitations, candidate_data, invitations, email_sender)
+    if sent:
+        await repository.record_notifications_sent(log_id, sent)
+    evaluation_results["notifications_sent"] = sent
+    return evaluation_results
+
+def with_db_connection(func, *args):
+    """Runs func(db_connection, *args) on a connection of its own (for threadpool workers)."""
+    db_connection = connect_to_db(DatabaseConfig.from_env())
+    try:
+        return func(db_connection, *args)
+    finally:
+        db_connection.close()
+
+def drain_email_outbox():
+    """Retries unsent outbox invitations on a connection of its own (run by outbox_drainer)."""
+    email_sender = setup_email_sender()
+    if email_sender is None:
+        return 0
+    return with_db_connection(drain_outbox, email_sender, setup_job_requirements())
+
+# Retries invitations a crash or SMTP failure left unsent (EMAIL_OUTBOX_ENABLED only)
+outbox_drainer = OutboxDrainer.from_env(drain_email_outbox)
+
+async def process_resume_logic(source, filename: str = None) -> Dict[str, Any]:
+    """
+    Core logic for processing resume and matching candidates. `source` is a path or a
+    file object holding the resume, with `filename` giving its type.
+    """
+    if repository is not None:
+        return await process_resume_logic_async(source, filename)
+    # mysql.connector, parsing, the LLM wait and SMTP all block: keep them off the event
+    # loop so uploads run concurrently up to the admission limit
+    return await run_in_threadpool(process_resume_blocking, source, filename)
+
+def process_resume_blocking(source, filename: str = None) -> Dict[str, Any]:
+    """process_resume_logic on the blocking driver, on a connection of its own (threadpool)."""
+    # Load configurations
+    db_config = DatabaseConfig.from_env()
+    ollama_config = OllamaConfig.from_env()
+
+    # Establish database connection
+    try:
+        db_connection = connect_to_db(db_config)
+    except Exception as e:
+        logger.error("❌ Database connection failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Database connection failed: {e}")
+
+    try:
+        # Setup email service
+        email_sender = setup_email_sender()
+
+        # Setup job requirements
+        job_requirements = setup_job_requirements()
+
+        # Process CV
+        processor = CVProcessor(model=ollama_config.model, db_connection=None)
+        cv_data = processor.extract(source, filename)
+        if cv_data is None:
+            raise HTTPException(status_code=400, detail="CV processing failed")
+
+        candidate_id, previous, candidate_data = store_candidate(db_connection, cv_data)
+        if previous:
+            return unchanged_response(candidate_id, previous, cv_data)
+
+        evaluation_results = match_candidate(db_connection, candidate_id, candidate_data,
+                                             job_requirements, email_sender)
+    finally:
+        # Close database connection
+        db_connection.close()
+
+    return success_response(candidate_id, evaluation_results)
+
+async def process_resume_logic_async(source, filename: str = None) -> Dict[str, Any]:
+    """
+    process_resume_logic on the async repository (DB_DRIVER=async). Database calls are
+    awaited on the shared pool; parsing, the LLM call and SMTP are blocking and run in
+    the threadpool, so the event loop is never pinned.
+    """
+    ollama_config = OllamaConfig.from_env()
+    email_sender = setup_email_sender()
+    job_requirements = setup_job_requirements()
+
+    processor = CVProcessor(model=ollama_config.model, db_connection=None)
+    cv_data = await run_in_threadpool(processor.extract, source, filename)
+    if cv_data is None:
+        raise HTTPException(status_code=400, detail="CV processing failed")
+
+    candidate_id, previous, candidate_data = await store_candidate_async(cv_data)
+    if previous:
+        return unchanged_response(candidate_id, previous, cv_data)
+
+    evaluation_results = await match_candidate_async(candidate_id, candidate_data, job_requirements, email_sender)
+    return success_response(candidate_id, evaluation_results)
+
+def batch_stages():
+    """
+    The /upload-resumes pipeline as (stage, async function of a batch item) pairs: the
+    same steps as process_resume_logic, split where the batch pipeline bounds concurrency.
+    """
+    processor = CVProcessor(model=OllamaConfig.from_env().model, db_connection=None)
+    email_sender = setup_email_sender()
+    job_requirements = setup_job_requirements()
+
+    async def parse(item):
+        text = await run_in_threadpool(lambda: processor.read_text(item.opener(), item.filename))
+        if text is None:
+            raise ValueError("No text could be extracted from the file")
+        item.state["text"] = text
+
+    async def llm(item):
+        # Counts against the same MAX_INFLIGHT_UPLOADS limit as single uploads
+        async with admission.slot():
+            cv_data = await run_in_threadpool(processor.extract_profile, item.state.pop("text"))
+        if cv_data is None:
+            raise ValueError("CV processing failed")
+        item.state["cv_data"] = cv_data
+
+    async def store(item):
+        cv_data = item.state.pop("cv_data")
+        if repository is not None:
+            candidate_id, previous, candidate_data = await store_candidate_async(cv_data)
+        else:
+            candidate_id, previous, candidate_data = await run_in_threadpool(with_db_connection, store_candidate, cv_data)
+        if previous:
+            item.result = unchanged_response(candidate_id, previous, cv_data)
+        item.state.update(candidate_id=candidate_id, candidate_data=candidate_data)
+
+    async def match(item):
+        candidate_id, candidate_data = item.state["candidate_id"], item.state["candidate_data"]
+        if repository is not None:
+            evaluation_results = await match_candidate_async(candidate_id, candidate_data, job_requirements, email_sender)
+        else:
+            evaluation_results = await run_in_threadpool(with_db_connection, match_candidate, candidate_id,
+                                                         candidate_data, job_requirements, email_sender)
+        item.result = success_response(candidate_id, evaluation_results)
+
+    return [("parse", parse), ("llm", llm), ("store", store), ("match", match)]
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -394,6 +667,15 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/upload-resume": "POST - Upload and process resume file",
+            "/upload-resumes": "POST - Upload several resumes or a ZIP archive as a batch",
+            "/upload-resumes/{batch_id}": "GET - Status and per-file results of a batch",
+            "/internal/screening/notify": "POST - Queue the AI-screening email for a submitted assessment",
+            "/analytics/qualifications": "GET - Per-job qualification counts over a date range",
+            "/analytics/score-distribution": "GET - Match score histogram over a date range",
+            "/candidates/by-skill": "GET - Candidates having the given skills",
+            "/export/{dataset}": "GET - Stream candidates, skills or evaluations as NDJSON/CSV",
+            "/metrics": "GET - Prometheus metrics (per-stage latency, upload counts)",
+            "/profiles/{request_id}": "GET - Stored profile of a profiled upload (collapsed stacks, admin token)",
             "/health": "GET - Health check endpoint"
         }
     }
@@ -403,6 +685,96 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/metrics")
+async def metrics():
+    """Stage latency histograms and upload counters in Prometheus text format."""
+    return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/profiles/{request_id}")
+async def get_profile(request_id: str, x_profile: Optional[str] = Header(None)):
+    """A profiled upload's stack samples in collapsed (flamegraph) format. Requires X-Profile: <PROFILE_ADMIN_TOKEN>."""
+    if not request_profiler.is_admin(x_profile):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+    collapsed = await run_in_threadpool(request_profiler.load, request_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="No profile stored for this request id")
+    return Response(content=collapsed, media_type="text/plain; charset=utf-8")
+
+@app.post("/internal/screening/notify", status_code=202)
+async def notify_assessment_submitted(notification: ScreeningNotification, x_internal_token: Optional[str] = Header(None)):
+    """
+    Called by the Node server when an assessment is submitted. Queues the screening
+    email so it goes out within seconds; the daily sweep reconciles anything missed.
+    """
+    internal_token = os.getenv("INTERNAL_API_TOKEN")
+    if internal_token and x_internal_token != internal_token:
+        raise HTTPException(status_code=403, detail="Invalid internal token")
+
+    queued = screening_trigger.enqueue(notification.assessment_uuid)
+    return {"assessment_uuid": notification.assessment_uuid, "queued": queued}
+
+def _analytics_range(since, until):
+    until = until or date.today() + timedelta(days=1)
+    since = since or until - timedelta(days=30)
+    if since >= until:
+        raise HTTPException(status_code=422, detail="'since' must be before 'until'")
+    return datetime.combine(since, datetime.min.time()), datetime.combine(until, datetime.min.time())
+
+@app.get("/analytics/qualifications")
+async def qualification_summary(since: Optional[date] = Query(None), until: Optional[date] = Query(None),
+                                job_title: Optional[str] = Query(None)):
+    """Per-job evaluation and qualification counts for [since, until) (default: last 30 days)."""
+    since_dt, until_dt = _analytics_range(since, until)
+    jobs = await run_in_threadpool(with_db_connection, get_qualification_summary, since_dt, until_dt, job_title)
+    return {"since": str(since_dt.date()), "until": str(until_dt.date()), "jobs": jobs}
+
+@app.get("/analytics/score-distribution")
+async def score_distribution(since: Optional[date] = Query(None), until: Optional[date] = Query(None),
+                             job_title: Optional[str] = Query(None), bucket_size: int = Query(10, ge=1, le=100)):
+    """Match score histogram for [since, until) (default: last 30 days)."""
+    since_dt, until_dt = _analytics_range(since, until)
+    buckets = await run_in_threadpool(with_db_connection, get_score_distribution,
+                                      since_dt, until_dt, job_title, bucket_size)
+    return {"since": str(since_dt.date()), "until": str(until_dt.date()), "job_title": job_title, "buckets": buckets}
+
+@app.get("/candidates/by-skill")
+async def candidates_by_skill(skill: List[str] = Query(...), match: str = Query("all", pattern="^(all|any)$"),
+                              limit: int = Query(100, ge=1, le=1000)):
+    """Candidate ids having all (or any) of the given skills, resolved via the skill dictionary."""
+    candidate_ids = await run_in_threadpool(with_db_connection, find_candidates_with_skills, skill,
+                                            match == "all", limit)
+    return {"skills": skill, "match": match, "candidate_ids": candidate_ids}
+
+@app.get("/export/{dataset}")
+async def export_dataset(dataset: str, format: str = Query("ndjson"), after: Optional[str] = Query(None),
+                         limit: Optional[int] = Query(None, ge=1), since: Optional[date] = Query(None),
+                         until: Optional[date] = Query(None), job_title: Optional[str] = Query(None),
+                         qualified: Optional[bool] = Query(None), skill: Optional[str] = Query(None)):
+    """
+    Streams candidates, skills or evaluations as NDJSON or CSV with constant memory.
+    Resume an interrupted export by passing the last row's cursor value as `after`
+    (`id`, or `candidate_id:skill_id` for skills).
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset. Choose one of: {', '.join(EXPORT_DATASETS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"Unsupported format. Choose one of: {', '.join(EXPORT_FORMATS)}")
+
+    db_config = DatabaseConfig.from_env()
+    try:
+        # StreamingResponse iterates sync generators in the threadpool, so the
+        # connection is opened there, and only once the response starts streaming
+        chunks = export_stream(lambda: connect_to_db(db_config), dataset, format, after=after, limit=limit,
+                               since=since, until=until, job_title=job_title,
+                               qualified=qualified, skill=skill)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid 'after' cursor")
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'}
+    )
+
 @app.post("/test-upload")
 async def test_upload(file: UploadFile = File(...)):
     """Simple test endpoint to verify file upload works"""
@@ -418,22 +790,24 @@ async def test_upload(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/upload-resume")
-async def upload_resume(file: UploadFile = File(...)):
+async def upload_resume(file: UploadFile = File(...), timings: bool = Query(False),
+                        x_profile: Optional[str] = Header(None)):
     """
     Upload and process a resume file (.pdf or .docx).
-    Returns candidate evaluation results and qualified positions.
+    Returns candidate evaluation results and qualified positions, plus a per-stage
+    timing breakdown when called with ?timings=true. With X-Profile: <PROFILE_ADMIN_TOKEN>
+    (or when picked by PROFILE_SAMPLE_RATE) the request is profiled; see /profiles/{request_id}.
     """
-    temp_file_path = None
+    upload = None
+    started = time.perf_counter()
+    request_timings = start_request_timings()
+    outcome = "500"
     
     try:
         # Validate file
         if not file.filename:
             raise HTTPException(status_code=422, detail="No file provided")
         
-        # Check file size (optional - prevent very large files)
-        if file.size and file.size > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(status_code=422, detail="File too large. Maximum size is 10MB")
-        
         file_extension = Path(file.filename).suffix.lower()
         if file_extension not in ['.pdf', '.docx']:
             raise HTTPException(
@@ -441,18 +815,29 @@ async def upload_resume(file: UploadFile = File(...)):
                 detail="Only PDF and DOCX files are supported"
             )
 
-        # Read file content
-        file_content = await file.read()
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            temp_file.write(file_content)
-            temp_file_path = temp_file.name
+        # Starlette has already buffered the file (in memory, or on disk when large); parse it in place
+        try:
+            upload, size = open_upload(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=422, detail=str(e))
 
-        print(f"Processing file: {file.filename} (size: {len(file_content)} bytes)")
+        logger.info("📥 Processing file: %s (size: %d bytes)", file.filename, size)
         
         # Process the resume
-        result = await process_resume_logic(temp_file_path)
+        request_id = get_request_id()
+        profiling = (request_profiler.profile(request_id) if request_profiler.should_profile(x_profile)
+                     else contextlib.nullcontext())
+        async with admission.admit():
+            with profiling as profile:
+                result = await process_resume_logic(upload, file.filename)
+        if profile is not None:
+            result["profile"] = f"/profiles/{request_id}"
+        outcome = result.get("status", "success")
+        if timings:
+            result["timings"] = {
+                "total_seconds": round(time.perf_counter() - started, 4),
+                "stages": summarize_timings(request_timings)
+            }
         
         return JSONResponse(
             status_code=200,
@@ -464,12 +849,15 @@ async def upload_resume(file: UploadFile = File(...)):
         )
 
     except HTTPException as e:
-        print(f"HTTP Exception: {e.detail}")
+        outcome = str(e.status_code)
+        logger.warning("HTTP Exception: %s", e.detail)
         raise e
+    except LLMQuotaExceeded:
+        outcome = "503"
+        raise HTTPException(status_code=503, detail="LLM quota exhausted, retry later",
+                            headers={"Retry-After": str(LLM_QUOTA_RETRY_AFTER_SECONDS)})
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error: %s", e)
         raise HTTPException(
             status_code=500, 
             detail={
@@ -478,13 +866,12 @@ async def upload_resume(file: UploadFile = File(...)):
             }
         )
     finally:
-        # Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                print(f"Cleaned up temporary file: {temp_file_path}")
-            except Exception as cleanup_error:
-                print(f"Failed to cleanup temp file: {cleanup_error}")
+        elapsed = time.perf_counter() - started
+        UPLOADS.inc(outcome)
+        UPLOAD_DURATION.observe(elapsed, outcome)
+
+        if upload is not None:
+            upload.close()
 
 @app.options("/upload-resume")
 async def upload_resume_options():
@@ -499,6 +886,88 @@ async def upload_resume_options():
         }
     )
 
+async def _batch_items(files, resources):
+    """Spools each upload (expanding ZIP archives) into batch items; spooled files and archives go to `resources`."""
+    max_bytes = max_upload_bytes()
+    max_files = batch_max_files()
+    items = []
+    for file in files:
+        if not file.filename:
+            items.append(BatchItem("", status=ITEM_SKIPPED, error="No file name"))
+        elif is_archive(file.filename):
+            try:
+                spooled, _ = await spool_upload(file, max_archive_bytes())
+            except UploadTooLarge as e:
+                raise HTTPException(status_code=422, detail=f"{file.filename}: {e}")
+            resources.append(spooled)
+            try:
+                archive, entries = expand_archive(spooled, file.filename, max_bytes)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=422, detail=f"{file.filename} is not a valid ZIP archive")
+            resources.append(archive)
+            items.extend(entries)
+        elif not is_supported(file.filename):
+            items.append(BatchItem(file.filename, status=ITEM_SKIPPED, error="Only PDF and DOCX files are supported"))
+        else:
+            try:
+                spooled, _ = await spool_upload(file, max_bytes)
+            except UploadTooLarge as e:
+                items.append(BatchItem(file.filename, status=ITEM_SKIPPED, error=str(e)))
+                continue
+            resources.append(spooled)
+            items.append(BatchItem(file.filename, opener=lambda spooled=spooled: spooled))
+        if len(items) > max_files:
+            raise HTTPException(status_code=422, detail=f"Too many files: a batch holds at most {max_files}")
+    return items
+
+@app.post("/upload-resumes", status_code=202)
+async def upload_resumes(files: List[UploadFile] = File(...), wait: bool = Query(False)):
+    """
+    Upload several resumes (.pdf/.docx), or ZIP archives of them, as one batch. Files run
+    through the pipeline with bounded parallelism per stage. Returns 202 with the batch id
+    and per-file status (poll /upload-resumes/{batch_id}), or the finished batch with ?wait=true.
+    """
+    resources = []
+    try:
+        items = await _batch_items(files, resources)
+    except BaseException:
+        for resource in resources:
+            resource.close()
+        raise
+    batch = Batch(new_batch_id(), items, resources)
+    if not any(item.status == ITEM_QUEUED for item in items):
+        batch.close()
+        raise HTTPException(status_code=422, detail="No PDF or DOCX files in the upload")
+
+    batch_registry.add(batch)
+    stages = batch_stages()
+    if wait:
+        await batch_pipeline.run(batch, stages)
+        return JSONResponse(
+            status_code=200,
+            content={"success": True, "message": "Batch processed", "data": batch.to_dict()}
+        )
+
+    # The batch outlives the request; the registry keeps a reference to the task
+    batch.task = asyncio.create_task(batch_pipeline.run(batch, stages))
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "message": "Batch accepted",
+            "status_url": f"/upload-resumes/{batch.batch_id}",
+            "data": batch.to_dict(include_results=False)
+        }
+    )
+
+@app.get("/upload-resumes/{batch_id}")
+async def get_batch(batch_id: str, results: bool = Query(True)):
+    """Status, counts and per-file results of a batch (kept in memory by the process that received it)."""
+    batch = batch_registry.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Unknown batch id")
+    return {"success": True, "data": batch.to_dict(include_results=results)}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
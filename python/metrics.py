@@ -0,0 +1,239 @@
+# metrics.py
+"""
+In-process latency and throughput metrics, exposed in Prometheus text format.
+
+Pipeline stages are wrapped in span("stage"), which records the duration into the
+cih2_stage_duration_seconds histogram (and cih2_stage_errors_total when the stage
+raises). When a request has called start_request_timings(), its spans are also
+collected into a per-request breakdown that /upload-resume can return.
+
+Metrics are per process; with several workers, scrape each one.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from profiling import current_profile
+
+# Seconds; covers sub-millisecond matching up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+               for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (bucket_counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for upper, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.label_names, label_values, [("le", _format_value(upper))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.register(Histogram(
+    "cih2_stage_duration_seconds", "Duration of resume pipeline stages.", ("stage",)
+))
+STAGE_ERRORS = registry.register(Counter(
+    "cih2_stage_errors_total", "Pipeline stages that raised an exception.", ("stage",)
+))
+UPLOAD_DURATION = registry.register(Histogram(
+    "cih2_upload_duration_seconds", "End-to-end /upload-resume latency.", ("status",)
+))
+UPLOADS = registry.register(Counter(
+    "cih2_uploads_total", "Handled /upload-resume requests.", ("status",)
+))
+UPLOADS_IN_FLIGHT = registry.register(Gauge(
+    "cih2_uploads_in_flight", "Resume pipelines currently running."
+))
+UPLOAD_QUEUE_DEPTH = registry.register(Gauge(
+    "cih2_upload_queue_depth", "Uploads waiting for a pipeline slot."
+))
+UPLOAD_QUEUE_WAIT = registry.register(Histogram(
+    "cih2_upload_queue_wait_seconds", "Time admitted uploads waited for a pipeline slot."
+))
+UPLOAD_REJECTIONS = registry.register(Counter(
+    "cih2_upload_rejections_total", "Uploads shed by admission control.", ("reason",)
+))
+EXTRACTION_FALLBACKS = registry.register(Counter(
+    "cih2_extraction_fallbacks_total", "Resumes extracted by rules instead of the LLM.", ("reason",)
+))
+EVALUATION_CACHE_LOOKUPS = registry.register(Counter(
+    "cih2_evaluation_cache_lookups_total", "Evaluation cache lookups by result (hit or miss).", ("result",)
+))
+BATCH_ITEMS = registry.register(Counter(
+    "cih2_batch_items_total", "Files processed through /upload-resumes.", ("status",)
+))
+BATCH_STAGE_WAIT = registry.register(Histogram(
+    "cih2_batch_stage_wait_seconds", "Time batch files waited for a stage slot.", ("stage",)
+))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timings():
+    """Starts collecting this request's spans; returns the list they are appended to."""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def summarize_timings(timings):
+    """Per-stage totals (seconds, calls) for a request breakdown, in first-seen order."""
+    stages = {}
+    for stage, seconds in timings:
+        entry = stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+    return {stage: {"seconds": round(entry["seconds"], 4), "calls": entry["calls"]}
+            for stage, entry in stages.items()}
+
+
+@contextmanager
+def span(stage):
+    """Times the enclosed block as one occurrence of `stage`."""
+    # A profiled request's spans may run in threadpool workers; let its sampler see them
+    profile = current_profile()
+    if profile is not None:
+        profile.enter_thread()
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if profile is not None:
+            profile.exit_thread()
+        STAGE_DURATION.observe(elapsed, stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def render_metrics():
+    return registry.render()
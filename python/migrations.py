@@ -0,0 +1,525 @@
+# migrations.py
+"""
+Versioned schema migrations.
+
+Every table used by db_insert.py, main.py and daily_screening_script.py is created
+here, once, instead of with CREATE TABLE IF NOT EXISTS on the request path. Applied
+versions are recorded in `schema_migrations`; run_migrations() only applies the ones
+that are missing, so it is cheap to call at every startup.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # list applied / pending migrations
+"""
+import argparse
+import re
+
+from storage import is_sqlite
+
+MIGRATION_LOCK_NAME = "cih2_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 30
+
+
+def _column_exists(cursor, table, column):
+    if is_sqlite(cursor):
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _index_exists(cursor, table, index):
+    if is_sqlite(cursor):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s",
+                       (table, index))
+        return cursor.fetchone()[0] > 0
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+def _column_is_indexed(cursor, table, column):
+    """True if some index (including ones InnoDB creates for foreign keys) leads with column."""
+    if is_sqlite(cursor):
+        cursor.execute(f"PRAGMA index_list({table})")
+        for index in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"PRAGMA index_info({index})")
+            if any(row[0] == 0 and row[2] == column for row in cursor.fetchall()):
+                return True
+        return False
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        AND COLUMN_NAME = %s AND SEQ_IN_INDEX = 1
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _add_column_if_missing(cursor, table, column, definition):
+    if not _column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _create_index_if_missing(cursor, table, index, columns, unique=False):
+    if _index_exists(cursor, table, index):
+        return
+    if "," not in columns and _column_is_indexed(cursor, table, columns.strip()):
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cursor.execute(f"CREATE {kind} {index} ON {table} ({columns})")
+
+
+def _drop_index_if_exists(cursor, table, index):
+    if not _index_exists(cursor, table, index):
+        return
+    if is_sqlite(cursor):
+        cursor.execute(f"DROP INDEX {index}")
+    else:
+        cursor.execute(f"DROP INDEX {index} ON {table}")
+
+
+# --- Migrations ---
+
+def _create_candidate_tables(cursor):
+    """Candidate profile tables written by db_insert.insert_structured_cv_data."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS candidates (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255),
+            role VARCHAR(255),
+            summary TEXT,
+            email VARCHAR(255),
+            phone VARCHAR(50),
+            location VARCHAR(255),
+            portfolio_url VARCHAR(500),
+            github_url VARCHAR(500),
+            linkedin_url VARCHAR(500),
+            total_experience DECIMAL(5,2),
+            education_gap BOOLEAN DEFAULT FALSE,
+            work_gap BOOLEAN DEFAULT FALSE,
+            last_updated DATE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS experience (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            candidate_id INT NOT NULL,
+            title VARCHAR(255),
+            company VARCHAR(255),
+            start_date DATE,
+            end_date DATE,
+            description TEXT,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS education (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            candidate_id INT NOT NULL,
+            institute VARCHAR(255),
+            degree VARCHAR(255),
+            start_date DATE,
+            end_date DATE,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS skills (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            candidate_id INT NOT NULL,
+            skill VARCHAR(255),
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS projects (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            candidate_id INT NOT NULL,
+            title VARCHAR(150),
+            description TEXT,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS soft_skills (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            candidate_id INT NOT NULL,
+            skill VARCHAR(255),
+            strength_level VARCHAR(50),
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS employment_gaps (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            candidate_id INT NOT NULL,
+            gap_start DATE,
+            gap_end DATE,
+            gap_duration_in_months INT,
+            reason TEXT,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scoring_metrics (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            candidate_id INT NOT NULL,
+            tech_score DECIMAL(4,2),
+            communication_score DECIMAL(4,2),
+            ai_fit_score DECIMAL(4,2),
+            overall_score DECIMAL(4,2),
+            evaluated_by_ai BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+
+
+def _create_evaluation_tables(cursor):
+    """Tables written by main.py after matching a candidate against the job catalog."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            candidate_id INT,
+            total_positions_checked INT,
+            qualified_positions TEXT,
+            notifications_sent INT,
+            evaluation_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS assessments (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            assessment_uuid VARCHAR(255) UNIQUE NOT NULL,
+            candidate_id INT NOT NULL,
+            job_title VARCHAR(255) NOT NULL,
+            candidate_email VARCHAR(255) NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+
+
+def _create_assessment_table(cursor):
+    """Assessment attempts shared with the Node server and the screening sweep."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS assessment (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            assessment_uuid VARCHAR(255) UNIQUE NOT NULL,
+            candidate_id VARCHAR(255),
+            candidate_email VARCHAR(255),
+            job_title VARCHAR(255),
+            status VARCHAR(50),
+            score DECIMAL(6,2),
+            proctoring_violations_count INT DEFAULT 0,
+            answers_json TEXT,
+            screening_email_sent BOOLEAN DEFAULT FALSE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            end_time DATETIME
+        )
+    """)
+    _add_column_if_missing(cursor, "assessment", "claimed_by", "VARCHAR(255) NULL")
+    _add_column_if_missing(cursor, "assessment", "claimed_until", "DATETIME NULL")
+
+
+def _create_hot_query_indexes(cursor):
+    """Indexes backing the per-candidate lookups and the screening sweep."""
+    for table in ("experience", "education", "skills", "projects",
+                  "soft_skills", "employment_gaps", "scoring_metrics",
+                  "evaluation_logs", "assessments"):
+        _create_index_if_missing(cursor, table, f"idx_{table}_candidate_id", "candidate_id")
+    _create_index_if_missing(cursor, "candidates", "idx_candidates_email", "email")
+    _create_index_if_missing(cursor, "assessments", "idx_assessments_assessment_uuid", "assessment_uuid", unique=True)
+    _create_index_if_missing(cursor, "assessment", "idx_assessment_screening",
+                             "status, screening_email_sent, end_time")
+    _create_index_if_missing(cursor, "assessment", "idx_assessment_claimed_by", "claimed_by")
+
+
+def _create_email_outbox(cursor):
+    """Invitation emails staged in the evaluation transaction (see email_outbox.py)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            assessment_uuid VARCHAR(255) NOT NULL,
+            candidate_id INT NOT NULL,
+            recipient_email VARCHAR(255) NOT NULL,
+            job_title VARCHAR(255) NOT NULL,
+            payload TEXT NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            sent_at DATETIME,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id)
+        )
+    """)
+    _create_index_if_missing(cursor, "email_outbox", "idx_email_outbox_status", "status, id")
+    _create_index_if_missing(cursor, "email_outbox", "idx_email_outbox_assessment_uuid", "assessment_uuid")
+
+
+def _add_candidate_dedup_columns(cursor):
+    """Normalized email and content fingerprint used to upsert re-applications."""
+    _add_column_if_missing(cursor, "candidates", "email_normalized", "VARCHAR(255) NULL")
+    _add_column_if_missing(cursor, "candidates", "content_fingerprint", "CHAR(64) NULL")
+    cursor.execute("""
+        UPDATE candidates SET email_normalized = LOWER(TRIM(email))
+        WHERE email IS NOT NULL AND email_normalized IS NULL
+    """)
+    _create_index_if_missing(cursor, "candidates", "idx_candidates_email_normalized", "email_normalized")
+    _create_index_if_missing(cursor, "candidates", "idx_candidates_content_fingerprint", "content_fingerprint")
+
+
+def _create_evaluation_results(cursor):
+    """One row per (candidate, job) evaluation, replacing LIKE scans over evaluation_logs."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_results (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            evaluation_log_id INT,
+            candidate_id INT NOT NULL,
+            job_title VARCHAR(255) NOT NULL,
+            match_score DECIMAL(5,2) NOT NULL,
+            meets_experience BOOLEAN NOT NULL,
+            qualified BOOLEAN NOT NULL,
+            catalog_version CHAR(16),
+            evaluated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id),
+            FOREIGN KEY (evaluation_log_id) REFERENCES evaluation_logs(id)
+        )
+    """)
+    _create_index_if_missing(cursor, "evaluation_results", "idx_evaluation_results_job_time",
+                             "job_title, evaluated_at, qualified")
+    _create_index_if_missing(cursor, "evaluation_results", "idx_evaluation_results_time",
+                             "evaluated_at, qualified")
+    _create_index_if_missing(cursor, "evaluation_results", "idx_evaluation_results_candidate",
+                             "candidate_id, evaluated_at")
+
+
+# Skill names and aliases as of migration 8, frozen so later edits to
+# FilterAndTestLink.SKILL_ALIASES don't change what the migration does
+_V8_CANONICAL_SKILLS = (
+    "adobe xd", "agile methodology", "amazon web services", "ansible", "api", "artificial intelligence",
+    "bash", "computer vision", "continuous integration/continuous deployment", "css", "cypress",
+    "data science", "docker", "excel", "express.js", "figma", "git", "google cloud platform", "html",
+    "java", "javascript", "jira", "jmeter", "kotlin", "kubernetes", "linux", "machine learning",
+    "microsoft azure", "mongodb", "natural language processing", "node.js", "nosql database", "numpy",
+    "pandas", "power bi", "python", "pytorch", "quality assurance", "react",
+    "relational database management system", "rest api", "scrum framework", "selenium", "sql", "swift",
+    "tableau", "tensorflow", "terraform", "ui/ux design", "unified modeling language", "xcode",
+)
+_V8_SKILL_ALIASES = {
+    "js": "javascript", "reactjs": "react", "nodejs": "node.js", "expressjs": "express.js",
+    "adobexd": "adobe xd", "k8s": "kubernetes", "gcp": "google cloud platform", "azure": "microsoft azure",
+    "aws": "amazon web services", "ai": "artificial intelligence", "ml": "machine learning",
+    "data sci": "data science", "ui/ux": "ui/ux design", "qa": "quality assurance",
+    "ci/cd": "continuous integration/continuous deployment", "rdbms": "relational database management system",
+    "nosql": "nosql database", "agile": "agile methodology", "scrum": "scrum framework", "rest": "rest api",
+    "nlp": "natural language processing", "cv": "computer vision", "powerbi": "power bi",
+    "uml": "unified modeling language", "shell": "bash",
+}
+
+
+def _v8_normalize_skills(skills):
+    """skill_dictionary.normalize_candidate_skills as of migration 8."""
+    normalized = {}
+    for skill in skills or []:
+        if not skill:
+            continue
+        name = re.sub(r'[^\w\s]', '', str(skill)).lower().strip()
+        name = _V8_SKILL_ALIASES.get(name, name)[:255]
+        if name:
+            normalized.setdefault(name, str(skill)[:255])
+    return normalized
+
+
+def _create_skill_dictionary(cursor):
+    """
+    Integer-keyed skill dictionary and candidate_skills, backfilled from the free-text
+    skills table. The old table is left in place (no longer written) for rollback.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS skill_dictionary (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            normalized_name VARCHAR(255) NOT NULL UNIQUE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS skill_aliases (
+            alias VARCHAR(255) PRIMARY KEY,
+            skill_id INT NOT NULL,
+            FOREIGN KEY (skill_id) REFERENCES skill_dictionary(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS candidate_skills (
+            candidate_id INT NOT NULL,
+            skill_id INT NOT NULL,
+            raw_skill VARCHAR(255),
+            PRIMARY KEY (candidate_id, skill_id),
+            FOREIGN KEY (candidate_id) REFERENCES candidates(id),
+            FOREIGN KEY (skill_id) REFERENCES skill_dictionary(id)
+        )
+    """)
+    _create_index_if_missing(cursor, "candidate_skills", "idx_candidate_skills_skill", "skill_id, candidate_id")
+
+    # Seed the dictionary with the matcher's canonical names and their aliases
+    cursor.executemany("INSERT IGNORE INTO skill_dictionary (normalized_name) VALUES (%s)",
+                       [(name,) for name in _V8_CANONICAL_SKILLS])
+    cursor.execute("SELECT id, normalized_name FROM skill_dictionary")
+    ids = {name: skill_id for skill_id, name in cursor.fetchall()}
+    cursor.executemany("INSERT IGNORE INTO skill_aliases (alias, skill_id) VALUES (%s, %s)",
+                       [(alias, ids[name]) for alias, name in _V8_SKILL_ALIASES.items()])
+
+    # Backfill candidate_skills from the legacy table
+    cursor.execute("SELECT candidate_id, skill FROM skills ORDER BY id")
+    skills_by_candidate = {}
+    for candidate_id, skill in cursor.fetchall():
+        skills_by_candidate.setdefault(candidate_id, []).append(skill)
+    rows = []
+    for candidate_id, skills in skills_by_candidate.items():
+        for name, raw in _v8_normalize_skills(skills).items():
+            if name not in ids:
+                cursor.execute("INSERT IGNORE INTO skill_dictionary (normalized_name) VALUES (%s)", (name,))
+                cursor.execute("SELECT id FROM skill_dictionary WHERE normalized_name = %s", (name,))
+                ids[name] = cursor.fetchone()[0]
+            rows.append((candidate_id, ids[name], raw))
+    if rows:
+        cursor.executemany("INSERT IGNORE INTO candidate_skills (candidate_id, skill_id, raw_skill) VALUES (%s, %s, %s)", rows)
+
+
+def _add_candidate_extraction_method(cursor):
+    """'llm', or 'rules' for partial profiles from the fallback extractor awaiting LLM enrichment."""
+    _add_column_if_missing(cursor, "candidates", "extraction_method", "VARCHAR(16) NOT NULL DEFAULT 'llm'")
+    _create_index_if_missing(cursor, "candidates", "idx_candidates_extraction_method", "extraction_method")
+
+
+def _drop_skill_aliases(cursor):
+    """
+    skill_aliases was never read: aliases are applied in code by
+    FilterAndTestLink.normalize_skill, before a name reaches skill_dictionary.
+    """
+    cursor.execute("DROP TABLE IF EXISTS skill_aliases")
+
+
+def _make_candidate_email_unique(cursor):
+    """
+    One candidate per normalized email, enforced by the database, so concurrent uploads
+    of the same resume can't both insert. Older duplicates keep their rows (other tables
+    reference them) but lose email_normalized; the upsert already matched the newest.
+    """
+    cursor.execute("""
+        SELECT email_normalized, MAX(id) FROM candidates
+        WHERE email_normalized IS NOT NULL
+        GROUP BY email_normalized HAVING COUNT(*) > 1
+    """)
+    for email_normalized, newest_id in cursor.fetchall():
+        cursor.execute("UPDATE candidates SET email_normalized = NULL WHERE email_normalized = %s AND id <> %s",
+                       (email_normalized, newest_id))
+    _drop_index_if_exists(cursor, "candidates", "idx_candidates_email_normalized")
+    _create_index_if_missing(cursor, "candidates", "uq_candidates_email_normalized", "email_normalized", unique=True)
+
+
+# (version, name, function). Append only; never renumber or edit an applied migration.
+MIGRATIONS = [
+    (1, "create candidate tables", _create_candidate_tables),
+    (2, "create evaluation tables", _create_evaluation_tables),
+    (3, "create assessment table with screening lease columns", _create_assessment_table),
+    (4, "add hot query indexes", _create_hot_query_indexes),
+    (5, "create email outbox", _create_email_outbox),
+    (6, "add candidate dedup columns", _add_candidate_dedup_columns),
+    (7, "create evaluation results", _create_evaluation_results),
+    (8, "create skill dictionary", _create_skill_dictionary),
+    (9, "add candidate extraction method", _add_candidate_extraction_method),
+    (10, "drop unused skill aliases table", _drop_skill_aliases),
+    (11, "make candidate email unique", _make_candidate_email_unique),
+]
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_applied_versions(db_connection):
+    cursor = db_connection.cursor()
+    try:
+        _ensure_migrations_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def run_migrations(db_connection):
+    """
+    Applies all pending migrations in version order and returns the versions applied.
+
+    A named lock serialises concurrent runners (several API workers starting at once),
+    so each migration is applied exactly once.
+    """
+    cursor = db_connection.cursor()
+    applied_now = []
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Timed out waiting for the schema migration lock")
+
+        try:
+            applied = get_applied_versions(db_connection)
+            for version, name, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                print(f"🔧 Applying migration {version}: {name}")
+                migrate(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                db_connection.commit()
+                applied_now.append(version)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+    if applied_now:
+        print(f"✅ Applied {len(applied_now)} migration(s): {applied_now}")
+    else:
+        print("✅ Database schema is up to date")
+    return applied_now
+
+
+def main():
+    from config import DatabaseConfig
+    from storage import connect
+
+    parser = argparse.ArgumentParser(description="Apply CIH2 database schema migrations")
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations without applying them")
+    args = parser.parse_args()
+
+    db_connection = connect(DatabaseConfig.from_env())
+    try:
+        if args.status:
+            applied = get_applied_versions(db_connection)
+            for version, name, _ in MIGRATIONS:
+                state = "applied" if version in applied else "pending"
+                print(f"{version:>4}  {state:<8} {name}")
+        else:
+            run_migrations(db_connection)
+    finally:
+        db_connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# profiling.py
+"""
+Opt-in profiling of individual /upload-resume requests.
+
+A request is profiled when it carries `X-Profile: <PROFILE_ADMIN_TOKEN>`, or at random
+with probability PROFILE_SAMPLE_RATE. A sampler thread then records the stacks of the
+threads working on that request every PROFILE_INTERVAL_MS: the thread that started it,
+plus any threadpool worker while it is inside one of the request's metrics spans
+(parsing, the LLM call, SMTP, ...). A statistical sampler is used rather than
+cProfile because cProfile only sees the thread that enabled it.
+
+Profiles are stored as collapsed stacks ("frame;frame;frame count" per line), the
+input format of flamegraph.pl, speedscope and inferno, in PROFILE_DIR as
+<request id>.folded; the newest PROFILE_MAX_STORED are kept. Writing and pruning them
+happens on a background writer thread, never on the event loop, so a profile can
+appear a moment after its response.
+
+With the async driver, the event-loop thread also runs other requests between awaits,
+so its samples can include their work. When a request is not profiled the cost is one
+context-variable lookup per span.
+"""
+import contextvars
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from app_logging import is_valid_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".folded"
+
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+
+def current_profile():
+    return _active_profile.get()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+
+
+class RequestProfile:
+    """Stack samples of one request's threads, collected by a background thread."""
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = Counter()
+        self._threads = {}  # thread id -> nesting depth
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def enter_thread(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+
+    def exit_thread(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(thread_id, 0) - 1
+            if depth > 0:
+                self._threads[thread_id] = depth
+            else:
+                self._threads.pop(thread_id, None)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        """Stops sampling without waiting; join() waits for the sampler's last pass."""
+        self._stop.set()
+
+    def join(self):
+        self._sampler.join()
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                thread_ids = list(self._threads)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names.update((thread.ident, thread.name.replace(" ", "_")) for thread in threading.enumerate())
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
+
+
+class RequestProfiler:
+    def __init__(self, sample_rate=0.0, admin_token=None, interval=0.005, directory=None, max_stored=50):
+        self.sample_rate = sample_rate
+        # Without a token the X-Profile header is ignored and stored profiles are not served
+        self.admin_token = admin_token
+        self.interval = interval
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "cih2-profiles")
+        self.max_stored = max_stored
+        # One writer, so stores and pruning never race each other
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 0.0)),
+            admin_token=os.getenv("PROFILE_ADMIN_TOKEN") or None,
+            interval=float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000,
+            directory=os.getenv("PROFILE_DIR"),
+            max_stored=int(os.getenv("PROFILE_MAX_STORED", 50))
+        )
+
+    def is_admin(self, token):
+        return bool(self.admin_token) and token == self.admin_token
+
+    def should_profile(self, header_token):
+        if header_token and self.is_admin(header_token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, request_id):
+        """Samples the enclosed block (and the request's spans in other threads) and stores it under request_id."""
+        profile = RequestProfile(self.interval)
+        profile.enter_thread()
+        token = _active_profile.set(profile)
+        started = time.perf_counter()
+        profile.start()
+        try:
+            yield profile
+        finally:
+            profile.stop()
+            _active_profile.reset(token)
+            # File I/O stays off the caller's thread (the event loop); the log keeps the request id
+            self._writer.submit(contextvars.copy_context().run, self._finish,
+                                request_id, profile, time.perf_counter() - started)
+
+    def _finish(self, request_id, profile, seconds):
+        profile.join()
+        try:
+            self.store(request_id, profile.collapsed())
+            logger.info("🔬 Stored profile for request %s (%d samples over %.2fs)",
+                        request_id, sum(profile.samples.values()), seconds)
+        except OSError as e:
+            logger.warning("⚠️ Could not store profile for request %s: %s", request_id, e)
+
+    def path_for(self, request_id):
+        if not is_valid_request_id(request_id):
+            raise ValueError(f"Invalid request id: {request_id!r}")
+        return os.path.join(self.directory, request_id + PROFILE_SUFFIX)
+
+    def store(self, request_id, collapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path_for(request_id), "w") as handle:
+            handle.write(collapsed)
+        stored = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(PROFILE_SUFFIX)),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in stored[:max(0, len(stored) - self.max_stored)]:
+            os.unlink(entry.path)
+
+    def load(self, request_id):
+        """Returns the stored collapsed stacks for request_id, or None."""
+        if not is_valid_request_id(request_id):
+            return None
+        try:
+            with open(self.path_for(request_id)) as handle:
+                return handle.read()
+        except FileNotFoundError:
+            return None
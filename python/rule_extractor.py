@@ -0,0 +1,130 @@
+# rule_extractor.py
+"""
+Deterministic, local profile extraction used when the LLM misses its deadline or fails.
+
+It finds what plain patterns can find reliably: email, phone, GitHub/LinkedIn/portfolio
+links, a stated "N years" of experience, the candidate's name (a short name-like line
+near the top, else the email's local part) and skills from a dictionary of known skill
+names and aliases. The result has the same shape as an LLM profile, with
+"extraction_method": "rules" so the stored candidate is marked for LLM enrichment.
+"""
+import re
+
+from FilterAndTestLink import SKILL_ALIASES, normalize_skill
+
+EXTRACTION_METHOD_LLM = "llm"
+EXTRACTION_METHOD_RULES = "rules"
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d ()-]{8,}\d")
+EXPERIENCE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\+?\s*(?:years|yrs)", re.IGNORECASE)
+URL_PATTERN = re.compile(r"(?:https?://)?(?:www\.)?[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}(?:/[^\s,;()<>]*)?", re.IGNORECASE)
+GITHUB_PATTERN = re.compile(r"(?:https?://)?(?:www\.)?github\.com/[\w-]+", re.IGNORECASE)
+LINKEDIN_PATTERN = re.compile(r"(?:https?://)?(?:[\w]+\.)?linkedin\.com/in/[\w%-]+", re.IGNORECASE)
+NAME_PATTERN = re.compile(r"[A-Za-zÀ-ÖØ-öø-ÿ][A-Za-zÀ-ÖØ-öø-ÿ.'-]*(?: [A-Za-zÀ-ÖØ-öø-ÿ][A-Za-zÀ-ÖØ-öø-ÿ.'-]*){1,3}")
+# Top-of-page lines that look like a name but are not one
+NOT_A_NAME = re.compile(r"\b(?:resume|curriculum|vitae|cv|profile|summary|contact|objective)\b", re.IGNORECASE)
+NAME_SEARCH_LINES = 5
+UNKNOWN_CANDIDATE = "Unknown Candidate"
+
+# Skills recognized besides the alias table: the job catalog's skills and common neighbours
+KNOWN_SKILLS = (
+    "JavaScript", "TypeScript", "React", "Next.js", "Node.js", "Express.js", "MongoDB", "HTML", "CSS",
+    "SASS", "Redux", "Webpack", "REST API", "Web APIs", "GraphQL", "Git", "Docker", "Kubernetes", "AWS",
+    "GCP", "Azure", "Terraform", "Ansible", "Linux", "Bash", "CI/CD", "Jenkins", "Monitoring", "Serverless",
+    "Python", "Java", "Kotlin", "Swift", "Go", "Rust", "C++", "C#", "PHP", "Ruby", "SQL", "MySQL",
+    "PostgreSQL", "Redis", "Microservices", "Authentication", "Database Design", "Android SDK", "iOS SDK",
+    "Jetpack Compose", "SwiftUI", "UIKit", "Xcode", "Core Data", "Firebase", "Unit Testing", "Figma",
+    "Adobe XD", "Illustrator", "Photoshop", "Wireframing", "Prototyping", "User Research",
+    "Responsive Design", "Accessibility", "Design Systems", "UI/UX", "Selenium", "Cypress", "JMeter",
+    "Manual Testing", "Automation", "API Testing", "Test Cases", "Bug Tracking", "Performance Testing",
+    "Agile", "Scrum", "JIRA", "Product Roadmap", "User Stories", "Market Research", "A/B Testing",
+    "Analytics", "Power BI", "Tableau", "Excel", "Pandas", "NumPy", "Statistics", "Data Visualization",
+    "Data Analysis", "Data Science", "Machine Learning", "Deep Learning", "TensorFlow", "PyTorch", "NLP",
+    "Computer Vision", "BigQuery", "UML", "Documentation", "Network Security", "Vulnerability Assessment",
+    "SIEM", "Firewalls", "Incident Response", "Penetration Testing", "Ethical Hacking", "SOC",
+)
+
+_skill_pattern = None
+
+
+def _skills_regex():
+    """One alternation over every known skill and alias, longest first, compiled on first use."""
+    global _skill_pattern
+    if _skill_pattern is None:
+        vocabulary = sorted(set(SKILL_ALIASES) | set(SKILL_ALIASES.values()) | set(KNOWN_SKILLS),
+                            key=len, reverse=True)
+        _skill_pattern = re.compile(
+            r"(?<![\w.+#/])(?:" + "|".join(re.escape(skill) for skill in vocabulary) + r")(?![\w+#/])",
+            re.IGNORECASE
+        )
+    return _skill_pattern
+
+
+def find_skills(text):
+    """Known skills mentioned in the text, first spelling of each normalized name, in order of appearance."""
+    skills = {}
+    for match in _skills_regex().finditer(text):
+        skills.setdefault(normalize_skill(match.group(0)), match.group(0))
+    return list(skills.values())
+
+
+def _name_from_email(email):
+    local = re.split(r"[._-]+", email.split("@", 1)[0])
+    words = [word for word in local if word.isalpha() and len(word) > 1]
+    return " ".join(word.capitalize() for word in words) if len(words) >= 2 else None
+
+
+def find_name(lines, email=None):
+    for line in lines[:NAME_SEARCH_LINES]:
+        line = line.strip(" *_#•|")
+        if NAME_PATTERN.fullmatch(line) and not NOT_A_NAME.search(line) and _skills_regex().fullmatch(line) is None:
+            return line.title() if line.isupper() else line
+    return (_name_from_email(email) if email else None) or UNKNOWN_CANDIDATE
+
+
+def find_phone(text):
+    # Date ranges ("2019 - 2021") match the pattern too; real numbers have 10-15 digits
+    for match in PHONE_PATTERN.finditer(text):
+        if 10 <= sum(char.isdigit() for char in match.group(0)) <= 15:
+            return match.group(0)
+    return None
+
+
+def _first(pattern, text):
+    match = pattern.search(text)
+    return match.group(0) if match else None
+
+
+def extract_profile_by_rules(text):
+    """A partial profile from resume text, in the LLM profile's shape, marked for enrichment."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    email = _first(EMAIL_PATTERN, text)
+    github = _first(GITHUB_PATTERN, text)
+    linkedin = _first(LINKEDIN_PATTERN, text)
+    # Only explicit links count: bare "name.tld" words are too often skills like Node.js
+    portfolio = next((url for url in URL_PATTERN.findall(text)
+                      if url.lower().startswith(("http", "www."))
+                      and not GITHUB_PATTERN.match(url) and not LINKEDIN_PATTERN.match(url)), None)
+    experience = EXPERIENCE_PATTERN.search(text)
+    return {
+        "name": find_name(lines, email),
+        "role": None,
+        "email": email,
+        "phone": find_phone(text),
+        "location": None,
+        "github_url": github,
+        "linkedin_url": linkedin,
+        "portfolio_url": portfolio,
+        "summary": None,
+        "total_experience": float(experience.group(1)) if experience else None,
+        "education_gap": False,
+        "work_gap": False,
+        "education": [],
+        "experience": [],
+        "skills": find_skills(text),
+        "soft_skills": [],
+        "projects": [],
+        "employment_gaps": [],
+        "extraction_method": EXTRACTION_METHOD_RULES,
+    }
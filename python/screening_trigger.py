@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import os
+
+from daily_screening_script import screen_assessment
+
+logger = logging.getLogger(__name__)
+
+
+class ScreeningTrigger:
+    """
+    In-process queue that sends the AI-screening email shortly after an assessment
+    is submitted, instead of waiting for the daily sweep.
+
+    The Node server notifies /internal/screening/notify with the assessment UUID;
+    the UUID is queued and a small pool of workers runs the same claim-and-send
+    pipeline as the daily sweep in a thread, so the event loop never blocks on SMTP.
+    """
+    def __init__(self, workers=2, max_pending=1000):
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.pending = set()
+        self.tasks = []
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.getenv("SCREENING_TRIGGER_WORKERS", 2)),
+            max_pending=int(os.getenv("SCREENING_TRIGGER_MAX_PENDING", 1000))
+        )
+
+    def start(self):
+        for _ in range(self.workers):
+            self.tasks.append(asyncio.create_task(self._worker()))
+        logger.info("✅ Screening trigger started with %d workers", self.workers)
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def enqueue(self, assessment_uuid):
+        """Queues an assessment for screening. Returns False if it was already pending or the queue is full."""
+        if assessment_uuid in self.pending:
+            return False
+        try:
+            self.queue.put_nowait(assessment_uuid)
+        except asyncio.QueueFull:
+            # The daily sweep will still pick it up.
+            logger.warning("⚠️ Screening queue full, leaving %s to the daily sweep", assessment_uuid)
+            return False
+        self.pending.add(assessment_uuid)
+        return True
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            assessment_uuid = await self.queue.get()
+            try:
+                await loop.run_in_executor(None, screen_assessment, assessment_uuid)
+            except Exception as e:
+                logger.error("⚠️ Screening trigger failed for %s: %s", assessment_uuid, e)
+            finally:
+                self.pending.discard(assessment_uuid)
+                self.queue.task_done()
@@ -0,0 +1,131 @@
+# skill_dictionary.py
+"""
+Canonical skill dictionary.
+
+Skills are normalized once, when a candidate is stored, with the same rules the
+matcher uses (FilterAndTestLink.normalize_skill), and each distinct normalized name
+gets an integer id in `skill_dictionary`. Candidates reference skills by id through
+`candidate_skills`, so candidate-by-skill lookups are integer index scans and the
+matcher no longer re-normalizes strings per job.
+
+Ids never change once assigned, so they are cached in-process without invalidation.
+"""
+import logging
+import threading
+
+from FilterAndTestLink import normalize_skill
+
+logger = logging.getLogger(__name__)
+
+_skill_ids = {}
+_skill_ids_lock = threading.Lock()
+
+
+def normalize_candidate_skills(skills):
+    """
+    Returns {normalized name: original skill} for a candidate's skill list, keeping the
+    first original spelling of each normalized name and dropping blanks.
+    """
+    normalized = {}
+    for skill in skills or []:
+        if not skill:
+            continue
+        name = normalize_skill(str(skill))[:255]
+        if name:
+            normalized.setdefault(name, str(skill)[:255])
+    return normalized
+
+
+SKILL_INSERT_QUERY = "INSERT IGNORE INTO skill_dictionary (normalized_name) VALUES (%s)"
+
+
+def skill_id_select_query(names):
+    """
+    Returns (sql, params) selecting (id, normalized_name) for the given names.
+
+    The read is a locking one: a plain SELECT under REPEATABLE READ reads the
+    transaction's snapshot and misses names a concurrent upload committed after it
+    began, even though our INSERT IGNORE has just skipped them as duplicates.
+    """
+    placeholders = ", ".join(["%s"] * len(names))
+    return (
+        f"SELECT id, normalized_name FROM skill_dictionary WHERE normalized_name IN ({placeholders})"
+        " LOCK IN SHARE MODE",
+        tuple(names)
+    )
+
+
+def cached_skill_ids(normalized_names):
+    """Splits names into ({name: id} already cached, [names still to resolve])."""
+    with _skill_ids_lock:
+        resolved = {name: _skill_ids[name] for name in normalized_names if name in _skill_ids}
+    return resolved, [name for name in normalized_names if name not in resolved]
+
+
+def resolve_skill_ids(cursor, normalized_names):
+    """
+    Returns {normalized name: skill id}, adding names not yet in the dictionary.
+
+    Runs on the caller's cursor, inside its transaction. New ids are not cached until
+    the caller commits and calls remember_skill_ids(), so a rollback can't leave the
+    cache pointing at rows that don't exist.
+    """
+    resolved, missing = cached_skill_ids(normalized_names)
+    if not missing:
+        return resolved
+
+    cursor.executemany(SKILL_INSERT_QUERY, [(name,) for name in missing])
+    cursor.execute(*skill_id_select_query(missing))
+    for skill_id, name in cursor.fetchall():
+        resolved[name] = skill_id
+    log_unresolved_skills(normalized_names, resolved)
+    return resolved
+
+
+def log_unresolved_skills(normalized_names, resolved):
+    """Warns about names that got no id; callers store the candidate without them."""
+    unresolved = [name for name in normalized_names if name not in resolved]
+    if unresolved:
+        logger.warning("⚠️ Could not resolve skill ids for %s; storing the candidate without them", unresolved)
+
+
+def remember_skill_ids(skill_ids):
+    """Caches ids returned by resolve_skill_ids once their transaction has committed."""
+    with _skill_ids_lock:
+        _skill_ids.update(skill_ids)
+
+
+def find_candidates_with_skills(db_connection, skills, match_all=True, limit=100):
+    """
+    Candidate ids having all (or, with match_all=False, any) of the given skills,
+    newest first. Skill names are normalized the same way as at insert time.
+    """
+    names = list(normalize_candidate_skills(skills))
+    if not names:
+        return []
+
+    cursor = db_connection.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(names))
+        cursor.execute(
+            f"SELECT id FROM skill_dictionary WHERE normalized_name IN ({placeholders})",
+            tuple(names)
+        )
+        skill_ids = [row[0] for row in cursor.fetchall()]
+        if not skill_ids or (match_all and len(skill_ids) < len(names)):
+            return []
+
+        placeholders = ", ".join(["%s"] * len(skill_ids))
+        required = len(skill_ids) if match_all else 1
+        cursor.execute(f"""
+            SELECT candidate_id
+            FROM candidate_skills
+            WHERE skill_id IN ({placeholders})
+            GROUP BY candidate_id
+            HAVING COUNT(*) >= %s
+            ORDER BY candidate_id DESC
+            LIMIT %s
+        """, tuple(skill_ids) + (required, limit))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
@@ -0,0 +1,184 @@
+# stand_ins.py
+"""
+Local stand-ins for the pipeline's external services, for benchmarks and load tests:
+
+- FakeGeminiModel: answers the CV extraction prompt without network access, with a
+  deterministic profile built from the resume text and an optional artificial latency.
+- SMTPSink: a minimal plain-text SMTP server on localhost that accepts and counts mail.
+- create_sqlite_database(): an embedded SQLite database (storage.py) with the schema
+  migrated, in place of a MySQL server.
+
+Nothing here is imported by the service itself.
+"""
+import json
+import os
+import re
+import socketserver
+import tempfile
+import threading
+import time
+
+from FilterAndTestLink import SKILL_ALIASES, normalize_skill
+from rule_extractor import EMAIL_PATTERN, EXPERIENCE_PATTERN, PHONE_PATTERN
+
+RESUME_CONTENT_MARKER = "Resume Content:"
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Drop-in for genai.GenerativeModel in agent_Siya: same generate_content(prompt).text."""
+    def __init__(self, latency=0.0, unique_candidates=False):
+        self.latency = latency
+        # Give every call a distinct email, so repeated uploads of one file are
+        # stored and evaluated as new candidates instead of short-circuiting as unchanged
+        self.unique_candidates = unique_candidates
+        self.calls = 0
+        self._lock = threading.Lock()
+        # Every alias and canonical name the matcher knows, longest first
+        vocabulary = sorted(set(SKILL_ALIASES) | set(SKILL_ALIASES.values()), key=len, reverse=True)
+        self._skill_patterns = [
+            re.compile(r"(?<![\w.+#])" + re.escape(skill) + r"(?![\w+#])", re.IGNORECASE)
+            for skill in vocabulary
+        ]
+
+    def build_profile(self, resume_text):
+        lines = [line.strip() for line in resume_text.splitlines() if line.strip()]
+        email = EMAIL_PATTERN.search(resume_text)
+        phone = PHONE_PATTERN.search(resume_text)
+        experience = EXPERIENCE_PATTERN.search(resume_text)
+        skills = {}
+        for pattern in self._skill_patterns:
+            match = pattern.search(resume_text)
+            if match:
+                skills.setdefault(normalize_skill(match.group(0)), match.group(0))
+        return {
+            "name": lines[0][:100] if lines else "Unknown Candidate",
+            "role": lines[1][:100] if len(lines) > 1 else None,
+            "email": email.group(0) if email else None,
+            "phone": phone.group(0) if phone else None,
+            "location": None,
+            "github_url": None,
+            "linkedin_url": None,
+            "portfolio_url": None,
+            "summary": " ".join(lines[2:5])[:500],
+            "total_experience": float(experience.group(1)) if experience else 1.0,
+            "education_gap": False,
+            "work_gap": False,
+            "education": [],
+            "experience": [],
+            "skills": list(skills.values()),
+            "soft_skills": [{"skill": "Communication", "strength_level": "High"}],
+            "projects": [],
+            "employment_gaps": [],
+            "scoring": {"tech_score": 7.5, "communication_score": 7.0, "ai_fit_score": 7.0, "overall_score": 7.2}
+        }
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        resume_text = prompt.split(RESUME_CONTENT_MARKER, 1)[-1]
+        profile = self.build_profile(resume_text)
+        if self.unique_candidates:
+            profile["email"] = f"candidate-{call}-{os.getpid()}@example.com"
+        return FakeResponse(json.dumps(profile, indent=2))
+
+
+def install_fake_llm(latency=0.0, unique_candidates=False):
+    """Points agent_Siya at a FakeGeminiModel and returns it."""
+    # agent_Siya refuses to import without a key; the fake never uses it
+    os.environ.setdefault("GEMINI_API_KEY", "offline-stand-in")
+    import agent_Siya
+    agent_Siya.model = FakeGeminiModel(latency=latency, unique_candidates=unique_candidates)
+    return agent_Siya.model
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        self._reply("220 localhost SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-localhost")
+                self._reply("250-AUTH PLAIN LOGIN")
+                self._reply("250 8BITMIME")
+            elif verb == "AUTH":
+                self._reply("235 Authentication successful")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline().rstrip(b"\r\n") != b".":
+                    pass
+                if self.server.latency:
+                    time.sleep(self.server.latency)
+                with self.server.lock:
+                    self.server.messages += 1
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Accepts any mail on 127.0.0.1 and only counts it. Use with SMTP_USE_TLS=false."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, latency=0.0):
+        super().__init__(("127.0.0.1", port), _SMTPSinkHandler)
+        self.latency = latency
+        self.messages = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def configure_env(self):
+        """Points EmailSender.from_env() at this sink."""
+        os.environ.update({
+            "EMAIL_USER": "benchmark@localhost",
+            "EMAIL_PASSWORD": "benchmark",
+            "SMTP_SERVER": "127.0.0.1",
+            "SMTP_PORT": str(self.port),
+            "SMTP_USE_TLS": "false",
+        })
+
+
+def create_sqlite_database(path=None):
+    """Creates (or upgrades) an SQLite database with the full schema; returns its path."""
+    from migrations import run_migrations
+    from storage import connect_sqlite
+
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="cih2-"), "cih2.db")
+    db_connection = connect_sqlite(path)
+    try:
+        run_migrations(db_connection)
+    finally:
+        db_connection.close()
+    return path
@@ -0,0 +1,235 @@
+# storage.py
+"""
+Storage backends behind one connection interface.
+
+Everything in this service talks to the database through the mysql.connector
+connection API (cursor(dictionary=...), execute/executemany with %s placeholders,
+fetch*, lastrowid, commit/rollback). connect() returns either a real MySQL connection
+or an embedded SQLite database (WAL mode) wrapped to behave the same way, so
+db_insert, candidate_loader, main and daily_screening_script run unchanged on both.
+
+    DB_BACKEND=mysql    # default: MySQL server via mysql.connector
+    DB_BACKEND=sqlite   # single file at SQLITE_PATH, no server needed
+
+The SQLite wrapper rewrites the handful of MySQL-only constructs the schema and
+queries use (placeholders, INSERT IGNORE, JSON_ARRAYAGG/JSON_OBJECT, NOW/CURDATE, NOW() +/- INTERVAL n SECOND,
+AUTO_INCREMENT, row-lock clauses) and leaves the rest of the SQL untouched.
+
+GET_LOCK/RELEASE_LOCK (migrations, the outbox drain) are backed by flock()ed files
+next to the database, so named locks hold across worker processes as on MySQL.
+"""
+import math
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock(); GET_LOCK then always succeeds, so run one process
+    fcntl = None
+
+try:
+    import mysql.connector
+except ImportError:  # not needed with DB_BACKEND=sqlite
+    mysql = None
+
+BACKEND_MYSQL = "mysql"
+BACKEND_SQLITE = "sqlite"
+
+# Catch these instead of mysql.connector.Error so handlers work on either backend
+DATABASE_ERRORS = (sqlite3.Error,) if mysql is None else (mysql.connector.Error, sqlite3.Error)
+# Unique-key violations, e.g. two uploads racing to insert the same candidate
+INTEGRITY_ERRORS = ((sqlite3.IntegrityError,) if mysql is None
+                    else (mysql.connector.IntegrityError, sqlite3.IntegrityError))
+
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+SQLITE_LOCK_POLL_SECONDS = 0.05
+
+# (pattern, replacement), applied in order
+_SQLITE_REWRITES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE), "INSERT OR IGNORE"),
+    (re.compile(r"\bJSON_ARRAYAGG\s*\(", re.IGNORECASE), "json_group_array("),
+    (re.compile(r"\bJSON_OBJECT\s*\(", re.IGNORECASE), "json_object("),
+    (re.compile(r"\bNOW\(\)\s*([+-])\s*INTERVAL\s+(\?|\d+)\s+SECOND\b", re.IGNORECASE),
+     r"datetime('now', 'localtime', '\1' || \2 || ' seconds')"),
+    (re.compile(r"\bNOW\(\)", re.IGNORECASE), "datetime('now', 'localtime')"),
+    (re.compile(r"\bCURDATE\(\)", re.IGNORECASE), "date('now', 'localtime')"),
+    (re.compile(r"\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.IGNORECASE),
+     "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", re.IGNORECASE), "DEFAULT (datetime('now', 'localtime'))"),
+    # Writers are serialised on the database file, so row locks have no counterpart
+    (re.compile(r"\s+(?:LOCK\s+IN\s+SHARE\s+MODE|FOR\s+(?:SHARE|UPDATE))\b", re.IGNORECASE), ""),
+]
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, float)
+
+
+@lru_cache(maxsize=512)
+def translate_sql(sql):
+    """Rewrites a MySQL statement as used in this codebase into SQLite syntax."""
+    for pattern, replacement in _SQLITE_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def _floor(value):
+    return None if value is None else math.floor(value)
+
+
+class SQLiteNamedLocks:
+    """
+    MySQL GET_LOCK/RELEASE_LOCK semantics for one SQLite connection.
+
+    Each name is an exclusive flock() on `<database>.<name>.lock`. flock() locks belong
+    to the open file, so two connections contend even within one process, and a lock
+    is dropped when its connection closes or its process dies, like a MySQL session's.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._held = {}
+
+    def _lock_path(self, name):
+        return f"{self.path}.{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.lock"
+
+    def get(self, name, timeout):
+        """1 once the lock is held, 0 on timeout (a negative timeout waits forever)."""
+        if name in self._held or fcntl is None or self.path == ":memory:":
+            return 1
+        fd = os.open(self._lock_path(name), os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None or timeout < 0 else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._held[name] = fd
+                return 1
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(fd)
+                    return 0
+                time.sleep(SQLITE_LOCK_POLL_SECONDS)
+
+    def release(self, name):
+        """1 if this connection held the lock, 0 otherwise."""
+        fd = self._held.pop(name, None)
+        if fd is None:
+            return 1 if fcntl is None or self.path == ":memory:" else 0
+        os.close(fd)
+        return 1
+
+    def release_all(self):
+        for name in list(self._held):
+            self.release(name)
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over a sqlite3 cursor."""
+    dialect = BACKEND_SQLITE
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(translate_sql(sql), tuple(params or ()))
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(translate_sql(sql), [tuple(params) for params in seq_of_params])
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """mysql.connector-style connection over an embedded SQLite database."""
+    dialect = BACKEND_SQLITE
+
+    def __init__(self, path):
+        self.path = path
+        # Executor threads (screening trigger, threadpool) may use the connection they
+        # were handed; each connection is still only used by one thread at a time.
+        self._connection = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.create_function("FLOOR", 1, _floor, deterministic=True)
+        self._locks = SQLiteNamedLocks(path)
+        self._connection.create_function("GET_LOCK", 2, self._locks.get)
+        self._connection.create_function("RELEASE_LOCK", 1, self._locks.release)
+
+    def cursor(self, dictionary=False, buffered=None):
+        # sqlite3 cursors step through results lazily, so buffered=False (streaming
+        # exports) needs nothing special.
+        return SQLiteCursor(self._connection.cursor(), dictionary=dictionary)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._locks.release_all()
+        self._connection.close()
+
+    def is_connected(self):
+        try:
+            self._connection.execute("SELECT 1")
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+
+def is_sqlite(connection_or_cursor):
+    return getattr(connection_or_cursor, "dialect", BACKEND_MYSQL) == BACKEND_SQLITE
+
+
+def connect_sqlite(path):
+    return SQLiteConnection(path)
+
+
+def connect(db_config):
+    """Opens a connection on the backend selected by db_config (config.DatabaseConfig)."""
+    if db_config.backend == BACKEND_SQLITE:
+        return connect_sqlite(db_config.sqlite_path)
+    if mysql is None:
+        raise RuntimeError("DB_BACKEND=mysql requires the 'mysql-connector-python' package")
+    return mysql.connector.connect(
+        host=db_config.host,
+        port=db_config.port,
+        user=db_config.user,
+        password=db_config.password,
+        database=db_config.database
+    )
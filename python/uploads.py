@@ -0,0 +1,72 @@
+# uploads.py
+"""
+Reading uploaded resumes without a temp-file round trip.
+
+Starlette parses the whole multipart body before the endpoint runs, buffering each
+file in a SpooledTemporaryFile (in memory up to 1 MB, on disk beyond). So the
+MAX_UPLOAD_BYTES limit can only be applied to a file that has already been received;
+bound the request body itself at the reverse proxy (e.g. nginx client_max_body_size).
+
+/upload-resume hands that buffered file straight to the parser (docsParser.parse_file
+accepts file objects) after checking its size with open_upload(). Batches outlive
+their request, whose UploadFiles are closed when it ends, so spool_upload() copies
+each file into a SpooledTemporaryFile of its own (UPLOAD_SPOOL_BYTES in memory).
+"""
+import os
+import tempfile
+
+DEFAULT_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+DEFAULT_UPLOAD_SPOOL_BYTES = 1024 * 1024
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes):
+        limit = f"{max_bytes // (1024 * 1024)}MB" if max_bytes >= 1024 * 1024 else f"{max_bytes // 1024}KB"
+        super().__init__(f"File too large. Maximum size is {limit}")
+        self.max_bytes = max_bytes
+
+
+def max_upload_bytes():
+    return int(os.getenv("MAX_UPLOAD_BYTES", DEFAULT_MAX_UPLOAD_BYTES))
+
+
+def open_upload(upload, max_bytes=None):
+    """
+    Returns (the UploadFile's own buffered file positioned at 0, size in bytes).
+    Raises UploadTooLarge when it holds more than max_bytes.
+    """
+    max_bytes = max_bytes or max_upload_bytes()
+    size = upload.size
+    if size is None:
+        size = upload.file.seek(0, os.SEEK_END)
+    if size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    upload.file.seek(0)
+    return upload.file, size
+
+
+async def spool_upload(upload, max_bytes=None, spool_bytes=None):
+    """
+    Returns (copy of an UploadFile in a spooled file positioned at 0, size in bytes),
+    for data that must outlive the request. Raises UploadTooLarge, and stops copying,
+    once more than max_bytes have been read.
+    """
+    max_bytes = max_bytes or max_upload_bytes()
+    spool_bytes = spool_bytes or int(os.getenv("UPLOAD_SPOOL_BYTES", DEFAULT_UPLOAD_SPOOL_BYTES))
+    spooled = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled, size
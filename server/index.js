@@ -73,6 +73,31 @@ db.connect((err) => {
   }
 });
 
+const screeningNotifyUrl =
+  process.env.SCREENING_NOTIFY_URL ||
+  "http://localhost:8000/internal/screening/notify";
+
+function notifyScreeningService(assessmentId) {
+  axios
+    .post(
+      screeningNotifyUrl,
+      { assessment_uuid: assessmentId },
+      {
+        headers: { "X-Internal-Token": process.env.INTERNAL_API_TOKEN || "" },
+        timeout: 2000,
+      }
+    )
+    .then(() =>
+      console.log(`Screening service notified for assessment ${assessmentId}`)
+    )
+    .catch((err) =>
+      console.error(
+        `Failed to notify screening service for ${assessmentId}:`,
+        err.message
+      )
+    );
+}
+
 // 1. API to verify linkId against assessment_uuid and fetch details (for AI Screening page)
 app.get("/api/assessment/:linkId", (req, res) => {
   const linkId = req.params.linkId;
@@ -175,6 +200,13 @@ app.post("/api/assessment/submit-results", (req, res) => {
       console.log(
         `Assessment results for ${assessmentId} (Candidate: ${employeeId}) submitted successfully.`
       );
+
+      // Ask the Python service to send the AI-screening invite right away instead of
+      // waiting for the daily sweep. Fire-and-forget: the sweep reconciles failures.
+      if (finalStatus === "completed") {
+        notifyScreeningService(assessmentId);
+      }
+
       res
         .status(200)
         .json({ message: "Assessment results received and processed." });